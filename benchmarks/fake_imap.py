@@ -0,0 +1,600 @@
+"""
+A local IMAP stand-in for the benchmarks.
+
+Speaks the subset of IMAP4rev1 the services use: CAPABILITY, LOGIN,
+ENABLE, LIST, SELECT/EXAMINE, UID SEARCH, UID FETCH (RFC822, FLAGS,
+RFC822.SIZE, BODYSTRUCTURE, BODY[...] sections and partials), UID COPY,
+UID MOVE, UID STORE, EXPUNGE, UID EXPUNGE, NOOP and LOGOUT, over plain
+TCP or TLS on localhost. Authentication accepts any credentials. Adding
+X-GM-EXT-1 to the capabilities also serves Gmail's X-GM-MSGID and X-GM-THRID;
+CONDSTORE reports HIGHESTMODSEQ and answers FETCH (CHANGEDSINCE n), and an
+ENABLEd QRESYNC adds the VANISHED (EARLIER) report of expunged UIDs.
+"""
+import re
+import shutil
+import socket
+import socketserver
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from synthetic import Mailbox, MessageSpec, header_block
+
+
+DEFAULT_CAPABILITIES = ("IMAP4rev1", "LITERAL+", "UIDPLUS", "MOVE", "ENABLE")
+TRASH_FOLDER = "[Gmail]/Bin"
+SYSTEM_FLAGS = r"(\Answered \Flagged \Deleted \Seen \Draft)"
+SEARCH_FLAGS = {"SEEN": "\\Seen", "ANSWERED": "\\Answered", "FLAGGED": "\\Flagged", "DRAFT": "\\Draft", "DELETED": "\\Deleted"}
+GMAIL_FLAGS = {"read": "\\Seen", "starred": "\\Flagged", "drafts": "\\Draft"}  # is:/in: operators
+GMAIL_TOKEN = re.compile(r'-|[(){}]|\w+:"[^"]*"|"[^"]*"|[^\s(){}]+')
+GMAIL_ID_BASE = 1_700_000_000_000_000_000  # X-GM-MSGID/X-GM-THRID are 64-bit and look like this
+
+LITERAL = re.compile(rb"\{(\d+)(\+?)\}\r\n$")
+SECTION = re.compile(r"^BODY(?:\.PEEK)?\[([^\]]*)\](?:<(\d+)\.(\d+)>)?$", re.IGNORECASE)
+
+
+class CommandError(Exception):
+    def __init__(self, message: str, status: str = "BAD"):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@dataclass
+class Folder:
+    name: str
+    uidvalidity: int
+    uids: list[int] = field(default_factory=list)  # sorted; position + 1 is the sequence number
+    messages: dict[int, MessageSpec] = field(default_factory=dict)
+    flags: dict[int, set[str]] = field(default_factory=dict)
+    uidnext: int = 1
+    modseq: int = 1  # HIGHESTMODSEQ
+    modseqs: dict[int, int] = field(default_factory=dict)  # uid -> MODSEQ of its last change
+    expunged: dict[int, int] = field(default_factory=dict)  # uid -> MODSEQ it was expunged at
+
+    def add(self, spec: MessageSpec, flags: set[str]) -> int:
+        uid = self.uidnext
+        self.uidnext += 1
+        self.uids.append(uid)
+        self.messages[uid] = spec
+        self.flags[uid] = set(flags)
+        self.touch(uid)
+        return uid
+
+    def touch(self, uid: int) -> None:
+        self.modseq += 1
+        self.modseqs[uid] = self.modseq
+
+    def remove(self, uids: list[int]) -> list[int]:
+        """Removes the UIDs and returns the sequence numbers to report, highest first."""
+        gone = set(uids)
+        sequence = [index + 1 for index, uid in enumerate(self.uids) if uid in gone]
+        self.uids = [uid for uid in self.uids if uid not in gone]
+        if gone:
+            self.modseq += 1
+        for uid in gone:
+            self.messages.pop(uid, None)
+            self.flags.pop(uid, None)
+            self.modseqs.pop(uid, None)
+            self.expunged[uid] = self.modseq
+        return sorted(sequence, reverse=True)
+
+    def resolve(self, message_set: str) -> list[int]:
+        """UIDs of the folder that fall inside an IMAP sequence set of UIDs."""
+        highest = self.uids[-1] if self.uids else 0
+        found = set()
+        for item in message_set.split(","):
+            start, _, end = item.partition(":")
+            start = highest if start == "*" else int(start)
+            end = start if not end else highest if end == "*" else int(end)
+            start, end = min(start, end), max(start, end)
+            found.update(self.uids[bisect_left(self.uids, start):bisect_right(self.uids, end)])
+        return sorted(found)
+
+
+class MailStore:
+    """Folders shared by every client connection, guarded by one lock."""
+    def __init__(self, mailbox: Mailbox):
+        self.mailbox = mailbox
+        self.lock = threading.RLock()
+        inbox = Folder("INBOX", uidvalidity=1)
+        for spec in mailbox.messages:
+            inbox.add(spec, set())
+        self.folders = {"INBOX": inbox, TRASH_FOLDER: Folder(TRASH_FOLDER, uidvalidity=2)}
+
+
+def tokenize(line: str, literals: list[bytes]):
+    """Parses command arguments into atoms, strings and nested lists; \\x00N\\x00 marks literal N."""
+    stack = [[]]
+    index = 0
+    while index < len(line):
+        char = line[index]
+        if char == " ":
+            index += 1
+        elif char == "(":
+            stack.append([])
+            index += 1
+        elif char == ")":
+            done = stack.pop()
+            stack[-1].append(done)
+            index += 1
+        elif char == '"':
+            end, value = index + 1, ""
+            while line[end] != '"':
+                if line[end] == "\\":
+                    end += 1
+                value += line[end]
+                end += 1
+            stack[-1].append(value)
+            index = end + 1
+        elif char == "\x00":
+            end = line.index("\x00", index + 1)
+            stack[-1].append(literals[int(line[index + 1:end])].decode(errors="replace"))
+            index = end + 1
+        else:
+            end, depth = index, 0
+            while end < len(line) and (depth or line[end] not in " ()"):
+                if line[end] == "[":
+                    depth += 1
+                elif line[end] == "]":
+                    depth -= 1
+                end += 1
+            stack[-1].append(line[index:end])
+            index = end
+    return stack[0]
+
+
+def quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def literal(data: bytes) -> bytes:
+    return b"{%d}\r\n" % len(data) + data
+
+
+class IMAPHandler(socketserver.StreamRequestHandler):
+    server: "FakeIMAPServer"
+    wbufsize = 1 << 16  # responses are flushed once per command
+
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.server.tls_context is not None:
+            self.request = self.server.tls_context.wrap_socket(self.request, server_side=True)
+        super().setup()
+        self.folder: Optional[Folder] = None
+        self.readonly = False
+        self.qresync = False
+
+    def handle(self):
+        self.send(f"* OK [CAPABILITY {self.server.capability_line}] Fake IMAP ready")
+        self.wfile.flush()
+        while True:
+            command = self.read_command()
+            if command is None:
+                return
+            tag, name, args = command
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            try:
+                with self.server.store.lock:
+                    status = getattr(self, f"cmd_{name.lower()}", self.cmd_unknown)(name, args)
+            except CommandError as error:
+                self.send(f"{tag} {error.status} {error.message}")
+            except (ValueError, IndexError, KeyError) as error:
+                self.send(f"{tag} BAD {name} {error!r}")
+            else:
+                self.send(f"{tag} OK {status or name + ' completed'}")
+            self.wfile.flush()
+            if name.upper() == "LOGOUT":
+                return
+
+    def read_command(self) -> Optional[tuple[str, str, list]]:
+        line, literals = b"", []
+        while True:
+            chunk = self.rfile.readline()
+            if not chunk:
+                return None
+            match = LITERAL.search(chunk)
+            if not match:
+                line += chunk
+                break
+            if not match.group(2):
+                self.send("+ Ready for literal")
+                self.wfile.flush()
+            literals.append(self.rfile.read(int(match.group(1))))
+            line += chunk[:match.start()] + f"\x00{len(literals) - 1}\x00".encode()
+
+        text = line.decode(errors="replace").rstrip("\r\n")
+        tag, _, rest = text.partition(" ")
+        name, _, rest = rest.partition(" ")
+        return tag, name, tokenize(rest, literals)
+
+    def send(self, line: str | bytes) -> None:
+        self.wfile.write((line.encode() if isinstance(line, str) else line) + b"\r\n")
+
+    # COMMANDS
+
+    def cmd_unknown(self, name, args):
+        raise CommandError(f"Unknown command {name}")
+
+    def cmd_capability(self, name, args):
+        self.send(f"* CAPABILITY {self.server.capability_line}")
+
+    def cmd_noop(self, name, args):
+        pass
+
+    def cmd_logout(self, name, args):
+        self.send("* BYE Logging out")
+
+    def cmd_login(self, name, args):
+        return f"[CAPABILITY {self.server.capability_line}] Logged in"
+
+    def cmd_enable(self, name, args):
+        enabled = [arg for arg in args if arg.upper() in self.server.capabilities]
+        self.qresync = self.qresync or "QRESYNC" in (arg.upper() for arg in enabled)
+        self.send("* ENABLED " + " ".join(enabled))
+
+    def cmd_list(self, name, args):
+        self.send(r'* LIST (\HasChildren \Noselect) "/" "[Gmail]"')
+        for folder in self.server.store.folders:
+            self.send(rf'* LIST (\HasNoChildren) "/" {quote(folder)}')
+
+    def cmd_select(self, name, args):
+        folder = self.server.store.folders.get(args[0])
+        if folder is None:
+            raise CommandError(f"No such folder {args[0]}", "NO")
+        self.folder = folder
+        self.readonly = name.upper() == "EXAMINE"
+        self.send(f"* FLAGS {SYSTEM_FLAGS}")
+        self.send(f"* {len(folder.uids)} EXISTS")
+        self.send("* 0 RECENT")
+        self.send(f"* OK [UIDVALIDITY {folder.uidvalidity}] UIDs valid")
+        self.send(f"* OK [UIDNEXT {folder.uidnext}] Predicted next UID")
+        if "CONDSTORE" in self.server.capabilities:
+            self.send(f"* OK [HIGHESTMODSEQ {folder.modseq}] Highest")
+        return f"[{'READ-ONLY' if self.readonly else 'READ-WRITE'}] {name.upper()} completed"
+
+    cmd_examine = cmd_select
+
+    def cmd_expunge(self, name, args):
+        folder = self.selected()
+        for number in folder.remove([uid for uid in folder.uids if "\\Deleted" in folder.flags[uid]]):
+            self.send(f"* {number} EXPUNGE")
+
+    def cmd_uid(self, name, args):
+        self.selected()
+        command, args = args[0].upper(), args[1:]
+        handler = getattr(self, f"uid_{command.lower()}", None)
+        if handler is None:
+            raise CommandError(f"Unknown UID command {command}")
+        handler(args)
+        return f"UID {command} completed"
+
+    def selected(self) -> Folder:
+        if self.folder is None:
+            raise CommandError("No folder selected")
+        return self.folder
+
+    # UID COMMANDS
+
+    def uid_search(self, args):
+        if args and str(args[0]).upper() == "CHARSET":
+            args = args[2:]
+        folder = self.selected()
+        matcher = self.search_matcher(args)
+        found = [uid for uid in folder.uids if matcher(folder, uid)]
+        self.send("* SEARCH" + "".join(f" {uid}" for uid in found))
+
+    def search_matcher(self, args):
+        tests, index = [], 0
+        while index < len(args):
+            test, index = self.search_key(args, index)
+            tests.append(test)
+        return lambda folder, uid: all(test(folder, uid) for test in tests)
+
+    def search_key(self, args, index):
+        """Parses the search key at args[index] into a test; returns it and the index after its arguments."""
+        arg = args[index]
+        index += 1
+        if isinstance(arg, list):
+            return self.search_matcher(arg), index
+        key = arg.upper()
+        if key == "ALL":
+            return lambda folder, uid: True, index
+        if key in ("FROM", "TO", "SUBJECT", "TEXT", "BODY"):
+            return self.text_test(key, args[index].lower()), index + 1
+        if key in ("SINCE", "BEFORE", "ON"):
+            return self.date_test(key, datetime.strptime(args[index], "%d-%b-%Y").date()), index + 1
+        if key in ("LARGER", "SMALLER"):
+            return self.size_test(key, int(args[index])), index + 1
+        if key in SEARCH_FLAGS:
+            return lambda folder, uid, flag=SEARCH_FLAGS[key]: flag in folder.flags[uid], index
+        if key == "UNSEEN":
+            return lambda folder, uid: "\\Seen" not in folder.flags[uid], index
+        if key == "KEYWORD":
+            return lambda folder, uid, keyword=args[index]: keyword in folder.flags[uid], index + 1
+        if key == "UID":
+            wanted = set(self.selected().resolve(args[index]))
+            return lambda folder, uid: uid in wanted, index + 1
+        if key == "NOT":
+            inner, index = self.search_key(args, index)
+            return lambda folder, uid: not inner(folder, uid), index
+        if key == "OR":
+            left, index = self.search_key(args, index)
+            right, index = self.search_key(args, index)
+            return lambda folder, uid: left(folder, uid) or right(folder, uid), index
+        if key == "X-GM-RAW" and "X-GM-EXT-1" in self.server.capabilities:
+            return self.gmail_raw_test(args[index]), index + 1
+        raise CommandError(f"Unsupported search key {arg}")
+
+    def gmail_raw_test(self, raw: str):
+        """The Gmail search operators the services emit: field:value, phrases, -negation, {OR} and (groups)."""
+        tokens = GMAIL_TOKEN.findall(raw)
+
+        def group(end: Optional[str]):
+            tests = []
+            while tokens and tokens[0] != end:
+                tests.append(term())
+            if end is not None:
+                tokens.pop(0)
+            return tests
+
+        def term():
+            token = tokens.pop(0)
+            if token == "-":
+                inner = term()
+                return lambda folder, uid: not inner(folder, uid)
+            if token in "({":
+                tests = group(")" if token == "(" else "}")
+                combine = all if token == "(" else any
+                return lambda folder, uid: combine(test(folder, uid) for test in tests)
+            operator, _, value = token.partition(":") if ":" in token and not token.startswith('"') else ("", "", token)
+            value = value.strip('"').lower()
+            match operator.lower():
+                case "from" | "to" | "subject":
+                    return self.text_test(operator.upper(), value)
+                case "after" | "before":
+                    day = datetime.strptime(value, "%Y/%m/%d").date()
+                    return self.date_test("SINCE" if operator == "after" else "BEFORE", day)
+                case "larger" | "smaller":
+                    return self.size_test(operator.upper(), int(value))
+                case "has" if value == "attachment":
+                    templates = self.server.store.mailbox.templates
+                    return lambda folder, uid: templates[folder.messages[uid].template].kind == "attachments"
+                case "is" | "in" if value in GMAIL_FLAGS:
+                    return lambda folder, uid, flag=GMAIL_FLAGS[value]: flag in folder.flags[uid]
+                case "label":
+                    return lambda folder, uid: value in {flag.lower() for flag in folder.flags[uid]}
+                case "":
+                    return self.text_test("TEXT", value)
+            raise CommandError(f"Unsupported X-GM-RAW term {token}")
+
+        tests = group(None)
+        return lambda folder, uid: all(test(folder, uid) for test in tests)
+
+    def size_test(self, key: str, size: int):
+        mailbox = self.server.store.mailbox
+
+        def test(folder, uid):
+            length = len(mailbox.raw(folder.messages[uid]))
+            return length > size if key == "LARGER" else length < size
+        return test
+
+    def text_test(self, key: str, needle: str):
+        templates = self.server.store.mailbox.templates
+
+        def test(folder, uid):
+            spec = folder.messages[uid]
+            if key == "FROM":
+                return needle in spec.sender.lower()
+            if key == "SUBJECT":
+                return needle in spec.subject.lower()
+            if key == "TO":
+                return needle in "benchmark <benchmark@example.com>"
+            if key == "BODY":
+                return needle in templates[spec.template].text
+            return needle in spec.subject.lower() or needle in spec.sender.lower() \
+                or needle in templates[spec.template].text
+        return test
+
+    @staticmethod
+    def date_test(key: str, day):
+        def test(folder, uid):
+            sent = folder.messages[uid].date.date()
+            return sent >= day if key == "SINCE" else sent < day if key == "BEFORE" else sent == day
+        return test
+
+    def uid_fetch(self, args):
+        folder = self.selected()
+        items = args[1] if isinstance(args[1], list) else [args[1]]
+        items = [item.upper() for item in items]
+        modifiers = [str(modifier).upper() for modifier in args[2]] if len(args) > 2 else []
+        uids = folder.resolve(args[0])
+        changed_since = None
+        if "CHANGEDSINCE" in modifiers:
+            if "CONDSTORE" not in self.server.capabilities:
+                raise CommandError("CONDSTORE is not enabled")
+            changed_since = int(modifiers[modifiers.index("CHANGEDSINCE") + 1])
+            uids = [uid for uid in uids if folder.modseqs[uid] > changed_since]
+        if "VANISHED" in modifiers:
+            if not self.qresync or changed_since is None:
+                raise CommandError("VANISHED needs QRESYNC enabled and CHANGEDSINCE")
+            vanished = sorted(uid for uid, modseq in folder.expunged.items() if modseq > changed_since)
+            if vanished:
+                self.send(f"* VANISHED (EARLIER) {join_uids(vanished)}")
+
+        for uid in uids:
+            sequence = bisect_left(folder.uids, uid) + 1
+            parts = [f"UID {uid}".encode()]
+            for item in items:
+                parts.append(self.fetch_item(folder, uid, item))
+            if changed_since is not None:
+                parts.append(b"MODSEQ (%d)" % folder.modseqs[uid])
+            self.wfile.write(f"* {sequence} FETCH (".encode() + b" ".join(parts) + b")\r\n")
+
+    def fetch_item(self, folder: Folder, uid: int, item: str) -> bytes:
+        spec = folder.messages[uid]
+        mailbox = self.server.store.mailbox
+        template = mailbox.templates[spec.template]
+        if item == "UID":
+            return b"UID %d" % uid
+        if item == "FLAGS":
+            return f"FLAGS ({' '.join(sorted(folder.flags[uid]))})".encode()
+        if item in ("RFC822", "BODY[]", "BODY.PEEK[]"):
+            self.mark_seen(folder, uid, item)
+            return (b"RFC822 " if item == "RFC822" else b"BODY[] ") + literal(mailbox.raw(spec))
+        if item == "RFC822.SIZE":
+            return b"RFC822.SIZE %d" % len(mailbox.raw(spec))
+        if item == "BODYSTRUCTURE":
+            return f"BODYSTRUCTURE {template.structure}".encode()
+        if item in ("X-GM-MSGID", "X-GM-THRID") and "X-GM-EXT-1" in self.server.capabilities:
+            # Copies keep their spec, so the ids survive COPY/MOVE like Gmail's do; a conversation is
+            # every message of one sender whose subject starts with the same word
+            if item == "X-GM-MSGID":
+                return b"X-GM-MSGID %d" % (GMAIL_ID_BASE + spec.uid)
+            return b"X-GM-THRID %d" % (GMAIL_ID_BASE + zlib.crc32(f"{spec.sender}|{spec.subject.split()[0]}".encode()))
+        if item == "INTERNALDATE":
+            return f'INTERNALDATE "{spec.date.strftime("%d-%b-%Y %H:%M:%S %z")}"'.encode()
+
+        match = SECTION.match(item)
+        if not match:
+            raise CommandError(f"Unsupported fetch item {item}")
+        section, start, length = match.groups()
+        data = self.section(spec, section)
+        key = f"BODY[{section}]"
+        if start is not None:
+            data = data[int(start):int(start) + int(length)]
+            key += f"<{start}>"
+        self.mark_seen(folder, uid, item)
+        return key.encode() + b" " + literal(data)
+
+    def section(self, spec: MessageSpec, section: str) -> bytes:
+        template = self.server.store.mailbox.templates[spec.template]
+        headers = header_block(spec, template)
+        name = section.upper()
+        if name == "":
+            return headers + template.body
+        if name == "HEADER":
+            return headers
+        if name == "TEXT":
+            return template.body
+        if name.startswith("HEADER.FIELDS"):
+            wanted = {field.upper() for field in name[name.index("(") + 1:name.index(")")].split()}
+            lines = [
+                line for line in headers.split(b"\r\n")
+                if line and line.split(b":", 1)[0].decode().upper() in wanted
+            ]
+            return b"".join(line + b"\r\n" for line in lines) + b"\r\n"
+        return template.parts.get(section, b"")
+
+    def mark_seen(self, folder: Folder, uid: int, item: str) -> None:
+        if ".PEEK" not in item and not self.readonly and "\\Seen" not in folder.flags[uid]:
+            folder.flags[uid].add("\\Seen")
+            folder.touch(uid)
+
+    def uid_store(self, args):
+        folder = self.selected()
+        mode = args[1].upper()
+        flags = set(args[2] if isinstance(args[2], list) else [args[2]])
+        for uid in folder.resolve(args[0]):
+            if mode.startswith("+"):
+                folder.flags[uid] |= flags
+            elif mode.startswith("-"):
+                folder.flags[uid] -= flags
+            else:
+                folder.flags[uid] = set(flags)
+            folder.touch(uid)
+            if not mode.endswith(".SILENT"):
+                sequence = bisect_left(folder.uids, uid) + 1
+                self.send(f"* {sequence} FETCH (UID {uid} FLAGS ({' '.join(sorted(folder.flags[uid]))}))")
+
+    def uid_copy(self, args, move: bool = False):
+        folder = self.selected()
+        target = self.server.store.folders.get(args[1])
+        if target is None:
+            raise CommandError(f"[TRYCREATE] No such folder {args[1]}", "NO")
+        uids = folder.resolve(args[0])
+        copied = [target.add(folder.messages[uid], folder.flags[uid] - {"\\Deleted"}) for uid in uids]
+        if move:
+            self.send(f"* OK [COPYUID {target.uidvalidity} {join_uids(uids)} {join_uids(copied)}] Moved")
+            for number in folder.remove(uids):
+                self.send(f"* {number} EXPUNGE")
+
+    def uid_move(self, args):
+        if "MOVE" not in self.server.capabilities:
+            raise CommandError("MOVE is not enabled")
+        self.uid_copy(args, move=True)
+
+    def uid_expunge(self, args):
+        if "UIDPLUS" not in self.server.capabilities:
+            raise CommandError("UIDPLUS is not enabled")
+        folder = self.selected()
+        wanted = set(folder.resolve(args[0]))
+        for number in folder.remove([uid for uid in folder.uids if uid in wanted and "\\Deleted" in folder.flags[uid]]):
+            self.send(f"* {number} EXPUNGE")
+
+
+def join_uids(uids: list[int]) -> str:
+    return ",".join(map(str, uids)) if uids else "0"
+
+
+class FakeIMAPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, mailbox: Mailbox, host: str = "127.0.0.1", port: int = 0,
+                 tls_context: Optional[ssl.SSLContext] = None, latency: float = 0.0,
+                 capabilities: tuple[str, ...] = DEFAULT_CAPABILITIES):
+        """
+        :param latency: Seconds slept before every command, to imitate a remote server's round trip.
+        :param capabilities: Drop MOVE or UIDPLUS to exercise the trash fallbacks.
+        """
+        self.store = MailStore(mailbox)
+        self.tls_context = tls_context
+        self.latency = latency
+        self.capabilities = {capability.upper() for capability in capabilities}
+        self.capability_line = " ".join(capabilities)
+        super().__init__((host, port), IMAPHandler)
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name="fake-imap", daemon=True)
+        thread.start()
+        return thread
+
+
+def make_tls_context() -> ssl.SSLContext:
+    """Server context with a throwaway self-signed certificate made by the openssl command line tool."""
+    if shutil.which("openssl") is None:
+        raise RuntimeError("TLS mode needs the openssl command line tool")
+    directory = Path(tempfile.mkdtemp(prefix="fake-imap-"))
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+         "-keyout", str(key), "-out", str(cert)],
+        check=True, capture_output=True
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(str(cert), str(key))
+    return context
+
+
+def serve(count: int, seed: int, tls: bool, latency: float, capabilities: tuple[str, ...], ready) -> None:
+    """Process entry point: builds the mailbox, serves it and reports the port through `ready`."""
+    server = FakeIMAPServer(
+        Mailbox(count, seed), tls_context=make_tls_context() if tls else None,
+        latency=latency, capabilities=capabilities
+    )
+    ready.put(server.port)
+    server.serve_forever()
@@ -0,0 +1,271 @@
+"""
+Benchmarks for the IMAP services against the local fake server.
+
+Every (mailbox size, case) pair gets a fresh server process and a fresh
+client process, so destructive cases start from a full mailbox and the
+peak RSS of one case is not inherited by the next.
+
+    python benchmarks/run.py
+    python benchmarks/run.py --sizes 1000 10000 100000 --cases details export --tls
+    python benchmarks/run.py --latency 0.02 --json results.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import ssl
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from imapclient import IMAPClient  # noqa: E402
+from services import (  # noqa: E402
+    SearchEmails, EmailDetailsExtractor, SenderAggregator, UIDSet, get_metrics, sorted_emails, export_emails_to_csv,
+    group_threads
+)
+from services.imap import EmailTrashService, FETCH_BATCH_SIZE  # noqa: E402
+from fake_imap import DEFAULT_CAPABILITIES, TRASH_FOLDER, serve  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+DEFAULT_SIZES = (1_000, 10_000)  # 100_000 works too, but takes minutes per case
+SEARCH_FILTERS = (
+    {},
+    {"sender": "sender1@"},
+    {"subject": "invoice"},
+    {"text": "security"},
+    {"since": "01-Jan-2023", "before": "01-Jan-2024"},
+)
+SEARCH_REPEATS = 3
+SORT_REPEATS = 5
+
+
+class Timer:
+    """Collects the time between successive `tick()` calls as latencies."""
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.latencies: list[float] = []
+
+    def tick(self) -> None:
+        now = time.perf_counter()
+        self.latencies.append(now - self.last)
+        self.last = now
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
+def per_batch(records: Iterable[dict], timer: Timer, batch_size: int = FETCH_BATCH_SIZE) -> Iterator[dict]:
+    count = 0
+    for record in records:
+        yield record
+        count += 1
+        if count % batch_size == 0:
+            timer.tick()
+    if count % batch_size:
+        timer.tick()
+
+
+# CASES: each returns (items processed, Timer)
+
+def case_search(conn: IMAPClient, uids: UIDSet) -> tuple[int, Timer]:
+    timer = Timer()
+    for _ in range(SEARCH_REPEATS):
+        for filters in SEARCH_FILTERS:
+            SearchEmails(filters, conn).get_email_ids("INBOX")
+            timer.tick()
+    return SEARCH_REPEATS * len(SEARCH_FILTERS), timer
+
+
+def case_details(conn: IMAPClient, uids: UIDSet) -> tuple[int, Timer]:
+    timer = Timer()
+    count = sum(1 for _ in per_batch(EmailDetailsExtractor(conn, uids).iter_email_details(), timer))
+    return count, timer
+
+
+def case_preview(conn: IMAPClient, uids: UIDSet) -> tuple[int, Timer]:
+    timer = Timer()
+    count = sum(1 for _ in per_batch(EmailDetailsExtractor(conn, uids).iter_preview_details(), timer))
+    return count, timer
+
+
+def case_sorted_emails(conn: IMAPClient, uids: UIDSet) -> tuple[int, Timer]:
+    # Only the grouping is timed; the FROM headers are fetched once beforehand
+    emails = EmailDetailsExtractor(conn, uids).fetch_curtain_email_details()
+    timer = Timer()
+    for _ in range(SORT_REPEATS):
+        sorted_emails(emails)
+        timer.tick()
+    return SORT_REPEATS * len(emails), timer
+
+
+def case_senders(conn: IMAPClient, uids: UIDSet) -> tuple[int, Timer]:
+    timer = Timer()
+    SenderAggregator(conn, uids).aggregate(progress=lambda done, total: timer.tick())
+    return len(uids), timer
+
+
+def case_threads(conn: IMAPClient, uids: UIDSet) -> tuple[int, Timer]:
+    timer = Timer()
+    group_threads(per_batch(EmailDetailsExtractor(conn, uids).iter_envelopes(), timer))
+    return len(uids), timer
+
+
+def case_trash(conn: IMAPClient, uids: UIDSet) -> tuple[int, Timer]:
+    timer = Timer()
+    moved, info = EmailTrashService(conn, TRASH_FOLDER).move_to_trash(uids, progress=lambda done, total: timer.tick())
+    if not moved:
+        raise RuntimeError(info)
+    return len(uids), timer
+
+
+def case_export(conn: IMAPClient, uids: UIDSet) -> tuple[int, Timer]:
+    timer = Timer()
+    with tempfile.TemporaryDirectory() as directory:
+        records = EmailDetailsExtractor(conn, uids).iter_email_details()
+        written = export_emails_to_csv(os.path.join(directory, "export.csv"), records, progress=lambda rows: timer.tick())
+    return written, timer
+
+
+CASES: dict[str, Callable[[IMAPClient, UIDSet], tuple[int, Timer]]] = {
+    "search": case_search,
+    "details": case_details,
+    "preview": case_preview,
+    "sorted_emails": case_sorted_emails,
+    "senders": case_senders,
+    "threads": case_threads,
+    "trash": case_trash,
+    "export": case_export,
+}
+
+
+def peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+
+
+def connect(port: int, tls: bool) -> IMAPClient:
+    context = None
+    if tls:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE  # the fake server's certificate is self-signed
+    conn = IMAPClient("127.0.0.1", port=port, ssl=tls, ssl_context=context, use_uid=True)
+    # IMAPClient writes a command in several small sends; without this, Nagle's algorithm
+    # meets delayed ACKs on localhost and every such command stalls for ~40ms
+    conn.socket().setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    conn.login("benchmark@example.com", "benchmark")
+    return conn
+
+
+def run_case(case: str, port: int, tls: bool, results) -> None:
+    """Client process entry point."""
+    conn = connect(port, tls)
+    conn.select_folder("INBOX")
+    uids = UIDSet(conn.search(["ALL"]))
+    setup_rss = peak_rss_mb()
+    get_metrics().reset()
+
+    items, timer = CASES[case](conn, uids)
+    elapsed = timer.elapsed
+    conn.logout()
+
+    results.put({
+        "items": items,
+        "seconds": elapsed,
+        "latencies": timer.latencies,
+        "setup_rss_mb": setup_rss,
+        "peak_rss_mb": peak_rss_mb(),
+        "metrics": get_metrics().snapshot(),
+    })
+
+
+def percentiles(latencies: list[float]) -> tuple[float, float, float]:
+    if len(latencies) < 2:
+        value = latencies[0] if latencies else 0.0
+        return value, value, value
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def benchmark(size: int, case: str, args: argparse.Namespace) -> dict:
+    context = multiprocessing.get_context("spawn")
+    ready, results = context.Queue(), context.Queue()
+    server = context.Process(
+        target=serve, args=(size, args.seed, args.tls, args.latency, tuple(args.capabilities), ready), daemon=True
+    )
+    server.start()
+    try:
+        port = ready.get(timeout=600)
+        client = context.Process(target=run_case, args=(case, port, args.tls, results))
+        client.start()
+        result = results.get(timeout=args.timeout)
+        client.join()
+    finally:
+        server.terminate()
+        server.join()
+
+    p50, p95, p99 = percentiles(result["latencies"])
+    return {
+        "size": size,
+        "case": case,
+        "items": result["items"],
+        "seconds": round(result["seconds"], 4),
+        "items_per_second": round(result["items"] / result["seconds"], 1) if result["seconds"] else None,
+        "p50_ms": round(p50 * 1000, 2),
+        "p95_ms": round(p95 * 1000, 2),
+        "p99_ms": round(p99 * 1000, 2),
+        "setup_rss_mb": result["setup_rss_mb"] and round(result["setup_rss_mb"], 1),
+        "peak_rss_mb": result["peak_rss_mb"] and round(result["peak_rss_mb"], 1),
+        "metrics": result["metrics"],  # per-stage timings recorded by the services themselves
+    }
+
+
+COLUMNS = ("size", "case", "items", "seconds", "items_per_second", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+
+
+def print_row(row: dict) -> None:
+    print("  ".join(f"{str(row[column]):>16}" for column in COLUMNS), flush=True)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="messages per mailbox")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--tls", action="store_true", help="serve over TLS instead of plain TCP")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the server waits before each command")
+    parser.add_argument("--capabilities", nargs="+", default=list(DEFAULT_CAPABILITIES),
+                        help="advertised capabilities; drop MOVE/UIDPLUS to time the trash fallbacks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=3600, help="seconds allowed per case")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    print("  ".join(f"{column:>16}" for column in COLUMNS))
+    rows = []
+    for size in args.sizes:
+        for case in args.cases:
+            row = benchmark(size, case, args)
+            rows.append(row)
+            print_row(row)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(rows, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
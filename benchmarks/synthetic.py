@@ -0,0 +1,174 @@
+"""
+Synthetic mailboxes for the benchmarks.
+
+Messages are cheap to hold in memory even at 100k: every message gets its
+own headers, but its body is one of a few hundred prebuilt templates
+covering plain text, HTML, multipart/alternative and attachment-heavy
+mail. Sender popularity follows a power law, like a real inbox.
+"""
+import base64
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Optional
+
+
+TEMPLATE_COUNT = 400  # distinct bodies shared by all messages
+KIND_WEIGHTS = {"plain": 45, "html": 25, "alternative": 20, "attachments": 10}  # percent of messages
+ATTACHMENT_BYTES = (20_000, 200_000)  # size range of one attachment before base64
+SENDERS_PER_MESSAGE = 0.05  # distinct senders relative to mailbox size
+
+WORDS = (
+    "invoice meeting report update project deadline budget review offer newsletter account "
+    "delivery order payment schedule team release feedback security password travel booking "
+    "receipt subscription discount event webinar contract proposal draft summary weekly "
+    "monthly quarterly urgent reminder holiday shipping tracking support ticket survey"
+).split()
+
+
+@dataclass
+class BodyTemplate:
+    kind: str
+    content_type: str  # Content-Type header line, including boundary
+    body: bytes  # everything after the header block
+    parts: dict[str, bytes]  # IMAP section number -> encoded part content
+    structure: str  # BODYSTRUCTURE in IMAP syntax
+    text: str  # lower-cased searchable text of the body
+
+
+@dataclass
+class MessageSpec:
+    uid: int
+    sender: str
+    subject: str
+    date: datetime
+    template: int
+
+
+class Mailbox:
+    """
+    A generated folder: one MessageSpec per UID and the shared body templates.
+    The same (count, seed) always yields the same mailbox.
+    """
+    def __init__(self, count: int, seed: int = 0, templates: Optional[list[BodyTemplate]] = None):
+        rng = random.Random(seed)
+        self.templates = templates or [make_template(rng, index) for index in range(TEMPLATE_COUNT)]
+        self.messages = [make_spec(rng, uid, count, len(self.templates)) for uid in range(1, count + 1)]
+
+    def raw(self, spec: MessageSpec) -> bytes:
+        template = self.templates[spec.template]
+        return header_block(spec, template) + template.body
+
+
+def make_spec(rng: random.Random, uid: int, count: int, templates: int) -> MessageSpec:
+    senders = max(10, int(count * SENDERS_PER_MESSAGE))
+    sender = min(int(rng.paretovariate(1.2)), senders)
+    start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    return MessageSpec(
+        uid=uid,
+        sender=f"Sender {sender} <sender{sender}@example{sender % 7}.com>",
+        subject=" ".join(rng.choices(WORDS, k=rng.randint(2, 7))).capitalize(),
+        date=start + timedelta(seconds=int(3 * 365 * 86400 * uid / max(count, 1))),
+        template=rng.randrange(templates),
+    )
+
+
+def header_block(spec: MessageSpec, template: BodyTemplate) -> bytes:
+    return (
+        f"From: {spec.sender}\r\n"
+        f"To: Benchmark <benchmark@example.com>\r\n"
+        f"Subject: {spec.subject}\r\n"
+        f"Date: {format_datetime(spec.date)}\r\n"
+        f"Message-ID: <{spec.uid}.bench@example.com>\r\n"
+        f"MIME-Version: 1.0\r\n"
+        f"{template.content_type}\r\n"
+        f"\r\n"
+    ).encode()
+
+
+def make_paragraphs(rng: random.Random) -> list[str]:
+    return [
+        " ".join(rng.choices(WORDS, k=rng.randint(20, 80))).capitalize() + "."
+        for _ in range(rng.randint(1, 12))
+    ]
+
+
+def text_part(subtype: str, content: str, disposition: str = "NIL") -> tuple[bytes, str]:
+    encoded = content.replace("\n", "\r\n").encode()
+    lines = encoded.count(b"\n") + 1
+    structure = (
+        f'("text" "{subtype}" ("charset" "utf-8") NIL NIL "7bit" {len(encoded)} {lines} NIL {disposition} NIL NIL)'
+    )
+    return encoded, structure
+
+
+def attachment_part(rng: random.Random, index: int) -> tuple[bytes, str, str]:
+    payload = rng.randbytes(rng.randint(*ATTACHMENT_BYTES))
+    encoded = base64.encodebytes(payload).replace(b"\n", b"\r\n")
+    name = f"file{index}.bin"
+    structure = (
+        f'("application" "octet-stream" ("name" "{name}") NIL NIL "base64" {len(encoded)} NIL '
+        f'("attachment" ("filename" "{name}")) NIL NIL)'
+    )
+    headers = (
+        f"Content-Type: application/octet-stream; name=\"{name}\"\r\n"
+        f"Content-Transfer-Encoding: base64\r\n"
+        f"Content-Disposition: attachment; filename=\"{name}\"\r\n"
+    )
+    return encoded, structure, headers
+
+
+def multipart(boundary: str, parts: list[tuple[str, bytes]]) -> bytes:
+    body = b""
+    for headers, content in parts:
+        body += f"--{boundary}\r\n{headers}\r\n".encode() + content + b"\r\n"
+    return body + f"--{boundary}--\r\n".encode()
+
+
+def make_template(rng: random.Random, index: int) -> BodyTemplate:
+    kind = rng.choices(list(KIND_WEIGHTS), weights=list(KIND_WEIGHTS.values()))[0]
+    paragraphs = make_paragraphs(rng)
+    plain = "\n\n".join(paragraphs)
+    html = "<html><head><style>p{margin:0}</style></head><body>" + "".join(
+        f"<p>{paragraph}</p>" for paragraph in paragraphs
+    ) + "</body></html>"
+    text = plain.lower()
+    text_headers = 'Content-Type: text/{0}; charset="utf-8"\r\nContent-Transfer-Encoding: 7bit\r\n'
+
+    if kind in ("plain", "html"):
+        content, structure = text_part(kind, plain if kind == "plain" else html)
+        return BodyTemplate(
+            kind, f'Content-Type: text/{kind}; charset="utf-8"\r\nContent-Transfer-Encoding: 7bit',
+            content, {"1": content}, structure, text
+        )
+
+    boundary = f"=_alt_{index}"
+    plain_content, plain_structure = text_part("plain", plain)
+    html_content, html_structure = text_part("html", html)
+    alternative = multipart(boundary, [
+        (text_headers.format("plain"), plain_content), (text_headers.format("html"), html_content)
+    ])
+    alternative_structure = f'({plain_structure}{html_structure} "alternative" ("boundary" "{boundary}") NIL NIL NIL)'
+
+    if kind == "alternative":
+        return BodyTemplate(
+            kind, f'Content-Type: multipart/alternative; boundary="{boundary}"',
+            alternative, {"1": plain_content, "2": html_content}, alternative_structure, text
+        )
+
+    mixed = f"=_mixed_{index}"
+    parts = [(f'Content-Type: multipart/alternative; boundary="{boundary}"\r\n', alternative)]
+    sections = {"1": alternative, "1.1": plain_content, "1.2": html_content}
+    structures = [alternative_structure]
+    for number in range(rng.randint(1, 3)):
+        content, structure, headers = attachment_part(rng, number)
+        parts.append((headers, content))
+        sections[str(number + 2)] = content
+        structures.append(structure)
+
+    return BodyTemplate(
+        kind, f'Content-Type: multipart/mixed; boundary="{mixed}"',
+        multipart(mixed, parts), sections,
+        f'({"".join(structures)} "mixed" ("boundary" "{mixed}") NIL NIL NIL)', text
+    )
@@ -1,3 +1,5 @@
+import multiprocessing
+
 import flet as ft
 import pages
 import config
@@ -40,6 +42,12 @@ def main(page: ft.Page):
         conn = page.session.get("conn")
         if conn:
             conn.logout()
+        pool = page.session.get("pool")
+        if pool:
+            pool.close()
+        cache = page.session.get("cache")
+        if cache:
+            cache.close()
 
 
     page.on_close = on_app_close
@@ -49,4 +57,8 @@ def main(page: ft.Page):
     page.go(page.route)
     # page.go("/home")
 
-ft.app(main)
\ No newline at end of file
+
+if __name__ == "__main__":
+    # Parser processes are spawned on Windows and macOS and re-import this module; only the parent opens a window
+    multiprocessing.freeze_support()
+    ft.app(main)
@@ -0,0 +1,302 @@
+"""
+Headless batch runner: searches a folder with the same services the app uses,
+streams the matching emails to stdout or a file and can move them to the Bin.
+It never imports Flet, so it starts in a fraction of a second.
+
+    python src/cli.py --email me@gmail.com --sender news@ --since 01-Jan-2024 > news.csv
+    python src/cli.py --email me@gmail.com --subject invoice --output invoices.parquet
+    python src/cli.py --email me@gmail.com --sender offers@ --count --delete --dry-run
+    python src/cli.py --email me@gmail.com --sender a@ --sender b@ --has-attachment --larger 5000000
+
+The password is read from $EMAIL_PASSWORD (a .env file works too) or prompted
+for on a terminal; it is never taken from the command line.
+"""
+import argparse
+import getpass
+import logging
+import os
+import sys
+from typing import Iterable, Iterator
+
+from dotenv import load_dotenv
+from imapclient.exceptions import IMAPClientError
+
+from services import (
+    EmailConnectionService, SearchEmails, EmailSearchError, ExportError, open_cache, get_metrics,
+    export_emails_to_csv, export_emails_to_arrow, write_emails_csv, write_emails_jsonl, open_export_file, CSV_COLUMNS,
+    EXPORT_COLUMNS, IMAPConnectionPool, MultiFolderSearch, FolderResult, Query, QueryError, Term, Not, all_of, any_of
+)
+from services.multisearch import DEFAULT_ACCOUNT_CONCURRENCY
+from services.imap import EmailTrashService, EmailFilter
+
+
+FORMATS = ("csv", "jsonl", "parquet", "arrow")
+SUFFIX_FORMATS = {".jsonl": "jsonl", ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+SENDER_COLUMNS = ("sender", "count")
+THREAD_COLUMNS = ("thread", "subject", "count", "senders")
+MERGED_COLUMNS = ("from", "subject", "date", "folder", "uid", "message_id")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    account = parser.add_argument_group("account")
+    account.add_argument("--email", default=os.environ.get("EMAIL_ADDRESS"), help="login; defaults to $EMAIL_ADDRESS")
+    account.add_argument("--password-env", default="EMAIL_PASSWORD", metavar="NAME",
+                         help="environment variable holding the password (default: EMAIL_PASSWORD)")
+    account.add_argument("--server", default="imap.gmail.com")
+    account.add_argument("--port", type=int, default=993)
+    account.add_argument("--no-ssl", action="store_true", help="plain IMAP, for local bridges only")
+
+    filters = parser.add_argument_group("filters")
+    filters.add_argument("--folder", action="append",
+                         help="INBOX by default; repeat to search several folders, merging copies by Message-ID")
+    filters.add_argument("--sender", action="append", help="repeat to match any of several senders")
+    filters.add_argument("--exclude-sender", action="append", metavar="SENDER")
+    filters.add_argument("--subject")
+    filters.add_argument("--since", metavar="DD-Mon-YYYY")
+    filters.add_argument("--before", metavar="DD-Mon-YYYY")
+    filters.add_argument("--text", help="full-text search in subject and body")
+    filters.add_argument("--larger", type=int, metavar="BYTES")
+    filters.add_argument("--smaller", type=int, metavar="BYTES")
+    filters.add_argument("--has-attachment", action="store_true")
+    filters.add_argument("--unread", action="store_true")
+    filters.add_argument("--flagged", action="store_true", help="flagged, or starred on Gmail")
+    filters.add_argument("--label", action="append", help="Gmail label (an IMAP keyword elsewhere)")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--output", "-o", default="-", help="file to write, or - for stdout (default)")
+    output.add_argument("--format", choices=FORMATS,
+                        help="defaults to the output suffix (.jsonl, .parquet, .arrow), else csv; .gz compresses")
+    output.add_argument("--preview", action="store_true", help="body snippets only, much less to download")
+    output.add_argument("--senders", action="store_true", help="write (sender, count) rows instead of emails")
+    output.add_argument("--top", type=int, help="with --senders, only the largest N senders")
+    output.add_argument("--threads", action="store_true", help="write one row per conversation instead of emails")
+    output.add_argument("--count", action="store_true", help="only report how many emails match")
+    output.add_argument("--workers", type=int, help="processes parsing MIME bodies")
+    output.add_argument("--connections", type=int, default=DEFAULT_ACCOUNT_CONCURRENCY,
+                        help="folders searched at once with several --folder")
+    output.add_argument("--metrics", metavar="PATH", help="write stage timings as JSON, or OpenMetrics for .prom")
+
+    actions = parser.add_argument_group("actions")
+    actions.add_argument("--delete", action="store_true", help="move the matching emails to the Bin afterwards")
+    actions.add_argument("--dry-run", action="store_true", help="with --delete, report what would be moved")
+    actions.add_argument("--trash-folder", default="[Gmail]/Bin")
+
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor update the local message cache")
+    parser.add_argument("--verbose", "-v", action="store_true")
+
+    args = parser.parse_args(argv)
+    if not args.email:
+        parser.error("--email is required (or set $EMAIL_ADDRESS)")
+    args.folder = args.folder or ["INBOX"]
+    if len(args.folder) > 1 and (args.delete or args.senders or args.threads or args.preview):
+        parser.error("--delete, --senders, --threads and --preview work on a single --folder")
+    if args.senders and args.threads:
+        parser.error("choose either --senders or --threads")
+    if args.top is not None and args.top <= 0:
+        parser.error("--top must be a positive number")
+    if args.format is None:
+        suffix = os.path.splitext(args.output.removesuffix(".gz"))[1].lower()
+        args.format = SUFFIX_FORMATS.get(suffix, "csv")
+    if args.format in ("parquet", "arrow") and args.output == "-":
+        parser.error(f"{args.format} output needs --output FILE")
+    if (args.senders or args.threads) and args.format in ("parquet", "arrow"):
+        parser.error("--senders and --threads write csv or jsonl")
+    try:
+        args.filters = search_filters(args)
+    except QueryError as error:
+        parser.error(error.message)
+    return args
+
+
+def read_password(variable: str) -> str | None:
+    password = os.environ.get(variable)
+    if password is None and sys.stdin.isatty():
+        password = getpass.getpass("Password: ")
+    return password
+
+
+def sender_rows(search: SearchEmails, top: int | None) -> Iterator[dict]:
+    for sender, data in search.get_sender_groups(top=top):
+        yield {"sender": sender, "count": data["count"]}
+
+
+def thread_rows(search: SearchEmails) -> Iterator[dict]:
+    for key, data in search.get_threads():
+        yield {"thread": key, "subject": data["subject"], "count": data["count"], "senders": " ".join(data["senders"])}
+
+
+def write_records(records: Iterable[dict], args: argparse.Namespace) -> int:
+    if args.format in ("parquet", "arrow"):
+        return export_emails_to_arrow(args.output, records, file_format=args.format)
+
+    if args.senders:
+        columns = SENDER_COLUMNS
+    elif args.threads:
+        columns = THREAD_COLUMNS
+    elif len(args.folder) > 1:
+        columns = MERGED_COLUMNS
+    else:
+        columns = EXPORT_COLUMNS if args.format == "jsonl" else CSV_COLUMNS
+
+    if args.format == "jsonl":
+        if args.output == "-":
+            return write_emails_jsonl(sys.stdout, records, columns)
+        with open_export_file(args.output) as file:
+            return write_emails_jsonl(file, records, columns)
+
+    if args.output == "-":
+        return write_emails_csv(sys.stdout, records, columns)
+    return export_emails_to_csv(args.output, records, columns)
+
+
+def search_filters(args: argparse.Namespace) -> dict[str, str] | Query:
+    """
+    The classic single-value filters stay an EmailFilter dict, which the local index can
+    answer offline; anything richer becomes a query compiled for the server.
+    """
+    senders = args.sender or []
+    richer = (len(senders) > 1 or args.exclude_sender or args.label or args.larger is not None
+              or args.smaller is not None or args.has_attachment or args.unread or args.flagged)
+    if not richer:
+        filters = {key: getattr(args, key) for key in ("subject", "since", "before", "text")}
+        filters["sender"] = senders[0] if senders else None
+        EmailFilter(**filters).to_query()  # rejects malformed dates before connecting
+        return filters
+
+    terms = [Term(key, getattr(args, key)) for key in ("subject", "since", "before", "text", "larger", "smaller")
+             if getattr(args, key) is not None]
+    if senders:
+        terms.append(any_of(*(Term("from", sender) for sender in senders)))
+    terms += [Not(Term("from", sender)) for sender in args.exclude_sender or []]
+    terms += [Term("label", label) for label in args.label or []]
+    if args.has_attachment:
+        terms.append(Term("has_attachment"))
+    if args.unread:
+        terms.append(Not(Term("flag", "seen")))
+    if args.flagged:
+        terms.append(Term("flag", "flagged"))
+    return all_of(*terms)
+
+
+def merged_messages(results: Iterable[FolderResult], failed: list[FolderResult]) -> Iterator[dict]:
+    for result in results:
+        if result.error:
+            failed.append(result)
+        logging.info("%s: %d match(es), %d already found in another folder",
+                     result.target.folder, result.matched, result.duplicates)
+        yield from result.messages
+
+
+def run_folders(args: argparse.Namespace, service: EmailConnectionService) -> int:
+    """Searches every --folder at once; a message found in several of them is written once."""
+    pool = IMAPConnectionPool(service, size=args.connections)
+    cache = None if args.no_cache else open_cache()
+    search = MultiFolderSearch(
+        {args.email: pool}, [(args.email, folder) for folder in args.folder], args.filters,
+        concurrency=args.connections, cache=cache
+    )
+    failed = []
+    try:
+        if args.count:
+            for _ in merged_messages(search.iter_results(), failed):
+                pass
+            print(len(search.merged))
+        else:
+            written = write_records(merged_messages(search.iter_results(), failed), args)
+            logging.info("wrote %d row(s) to %s", written, "stdout" if args.output == "-" else args.output)
+    except ExportError as error:
+        logging.error(error.message)
+        return 1
+    finally:
+        pool.close()
+        if cache is not None:
+            cache.close()
+
+    for result in failed:
+        logging.error(f"{result.target.folder}: {result.error}")
+    return 1 if failed else 0
+
+
+def run(args: argparse.Namespace, password: str) -> int:
+    service = EmailConnectionService(args.email, password, args.server, args.port, use_ssl=not args.no_ssl)
+    if len(args.folder) > 1:
+        return run_folders(args, service)
+
+    conn = service.connect()
+    if isinstance(conn, str):
+        logging.error(conn)
+        return 1
+
+    cache = None if args.no_cache else open_cache()
+    folder = args.folder[0]
+    try:
+        search = SearchEmails(args.filters, conn, cache=cache, account=args.email)
+        ids = search.get_email_ids(folder)
+        logging.info("%d email(s) match in %s", len(ids), folder)
+        if args.count:
+            print(len(ids))
+        else:
+            if args.senders:
+                records = sender_rows(search, args.top)
+            elif args.threads:
+                records = thread_rows(search)
+            elif args.preview:
+                records = search.iter_preview_data()
+            else:
+                records = search.iter_email_data(workers=args.workers)
+            written = write_records(records, args)
+            logging.info("wrote %d row(s) to %s", written, "stdout" if args.output == "-" else args.output)
+
+        if args.delete and args.dry_run:
+            print(f"Dry run: would move {len(ids)} message(s) from {folder} to {args.trash_folder}.", file=sys.stderr)
+        elif args.delete and ids:
+            moved, info = EmailTrashService(conn, args.trash_folder).move_to_trash(ids)
+            if not moved:
+                logging.error(info)
+                return 1
+            print(info, file=sys.stderr)
+    except (EmailSearchError, ExportError, QueryError) as error:
+        logging.error(error.message)
+        return 1
+    except IMAPClientError as error:
+        logging.error(f"IMAP error: {error}")
+        return 1
+    finally:
+        try:
+            conn.logout()
+        except (IMAPClientError, OSError):
+            pass
+        if cache is not None:
+            cache.close()
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    load_dotenv()
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(levelname)s: %(message)s")
+
+    password = read_password(args.password_env)
+    if password is None:
+        logging.error(f"Set ${args.password_env} to the account password")
+        return 2
+
+    try:
+        status = run(args, password)
+    except BrokenPipeError:
+        # The reader (e.g. `head`) went away; silence the flush at exit instead of a traceback
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+
+    if args.metrics:
+        if args.metrics.endswith(".prom"):
+            get_metrics().write_openmetrics(args.metrics)
+        else:
+            get_metrics().write_json(args.metrics)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
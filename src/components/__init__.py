@@ -1 +1,3 @@
-from .appbar import AppBar
\ No newline at end of file
+from .appbar import AppBar
+from .paged_list import PagedListView
+from .diagnostics import DiagnosticsDialog
@@ -32,6 +32,9 @@ class AppBar(ft.AppBar):
         try:
             if isinstance(conn, IMAPClient):
                 conn.logout()
+            pool = self.page.session.get("pool")
+            if pool:
+                pool.close()
         except Exception as e:
             print(e)
 
@@ -0,0 +1,69 @@
+import flet as ft
+from pathlib import Path
+from services import Metrics, throughput
+
+
+class DiagnosticsDialog(ft.AlertDialog):
+    """
+    Shows the per-stage latencies and counters collected by the services,
+    and saves them as JSON or OpenMetrics text next to the user's files.
+    """
+
+    def __init__(self, metrics: Metrics, directory: str):
+        self.metrics = metrics
+        self.directory = Path(directory)
+        self.table = ft.Column(scroll=ft.ScrollMode.AUTO, height=360, width=560)
+        self.status = ft.Text(size=12)
+
+        super().__init__(
+            title=ft.Text("Diagnostics"),
+            content=ft.Column([self.table, self.status], tight=True),
+            actions=[
+                ft.TextButton("Save JSON", on_click=lambda e: self.save("json")),
+                ft.TextButton("Save OpenMetrics", on_click=lambda e: self.save("prom")),
+                ft.TextButton("Reset", on_click=lambda e: self.reset()),
+                ft.TextButton("Close", on_click=lambda e: self.page.close(self)),
+            ],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+
+    def refresh(self) -> None:
+        snapshot = self.metrics.snapshot()
+        rows = [ft.Text("Stage: calls · mean · p50 · p95 · max (ms)", weight=ft.FontWeight.BOLD)]
+        for stage, summary in snapshot["stages"].items():
+            rows.append(ft.Text(
+                f"{stage}: {summary['count']} · {summary['mean'] * 1000:.1f} · {summary['p50'] * 1000:.1f} · "
+                f"{summary['p95'] * 1000:.1f} · {summary['max'] * 1000:.1f}",
+                selectable=True
+            ))
+
+        rows.append(ft.Text("Counters", weight=ft.FontWeight.BOLD))
+        for name, value in sorted(snapshot["counters"].items()):
+            rows.append(ft.Text(f"{name}: {value:g}", selectable=True))
+
+        rows.append(ft.Text("Throughput", weight=ft.FontWeight.BOLD))
+        for stage, rates in throughput(snapshot).items():
+            rows.append(ft.Text(
+                f"{stage}: {rates['messages_per_second']:.0f} msg/s · {rates['bytes_per_second'] / 1024:.0f} KiB/s",
+                selectable=True
+            ))
+
+        self.table.controls = rows
+        self.status.value = ""
+
+    def save(self, kind: str) -> None:
+        path = self.directory / f"emailparser-metrics.{kind}"
+        try:
+            if kind == "json":
+                self.metrics.write_json(path)
+            else:
+                self.metrics.write_openmetrics(path)
+            self.status.value = f"Saved to {path}"
+        except OSError as error:
+            self.status.value = f"Could not save: {error}"
+        self.update()
+
+    def reset(self) -> None:
+        self.metrics.reset()
+        self.refresh()
+        self.update()
@@ -0,0 +1,95 @@
+import flet as ft
+from typing import Any, Callable, Optional, Sequence
+
+
+class PagedListView(ft.Column):
+    """
+    Results list that only materializes one page of rows at a time.
+
+    Row controls are created once by `make_row` and recycled: turning the
+    page refills the same controls through `fill_row`, so the client only
+    receives changed text instead of a new control tree per result.
+    """
+
+    def __init__(self, lv_style: dict, page_size: int = 50):
+        self.page_size = page_size
+        self.items: list[Any] = []
+        self.page_index = 0
+        self.rows: list[ft.Control] = []
+        self.make_row: Optional[Callable[[], ft.Control]] = None
+        self.fill_row: Optional[Callable[[ft.Control, Any], None]] = None
+
+        self.lv = ft.ListView(**lv_style)
+        self.prev_button = ft.IconButton(ft.Icons.CHEVRON_LEFT, on_click=lambda e: self.go_to(self.page_index - 1))
+        self.next_button = ft.IconButton(ft.Icons.CHEVRON_RIGHT, on_click=lambda e: self.go_to(self.page_index + 1))
+        self.page_label = ft.Text()
+        self.pager = ft.Row(
+            [self.prev_button, self.page_label, self.next_button],
+            alignment=ft.MainAxisAlignment.CENTER,
+            visible=False
+        )
+
+        super().__init__([ft.Container(content=self.lv, expand=True), self.pager], expand=True)
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self.items) // self.page_size))
+
+    def set_row_factory(self, make_row: Callable[[], ft.Control], fill_row: Callable[[ft.Control, Any], None]) -> None:
+        """Switches the row layout; previously recycled rows belong to the old layout and are dropped."""
+        if make_row != self.make_row:
+            self.rows = []
+            self.lv.controls = []
+        self.make_row = make_row
+        self.fill_row = fill_row
+
+    def set_items(self, items: Sequence[Any]) -> None:
+        # own copy, so append_items can extend it in place
+        self.items = list(items)
+        self.page_index = 0
+        self.render()
+
+    def append_items(self, items: Sequence[Any]) -> None:
+        """Adds items at the end, re-rendering only if the visible page is not full yet."""
+        visible_before = len(self.items) - self.page_index * self.page_size
+        self.items.extend(items)
+        if visible_before < self.page_size:
+            self.render()
+        else:
+            self._render_pager()
+
+    def remove_where(self, predicate: Callable[[Any], bool]) -> None:
+        self.items = [item for item in self.items if not predicate(item)]
+        self.page_index = min(self.page_index, self.page_count - 1)
+        self.render()
+
+    def clear(self) -> None:
+        self.set_items([])
+
+    def go_to(self, page_index: int) -> None:
+        if 0 <= page_index < self.page_count and page_index != self.page_index:
+            self.page_index = page_index
+            self.render()
+            self.update()
+
+    def render(self) -> None:
+        start = self.page_index * self.page_size
+        window = self.items[start:start + self.page_size]
+
+        while len(self.rows) < len(window):
+            self.rows.append(self.make_row())
+        for row, item in zip(self.rows, window):
+            self.fill_row(row, item)
+            row.visible = True
+        for row in self.rows[len(window):]:
+            row.visible = False
+
+        if self.lv.controls is not self.rows:
+            self.lv.controls = self.rows
+        self._render_pager()
+
+    def _render_pager(self) -> None:
+        self.pager.visible = len(self.items) > self.page_size
+        self.page_label.value = f"Page {self.page_index + 1} of {self.page_count}"
+        self.prev_button.disabled = self.page_index == 0
+        self.next_button.disabled = self.page_index >= self.page_count - 1
@@ -118,6 +118,14 @@ class Style:
             "label_position": ft.LabelPosition.LEFT
         }
 
+    @staticmethod
+    def index_checkbox(page) -> dict:
+        return {
+            "label": "Keep searched folders for offline search",
+            "value": page.client_storage.get("index_folders") is True,
+            "label_position": ft.LabelPosition.LEFT
+        }
+
     @staticmethod
     def online_indicator() -> dict:
         return {
@@ -166,6 +174,15 @@ class Style:
             "divider_thickness": 1
         }
 
+    @staticmethod
+    def progress_bar() -> dict:
+        return {
+            "value": 0,
+            "visible": False,
+            "bar_height": 6,
+            "color": ft.Colors.BLUE_ACCENT,
+        }
+
     @staticmethod
     def table_container() -> dict:
         return {
@@ -217,7 +234,7 @@ class Style:
         return {
             "dialog_title": "Save email results as...",
             "file_type": ft.FilePickerFileType.CUSTOM,
-            "allowed_extensions": ["csv"],
+            "allowed_extensions": ["csv", "gz", "parquet", "arrow"],
             "file_name": "email_results.csv"
         }
 
@@ -1,15 +1,22 @@
-import logging
+import os
 
 from imapclient import IMAPClient
 import flet as ft
-from components import AppBar
+from components import AppBar, PagedListView, DiagnosticsDialog
 from utils import auto_format_and_validate_date_input, on_change
-import threading  # Recommended for non-blocking UI during long tasks
-from services import SearchEmails, EmailSearchError,is_connected, save_emails_to_csv, move_to_trash, get_folders, sorted_emails
+import time
+from typing import Iterator
+from contextlib import contextmanager
+from services import JobScheduler, Job, get_metrics, SearchEmails, rank_senders, EmailSearchError, EmailDetailsExtractor, ParallelDetailsExtractor, PoolError, QueryError, ExportError, is_connected, export_emails_to_csv, export_emails_to_arrow, move_to_trash, get_folders
 from pathlib import Path
 from core import Style
 
 
+RESULTS_PAGE_SIZE = 50  # result rows materialized as controls at once
+RENDER_INTERVAL = 0.2  # seconds between UI updates while results stream in
+RENDER_BATCH_ROWS = 200  # ...or after this many new rows, whichever comes first
+
+
 class Home(ft.View):
 
     def __init__(self, page: ft.Page):
@@ -27,6 +34,14 @@ class Home(ft.View):
 
         # GET THE IMAP4_SSL OBJECT FROM SESSION
         self.connection = self.page.session.get("conn")
+        # POOL OF EXTRA SESSIONS SO BACKGROUND TASKS DO NOT SHARE ONE SOCKET
+        self.pool = self.page.session.get("pool")
+        # ONE JOB AT A TIME: NEW SEARCHES CANCEL OLD ONES, DELETES WAIT FOR READS
+        self.jobs = JobScheduler()
+        self.searched_folder = None
+        # LOCAL MESSAGE CACHE (None when it could not be opened)
+        self.cache = self.page.session.get("cache")
+        self.folder_cache = None
 
         self.folders = self.page.client_storage.get("folders")
 
@@ -37,6 +52,11 @@ class Home(ft.View):
             **Style.group_checkbox(),
             on_change=lambda e: self.checked(e)
         )
+        # Downloading whole folders for the local index is opt-in
+        self.index_checkbox = ft.Checkbox(
+            **Style.index_checkbox(page),
+            on_change=lambda e: self.page.client_storage.set("index_folders", e.control.value)
+        )
 
         # SEARCH SECTION
 
@@ -98,17 +118,20 @@ class Home(ft.View):
 
         # LOADING INDICATOR
         self.loading_indicator = ft.ProgressRing(visible=False)
+        # fetched / total UIDs while results stream in
+        self.progress_bar = ft.ProgressBar(**Style.progress_bar())
 
         # RESULTS SECTION
 
         #results label
         self.results_label = ft.Text(**Style.results_label())
 
-        self.lv = ft.ListView(**Style.lv())
+        # Only one page of result rows exists as controls; they are refilled when paging
+        self.results = PagedListView(Style.lv(), page_size=RESULTS_PAGE_SIZE)
 
         self.table_container = ft.Container(
             **Style.table_container(),
-            content=self.lv
+            content=self.results
         )
 
         # File picker
@@ -143,6 +166,12 @@ class Home(ft.View):
             on_click=lambda e: self.open_dlg_delete(e)
         )
 
+        # Timings and counters collected by the services
+        self.diagnostics_dlg = DiagnosticsDialog(get_metrics(), self.home_dir)
+        self.diagnostics_button = ft.IconButton(
+            ft.Icons.QUERY_STATS, tooltip="Diagnostics", on_click=lambda e: self.open_diagnostics()
+        )
+
         # Number of Emails Found
         self.emails_found = ft.Text(f"Emails found: {self.emails_count}")
         # END OF RESULT SECTION
@@ -165,19 +194,20 @@ class Home(ft.View):
         self.body = ft.Container(
             padding=20,
             content=ft.Column([
-                ft.Row([self.email, self.online_indicator, ft.VerticalDivider(width=50), self.group_checkbox], alignment=ft.MainAxisAlignment.START),
+                ft.Row([self.email, self.online_indicator, ft.VerticalDivider(width=50), self.group_checkbox, self.index_checkbox], alignment=ft.MainAxisAlignment.START),
                 ft.Divider(height=10),
                 self.filters_column,
                 ft.Divider(height=10),
                 ft.Row([self.search_button], alignment=ft.MainAxisAlignment.CENTER),
                 ft.Row([self.loading_indicator,], alignment=ft.MainAxisAlignment.CENTER),
+                self.progress_bar,
                 ft.Divider(height=10, color=ft.Colors.TRANSPARENT),
                 ft.Row([self.results_label], alignment=ft.MainAxisAlignment.CENTER),
                 self.emails_found,
                 ft.Divider(height=5),
                 self.table_container,
                 ft.Divider(height=10),
-                ft.Row([self.save_button, self.delete_button], alignment=ft.MainAxisAlignment.CENTER),
+                ft.Row([self.save_button, self.delete_button, self.diagnostics_button], alignment=ft.MainAxisAlignment.CENTER),
                 self.snack_bar
                 ], scroll=ft.ScrollMode.AUTO
             )
@@ -194,6 +224,10 @@ class Home(ft.View):
         else:
             return True
 
+    def will_unmount(self):
+        # Leaving the view abandons pending searches; a delete already queued still runs
+        self.jobs.shutdown()
+
     def check_session(self):
         if not isinstance(self.connection, IMAPClient):
             self.show_error("Your session is Expired! Please Log in first.")
@@ -227,44 +261,117 @@ class Home(ft.View):
             return
 
         filter_values = self.get_filter_values()
-
-        # Show the loading indicator
-        self.loading_indicator.visible = True
-        self.lv.controls.clear()  # Clear previous results
-        self.body.disabled = True
-        self.page.update()
-
-        def perform_search(filters: dict[str, str], conn: IMAPClient):
+        grouped = self.group_checkbox.value
+
+        def perform_search(job: Job):
+            # Determinate progress for both modes: rows streamed, or UIDs grouped by sender
+            self.progress_bar.value = 0
+            self.progress_bar.visible = True
+            self.results.clear()  # Clear previous results
+            self.emails = []
+            self.page.update()
 
             try:
-                search = SearchEmails(filters, conn)
-                self.email_ids = search.get_email_ids(self.choose_folder.value)
+                with self.imap_connection() as conn:
+                    search = SearchEmails(filter_values, conn, cache=self.cache, account=self.page.client_storage.get("email"))
+                    email_ids = search.get_email_ids(self.choose_folder.value)
+                    job.check()
+                    self.email_ids = email_ids
+                    self.searched_folder = self.choose_folder.value
+                    self.folder_cache = search.folder_cache
+
+                    # Count the UIDs found, not the rows built
+                    self.emails_count = len(self.email_ids)
+                    self.emails_found.value = f"Emails found: {self.emails_count}"
+
+                    if grouped:
+                        def report_progress(done: int, total: int):
+                            job.check()
+                            self.progress_bar.value = done / max(total, 1)
+                            self.progress_bar.update()
+
+                        # Show the biggest senders found so far while the rest of the folder is grouped
+                        self.results.set_row_factory(self.make_sender_row, self.fill_sender_row)
+                        groups, last_render = {}, time.monotonic()
+                        for groups in search.iter_sender_groups(progress=report_progress):
+                            if time.monotonic() - last_render >= RENDER_INTERVAL:
+                                with get_metrics().timer("ui.render"):
+                                    self.results.set_items(rank_senders(groups, top=RESULTS_PAGE_SIZE))
+                                    self.page.update()
+                                last_render = time.monotonic()
+
+                        self.emails = rank_senders(groups)
+                        self.get_lv_controls()
+                    else:
+                        self.results.set_row_factory(self.make_email_row, self.fill_email_row)
+                        self.page.update()
+                        self.stream_results(job, search.iter_preview_data())
+                        self.activate_buttons()
+
+                # Fill in the rest of the folder afterwards, so the next search here is answered offline
+                if self.index_checkbox.value:
+                    self.index_in_background(search)
+
+            except (EmailSearchError, PoolError, QueryError) as Error:
+                # Show error to user in UI
+                self.show_error(Error.message)
 
-                get_emails: dict = {
-                    False: lambda : search.get_email_data("ALL"),
-                    True: lambda: search.get_email_data("CURTAIN")
-                }
-                self.emails = get_emails[self.group_checkbox.value]()
+            finally:
+                # Hide the progress bar after search is complete
+                self.progress_bar.visible = False
+                self.page.update()
 
-                self.lv.controls = self.get_lv_controls()
-                self.emails_count = len(self.emails)
-                self.emails_found.value = f"Emails found: {self.emails_count}"
+        # Runs on the view's worker thread so the UI remains responsive; a newer search cancels this one.
+        self.jobs.cancel("index")
+        self.jobs.submit("search", perform_search)
 
-                if not self.group_checkbox.value:
-                    self.activate_buttons()
+    def index_in_background(self, search: SearchEmails) -> None:
+        """Downloads the searched folder's unindexed messages as a job that the next search, export or delete cancels."""
+        if search.index is None or search.folder_cache is None:
+            return
 
-            except EmailSearchError as Error:
-                # Show error to user in UI
-                self.show_error(Error)
+        def perform_index(job: Job):
+            with self.imap_connection(search.folder) as conn:
+                search.index_folder(progress=lambda done, total: job.check(), conn=conn)
+
+        self.jobs.submit("index", perform_index)
+
+    def stream_results(self, job: Job, records: Iterator[dict]) -> None:
+        """
+        Appends results to the list as they are fetched, pushing a UI update at most
+        every RENDER_INTERVAL seconds or RENDER_BATCH_ROWS rows, whichever comes first.
+        Stops with JobCancelled at the next batch once `job` is superseded.
+        """
+        pending = []
+        last_render = time.monotonic()
+
+        for email in records:
+            job.check()
+            pending.append(email)
+            if len(pending) >= RENDER_BATCH_ROWS or time.monotonic() - last_render >= RENDER_INTERVAL:
+                self.render_batch(pending)
+                pending = []
+                last_render = time.monotonic()
+
+        if pending:
+            self.render_batch(pending)
+
+    def render_batch(self, batch: list[dict]) -> None:
+        with get_metrics().timer("ui.render"):
+            self.emails.extend(batch)
+            self.results.append_items(batch)
+            self.progress_bar.value = len(self.emails) / max(len(self.email_ids), 1)
+            self.page.update()
 
-            finally:
-                # Hide the loading indicator after search is complete
-                self.loading_indicator.visible = False
-                self.body.disabled = False
-                self.page.update()
+    @contextmanager
+    def imap_connection(self, folder: str | None = None):
+        """Checks a session out of the pool, falling back to the shared login connection."""
+        if self.pool is None:
+            yield self.connection
+            return
 
-        # Run the search in a separate thread so the UI remains responsive.
-        threading.Thread(target=perform_search, args=(filter_values, self.connection), daemon=True).start()
+        with self.pool.connection(folder) as conn:
+            yield conn
 
 
     def save_to_csv(self, e) -> None:
@@ -278,14 +385,58 @@ class Home(ft.View):
         )
 
     def file_save_result(self, e) -> None:
-        if e.path:
-            if not e.path.endswith(".csv"):
-                e.path += ".csv"  # force correct extension
-            save_emails_to_csv(e.path, self.emails)
-            self.snack_bar.content.value = f"✅ Emails saved successfully into: {e.path}"
-            self.snack_bar.bgcolor = ft.Colors.GREEN_ACCENT_700
-            self.snack_bar.open = True
-            self.page.update()
+        if not e.path:
+            return
+        if e.path.endswith(".gz") and not e.path.endswith(".csv.gz"):
+            e.path = e.path[:-len(".gz")] + ".csv.gz"  # only CSV is compressed
+        elif not e.path.endswith((".csv", ".csv.gz", ".parquet", ".arrow")):
+            e.path += ".csv"  # force correct extension
+
+        # Determinate progress: rows written out of the UIDs found
+        self.progress_bar.value = 0
+        self.progress_bar.visible = True
+        self.body.disabled = True
+        self.page.update()
+
+        def report_progress(written: int):
+            self.progress_bar.value = written / max(len(self.email_ids), 1)
+            self.progress_bar.update()
+
+        def perform_export(job: Job):  # noqa
+            path = e.path
+            # Results only hold body snippets, so the export downloads the full messages
+            # and writes them to disk batch by batch as they arrive
+            try:
+                if self.pool is not None:
+                    # Ranges of the result set are downloaded over several pooled sessions at once
+                    records = ParallelDetailsExtractor(
+                        self.pool, self.searched_folder, self.email_ids, connections=self.pool.size, cache=self.folder_cache
+                    ).iter_email_details()
+                else:
+                    records = EmailDetailsExtractor(
+                        self.connection, self.email_ids, cache=self.folder_cache, workers=os.cpu_count()
+                    ).iter_email_details()
+                export = export_emails_to_arrow if path.endswith((".parquet", ".arrow")) else export_emails_to_csv
+                written = export(path, records, progress=report_progress)
+                self.show_success(f"✅ {written} emails saved successfully into: {path}")
+
+            except (ExportError, PoolError) as error:
+                self.show_error(f"Export failed: {error.message}")
+
+            except OSError as error:
+                self.show_error(f"Export failed: {error}")
+
+            finally:
+                self.progress_bar.visible = False
+                self.body.disabled = False
+                self.page.update()
+
+        self.jobs.cancel("index")
+        self.jobs.submit("export", perform_export)
+
+    def open_diagnostics(self) -> None:
+        self.diagnostics_dlg.refresh()
+        self.page.open(self.diagnostics_dlg)
 
     def open_dlg_delete(self, e) -> None:
 
@@ -293,19 +444,21 @@ class Home(ft.View):
         self.page.open(self.delete_dlg_modal)
         self.delete_dlg_modal.update()
 
-    def delete_all_found_emails(self) -> tuple:
-        result, info = move_to_trash(conn=self.connection, ids=self.email_ids)
+    def delete_all_found_emails(self, uids) -> tuple:
+        with self.imap_connection(self.searched_folder) as conn:
+            result, info = move_to_trash(conn=conn, ids=uids)
         # Clear previous results
-        self.lv.controls.clear()
+        self.results.clear()
         self.emails_count = 0
         self.emails_found.value = f"Emails found: {self.emails_count}"
         return result, info
 
-    def delete_emails_by_sender(self)-> tuple:
-        result, info = move_to_trash(conn=self.connection, ids=self.delete_dlg_modal.data.data)  # self.delete_dlg_modal.data.data = list of uids saved for found emails per sender
-        # Clear the row
-        self.lv.controls.remove(self.delete_dlg_modal.data)
-        self.emails_count = int(self.emails_count) - len(self.delete_dlg_modal.data.data)
+    def delete_emails_by_sender(self, uids) -> tuple:
+        with self.imap_connection(self.searched_folder) as conn:
+            result, info = move_to_trash(conn=conn, ids=uids)
+        # Drop the sender from the results; its recycled row is refilled with the next one
+        self.results.remove_where(lambda item: item[1]["uids"] is uids)
+        self.emails_count = int(self.emails_count) - len(uids)
 
         self.emails_found.value = f"Emails found: {self.emails_count}"
         return result, info
@@ -317,11 +470,16 @@ class Home(ft.View):
         self.body.disabled = True
         self.page.update()
 
-        def perform_delete():
-            if self.group_checkbox.value:
-                result, info = self.delete_emails_by_sender()
+        # The UIDs are taken now: by the time the job runs, a newer search may have replaced the results
+        by_sender = self.group_checkbox.value
+        # self.delete_dlg_modal.data.data = UIDSet saved for found emails per sender
+        uids = self.delete_dlg_modal.data.data if by_sender else self.email_ids
+
+        def perform_delete(job: Job):  # noqa
+            if by_sender:
+                result, info = self.delete_emails_by_sender(uids)
             else:
-                result, info = self.delete_all_found_emails()
+                result, info = self.delete_all_found_emails(uids)
 
             self.loading_indicator.visible = False
             self.body.disabled = False
@@ -333,74 +491,66 @@ class Home(ft.View):
 
             self.page.update()
 
-        threading.Thread(target=perform_delete, daemon=True).start()
+        self.jobs.cancel("index")
+        self.jobs.submit("delete", perform_delete, destructive=True)
 
 
-    def get_lv_controls(self) -> list:
-        logging.warning(self.group_checkbox.value)
-        sorted_senders = sorted_emails(self.emails)
+    def get_lv_controls(self) -> None:
         # builds different outcome depends on user choice to Group item True or False( checkbox )
-        choice: dict = {
-            True: lambda : [
-                ft.ResponsiveRow([
-                    ft.Text(
-                        spans=[
-                            ft.TextSpan(
-                                "From: ",
-                                **Style.results_text_span()
-                            ),
-                            ft.TextSpan(f"{sender}: {data["count"]}")
-                        ]
+        with get_metrics().timer("ui.render"):
+            if self.group_checkbox.value:
+                self.results.set_row_factory(self.make_sender_row, self.fill_sender_row)
+                self.results.set_items(self.emails)  # already ranked by sender
+            else:
+                self.results.set_row_factory(self.make_email_row, self.fill_email_row)
+                self.results.set_items(self.emails)
+
+    def make_sender_row(self) -> ft.ResponsiveRow:
+        return ft.ResponsiveRow([
+            ft.Text(
+                spans=[
+                    ft.TextSpan(
+                        "From: ",
+                        **Style.results_text_span()
                     ),
+                    ft.TextSpan()
+                ]
+            ),
 
-                    ft.IconButton(**Style.delete_icon_button(), on_click=lambda e: self.icon_button_clicked(e), data=data["count"])
-                ], data=data["uids"]
-            ) for sender, data in sorted_senders],
-            False: lambda : [
-                ft.ResponsiveRow([
-                    ft.Text(
-                        spans=[
-                            ft.TextSpan(
-                                "Subject: ",
-                                **Style.results_text_span()
-                            ),
-                            ft.TextSpan(f"{email["subject"]}", )
-                        ]
-                    ),
-                    ft.Text(
-                        spans=[
-                            ft.TextSpan(
-                                "From: ",
-                                **Style.results_text_span()
-                            ),
-                            ft.TextSpan(f"{email["from"]}")
-                        ]
-                    ),
-                    ft.Text(
-                        spans=[
-                            ft.TextSpan(
-                                "Date: ",
-                                **Style.results_text_span()
-                            ),
-                            ft.TextSpan(f"{email["date"]}")
-                        ]
-                    ),
-                    ft.Text(
-                        spans=[
-                            ft.TextSpan(
-                                "Body: ",
-                                **Style.results_text_span()
-                            ),
-                            ft.TextSpan(f"{email["body"][:200] + "..."}")
-                        ]
+            ft.IconButton(**Style.delete_icon_button(), on_click=lambda e: self.icon_button_clicked(e))
+        ])
+
+    @staticmethod
+    def fill_sender_row(row: ft.ResponsiveRow, item: tuple) -> None:
+        sender, data = item
+        text, button = row.controls
+        text.spans[1].text = f"{sender}: {data["count"]}"
+        button.data = data["count"]
+        row.data = data["uids"]
+
+    @staticmethod
+    def make_email_row() -> ft.ResponsiveRow:
+        return ft.ResponsiveRow([
+            ft.Text(
+                spans=[
+                    ft.TextSpan(
+                        label,
+                        **Style.results_text_span()
                     ),
-                ], alignment=ft.MainAxisAlignment.SPACE_EVENLY
-                )
-                for email in self.emails
-            ]
-        }
+                    ft.TextSpan()
+                ]
+            )
+            for label in ("Subject: ", "From: ", "Date: ", "Body: ")
+        ], alignment=ft.MainAxisAlignment.SPACE_EVENLY
+        )
 
-        return choice[self.group_checkbox.value]()
+    @staticmethod
+    def fill_email_row(row: ft.ResponsiveRow, email: dict) -> None:
+        subject, sender, date, body = row.controls
+        subject.spans[1].text = f"{email["subject"]}"
+        sender.spans[1].text = f"{email["from"]}"
+        date.spans[1].text = f"{email["date"]}"
+        body.spans[1].text = f"{email["body"][:200] + "..."}"
 
     def icon_button_clicked(self, e: ft.ControlEvent):
         self.delete_dlg_modal.content.value = f"Do you really want to move {e.control.data} emails to Bin?"
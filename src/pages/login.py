@@ -1,7 +1,7 @@
 import flet as ft
 from imapclient import IMAPClient
 from utils import validate
-from services import EmailConnectionService, is_connected, get_folders
+from services import EmailConnectionService, IMAPConnectionPool, is_connected, get_folders, open_cache
 import threading
 from core import Style
 
@@ -68,6 +68,9 @@ class Login(ft.View):
 
         self.controls = [self.body]
 
+        # SERVICE USED TO OPEN THE SESSION, KEPT FOR THE CONNECTION POOL
+        self.service = None
+
     def get_connection(self) -> IMAPClient | str:
 
         imap_server = self.choose_email_provider.value
@@ -77,12 +80,12 @@ class Login(ft.View):
         validated_email = validate(email)
 
         if validated_email["valid"]:
-            service = EmailConnectionService(
+            self.service = EmailConnectionService(
                 email=email,
                 password=password,
                 imap_server=imap_server
             )
-            return service.connect()
+            return self.service.connect()
         else:
             return validated_email["message"]
 
@@ -112,6 +115,10 @@ class Login(ft.View):
                 folders = get_folders(conn)
                 self.page.client_storage.set("email", self.email.value)
                 self.page.session.set("conn", conn)
+                # Extra sessions for parallel searches, fetches and deletes are opened on demand
+                self.page.session.set("pool", IMAPConnectionPool(self.service))
+                if not self.page.session.contains_key("cache"):
+                    self.page.session.set("cache", open_cache())
                 self.page.client_storage.set("folders", folders) if not self.page.client_storage.contains_key("folders") else ...
                 self.loading_indicator.visible = False
                 self.save_password()
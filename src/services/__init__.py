@@ -1,2 +1,16 @@
 from .imap import EmailConnectionService, EmailParserService, EmailFilter, EmailDetailsExtractor
-from .functionality import SearchEmails, EmailSearchError, is_connected, save_emails_to_csv, move_to_trash, get_folders, sorted_emails
\ No newline at end of file
+from .functionality import SearchEmails, EmailSearchError, is_connected, save_emails_to_csv, move_to_trash, get_folders, sorted_emails
+from .cache import MessageCache, open_cache
+from .sync import FolderSync, SyncResult
+from .index import LocalSearchIndex, open_index
+from .pool import IMAPConnectionPool, PoolError
+from .parallel import ParallelDetailsExtractor
+from .aio import AsyncEmailConnectionService, AsyncEmailParserService, AsyncEmailDetailsExtractor, AsyncEmailTrashService, AsyncSearchEmails
+from .uidset import UIDSet, imap_set
+from .export import export_emails_to_csv, export_emails_to_arrow, write_emails_csv, write_emails_jsonl, open_export_file, ExportError, CSV_COLUMNS, EXPORT_COLUMNS
+from .senders import SenderAggregator, TopSenders, CountMinSketch, normalize_address, rank_senders
+from .metrics import Metrics, Histogram, get_metrics, set_metrics, timed, timed_fetch, throughput
+from .jobs import JobScheduler, Job, JobCancelled
+from .multisearch import MultiFolderSearch, SearchTarget, FolderResult
+from .threads import group_threads, normalize_subject
+from .query import Term, And, Or, Not, Query, QueryError, all_of, any_of, compile_query, CompiledQuery
@@ -0,0 +1,168 @@
+import asyncio
+import weakref
+from typing import AsyncIterator, Callable, Optional, Sequence
+from imapclient import IMAPClient
+
+from .cache import FolderCache, MessageCache
+from .uidset import UIDSet
+from .imap import (
+    EmailConnectionService, EmailParserService, EmailDetailsExtractor, EmailTrashService, EmailFilter,
+    FETCH_BATCH_SIZE, TRASH_CHUNK_SIZE, chunked
+)
+from .functionality import SearchEmails
+from .query import Query
+
+
+# One lock per socket: IMAP commands on a connection must never interleave
+_locks: "weakref.WeakKeyDictionary[IMAPClient, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+def connection_lock(server: IMAPClient) -> asyncio.Lock:
+    lock = _locks.get(server)
+    if lock is None:
+        lock = _locks[server] = asyncio.Lock()
+    return lock
+
+
+async def run_blocking(server: IMAPClient, func: Callable, *args, **kwargs):
+    """
+    Runs a blocking IMAPClient call in a worker thread while holding the connection's lock.
+    Cancelling the awaiting task returns at once, but the lock is only released when
+    the thread finishes its command, so the next call never interleaves with it.
+    """
+    lock = connection_lock(server)
+    await lock.acquire()
+    try:
+        call = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+    except BaseException:
+        lock.release()
+        raise
+
+    def release(finished: asyncio.Future) -> None:
+        lock.release()
+        if not finished.cancelled():
+            finished.exception()  # retrieved, so an abandoned call's error is not logged as unhandled
+
+    call.add_done_callback(release)
+    return await asyncio.shield(call)
+
+
+class AsyncEmailConnectionService:
+    def __init__(self, email: str, password: str, imap_server: str, port: int = 993, use_ssl: bool = True):
+        self.service = EmailConnectionService(email, password, imap_server, port, use_ssl)
+
+    async def connect(self) -> IMAPClient | str:
+        return await asyncio.to_thread(self.service.connect)
+
+
+class AsyncEmailParserService:
+    """
+    Async counterpart of EmailParserService. The folder is selected on the
+    first search instead of in the constructor, which cannot be awaited.
+    """
+    def __init__(self, server: IMAPClient, folder: str):
+        self.server = server
+        self.folder = folder
+        self.parser: Optional[EmailParserService] = None
+
+    async def select_folder(self) -> EmailParserService:
+        if self.parser is None:
+            self.parser = await run_blocking(self.server, EmailParserService, self.server, self.folder)
+        return self.parser
+
+    async def search_emails(self, filters: EmailFilter | Query) -> list[int]:
+        parser = await self.select_folder()
+        return await run_blocking(self.server, parser.search_emails, filters)
+
+
+class AsyncEmailDetailsExtractor:
+    """
+    Async counterpart of EmailDetailsExtractor. Every batch is a separate
+    awaitable step, so cancelling the consuming task stops at the next batch.
+    """
+    def __init__(self, server: IMAPClient, uids: Sequence[int] | UIDSet, batch_size: int = FETCH_BATCH_SIZE,
+                 cache: Optional[FolderCache] = None, body_limit: Optional[int] = None):
+        self.server = server
+        self.uids = uids
+        self.batch_size = batch_size
+        self.cache = cache
+        self.body_limit = body_limit
+
+    async def fetch_all_email_details(self) -> list[dict]:
+        return await self._collect(self.iter_email_details())
+
+    async def fetch_preview_email_details(self) -> list[dict]:
+        return await self._collect(self.iter_preview_details())
+
+    async def fetch_curtain_email_details(self) -> list[dict]:
+        return await run_blocking(self.server, self._extractor(self.uids).fetch_curtain_email_details)
+
+    async def iter_email_details(self) -> AsyncIterator[dict]:
+        for batch in chunked(self.uids, self.batch_size):
+            extractor = self._extractor(batch)
+            for details in await run_blocking(self.server, lambda: list(extractor.iter_email_details())):
+                yield details
+
+    async def iter_preview_details(self) -> AsyncIterator[dict]:
+        for batch in chunked(self.uids, self.batch_size):
+            extractor = self._extractor(batch)
+            for details in await run_blocking(self.server, lambda: list(extractor.iter_preview_details())):
+                yield details
+
+    def _extractor(self, uids: Sequence[int]) -> EmailDetailsExtractor:
+        return EmailDetailsExtractor(
+            self.server, list(uids), batch_size=len(uids) or 1, cache=self.cache, body_limit=self.body_limit
+        )
+
+    async def _collect(self, details: AsyncIterator[dict]) -> list[dict]:
+        if not self.uids:
+            return []
+
+        collected = [item async for item in details]
+        if not collected:
+            return [{"error": "Server returned no messages"}]
+
+        return collected
+
+
+class AsyncEmailTrashService:
+    def __init__(self, server: IMAPClient, trash_folder: str = '[Gmail]/Bin', chunk_size: int = TRASH_CHUNK_SIZE):
+        self.server = server
+        self.trash_service = EmailTrashService(server, trash_folder, chunk_size)
+
+    async def move_to_trash(self, uids: Sequence[int],
+                            progress: Optional[Callable[[int, int], None]] = None) -> tuple[bool, str]:
+        return await run_blocking(self.server, self.trash_service.move_to_trash, uids, progress)
+
+
+class AsyncSearchEmails:
+    """
+    Async counterpart of SearchEmails for Flet's async handlers. Run it inside
+    a task and cancel the task to abandon a search that was superseded.
+    """
+    def __init__(self, filters: dict[str, str] | Query, conn: IMAPClient,
+                 cache: Optional[MessageCache] = None, account: str = ""):
+        self.search = SearchEmails(filters, conn, cache=cache, account=account)
+        self.conn = conn
+
+    @property
+    def ids(self) -> Optional[list[int]]:
+        return self.search.ids
+
+    async def get_email_ids(self, chosen_folder: str) -> list[int]:
+        return await run_blocking(self.conn, self.search.get_email_ids, chosen_folder)
+
+    async def get_email_data(self, key: str) -> list[dict[str, str]]:
+        return await run_blocking(self.conn, self.search.get_email_data, key)
+
+    def iter_email_data(self, batch_size: int = FETCH_BATCH_SIZE) -> AsyncIterator[dict]:
+        extractor = AsyncEmailDetailsExtractor(
+            self.conn, self.search.ids or [], batch_size=batch_size, cache=self.search.folder_cache
+        )
+        return extractor.iter_email_details()
+
+    def iter_preview_data(self, batch_size: int = FETCH_BATCH_SIZE) -> AsyncIterator[dict]:
+        extractor = AsyncEmailDetailsExtractor(
+            self.conn, self.search.ids or [], batch_size=batch_size, cache=self.search.folder_cache
+        )
+        return extractor.iter_preview_details()
@@ -0,0 +1,335 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+from .uidset import UIDSet
+
+
+DEFAULT_CACHE_PATH = Path.home() / ".emailparser" / "cache.sqlite3"
+DEFAULT_MAX_MESSAGES = 50_000  # oldest-accessed messages are evicted past this size
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    account     TEXT    NOT NULL,
+    folder      TEXT    NOT NULL,
+    uidvalidity INTEGER NOT NULL,
+    PRIMARY KEY (account, folder)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    account     TEXT    NOT NULL,
+    folder      TEXT    NOT NULL,
+    uidvalidity INTEGER NOT NULL,
+    uid         INTEGER NOT NULL,
+    subject     TEXT,
+    sender      TEXT,
+    date        TEXT,
+    body        TEXT,
+    complete    INTEGER NOT NULL,  -- 0 when body only holds a preview snippet
+    accessed    REAL    NOT NULL,
+    size        INTEGER,           -- RFC822 size in bytes
+    PRIMARY KEY (account, folder, uidvalidity, uid)
+);
+CREATE INDEX IF NOT EXISTS messages_accessed ON messages (accessed);
+CREATE TABLE IF NOT EXISTS sync_state (
+    account       TEXT    NOT NULL,
+    folder        TEXT    NOT NULL,
+    highestmodseq INTEGER NOT NULL,
+    PRIMARY KEY (account, folder)
+);
+CREATE TABLE IF NOT EXISTS folder_uids (
+    account TEXT    NOT NULL,
+    folder  TEXT    NOT NULL,
+    uid     INTEGER NOT NULL,
+    flags   TEXT    NOT NULL,
+    PRIMARY KEY (account, folder, uid)
+);
+CREATE TABLE IF NOT EXISTS sender_groups (
+    account TEXT NOT NULL,
+    folder  TEXT NOT NULL,
+    sender  TEXT NOT NULL,  -- bare, lower-cased mailbox
+    uids    TEXT NOT NULL,  -- IMAP sequence set of the sender's UIDs
+    PRIMARY KEY (account, folder, sender)
+);
+CREATE TABLE IF NOT EXISTS gmail_ids (
+    account TEXT    NOT NULL,
+    folder  TEXT    NOT NULL,
+    uid     INTEGER NOT NULL,
+    msgid   INTEGER NOT NULL,  -- X-GM-MSGID, the same in every folder the message is in
+    thrid   INTEGER NOT NULL,  -- X-GM-THRID, shared by a conversation
+    PRIMARY KEY (account, folder, uid)
+);
+CREATE INDEX IF NOT EXISTS gmail_ids_msgid ON gmail_ids (account, msgid);
+"""
+
+FOLDER_TABLES = ("messages", "folders", "sync_state", "folder_uids", "sender_groups", "gmail_ids")
+
+
+class MessageCache:
+    """
+    On-disk cache of parsed messages keyed by (account, folder, UIDVALIDITY, UID).
+
+    A single SQLite connection is shared between the UI and the background
+    search threads, so every statement runs under one lock.
+    """
+    def __init__(self, path: str | Path = DEFAULT_CACHE_PATH, max_messages: int = DEFAULT_MAX_MESSAGES):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_messages = max_messages
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(str(path), check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        # Caches written before message sizes were stored lack the column
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(messages)")}
+        if "size" not in columns:
+            with self.db:
+                self.db.execute("ALTER TABLE messages ADD COLUMN size INTEGER")
+
+    def folder(self, account: str, folder: str, uidvalidity: int) -> "FolderCache":
+        """
+        Returns a view bound to one folder, dropping everything cached for it
+        if the server reports a different UIDVALIDITY than last time.
+        """
+        with self.lock, self.db:
+            row = self.db.execute(
+                "SELECT uidvalidity FROM folders WHERE account = ? AND folder = ?", (account, folder)
+            ).fetchone()
+            if row is None or row[0] != uidvalidity:
+                self._delete_folder(account, folder)
+                self.db.execute(
+                    "INSERT OR REPLACE INTO folders (account, folder, uidvalidity) VALUES (?, ?, ?)",
+                    (account, folder, uidvalidity)
+                )
+        return FolderCache(self, account, folder, uidvalidity)
+
+    def invalidate_folder(self, account: str, folder: str) -> None:
+        with self.lock, self.db:
+            self._delete_folder(account, folder)
+
+    def _delete_folder(self, account: str, folder: str) -> None:
+        for table in FOLDER_TABLES:
+            self.db.execute(f"DELETE FROM {table} WHERE account = ? AND folder = ?", (account, folder))
+
+    def evict(self) -> None:
+        with self.lock, self.db:
+            (count,) = self.db.execute("SELECT COUNT(*) FROM messages").fetchone()
+            if count > self.max_messages:
+                self.db.execute(
+                    "DELETE FROM messages WHERE rowid IN (SELECT rowid FROM messages ORDER BY accessed LIMIT ?)",
+                    (count - self.max_messages,)
+                )
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+
+class FolderCache:
+    def __init__(self, cache: MessageCache, account: str, folder: str, uidvalidity: int):
+        self.cache = cache
+        self.key = (account, folder, uidvalidity)
+
+    def get_many(self, uids: Sequence[int], complete: bool = True) -> dict[int, dict]:
+        """
+        Returns cached details for the given UIDs. With complete=False preview
+        entries are accepted as well as fully parsed ones.
+        """
+        if not uids:
+            return {}
+
+        placeholders = ",".join("?" * len(uids))
+        query = (
+            "SELECT uid, subject, sender, date, body, size FROM messages "
+            f"WHERE account = ? AND folder = ? AND uidvalidity = ? AND uid IN ({placeholders})"
+        )
+        if complete:
+            query += " AND complete = 1"
+
+        with self.cache.lock, self.cache.db:
+            rows = self.cache.db.execute(query, (*self.key, *uids)).fetchall()
+            found = [row[0] for row in rows]
+            if found:
+                self.cache.db.execute(
+                    "UPDATE messages SET accessed = ? "
+                    f"WHERE account = ? AND folder = ? AND uidvalidity = ? AND uid IN ({','.join('?' * len(found))})",
+                    (time.time(), *self.key, *found)
+                )
+
+        return {
+            uid: {'subject': subject, 'from': sender, 'date': date, 'body': body, 'uid': uid, 'size': size}
+            for uid, subject, sender, date, body, size in rows
+        }
+
+    def put_many(self, details: Iterable[dict], complete: bool = True) -> None:
+        # A preview never replaces a fully parsed message
+        verb = "INSERT OR REPLACE" if complete else "INSERT OR IGNORE"
+        now = time.time()
+        rows = [
+            (*self.key, d['uid'], d['subject'], d['from'], d['date'], d['body'], int(complete), now, d.get('size'))
+            for d in details
+        ]
+        if not rows:
+            return
+
+        with self.cache.lock, self.cache.db:
+            self.cache.db.executemany(
+                f"{verb} INTO messages "
+                "(account, folder, uidvalidity, uid, subject, sender, date, body, complete, accessed, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        self.cache.evict()
+
+    # INCREMENTAL SYNC STATE
+
+    def highest_modseq(self) -> Optional[int]:
+        with self.cache.lock:
+            row = self.cache.db.execute(
+                "SELECT highestmodseq FROM sync_state WHERE account = ? AND folder = ?", self.key[:2]
+            ).fetchone()
+        return row[0] if row else None
+
+    def known_uids(self) -> list[int]:
+        with self.cache.lock:
+            rows = self.cache.db.execute(
+                "SELECT uid FROM folder_uids WHERE account = ? AND folder = ? ORDER BY uid", self.key[:2]
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def apply_delta(self, flags: dict[int, Sequence[bytes]], vanished: Iterable[int],
+                    highest_modseq: int, full: bool = False) -> None:
+        """
+        Stores new/changed flags, forgets vanished UIDs and records the folder's HIGHESTMODSEQ.
+        A full resync replaces the whole UID list of the folder.
+        """
+        account, folder = self.key[:2]
+        rows = [
+            (account, folder, uid, " ".join(f.decode() if isinstance(f, bytes) else f for f in uid_flags))
+            for uid, uid_flags in flags.items()
+        ]
+        gone = [(account, folder, uid) for uid in vanished]
+
+        with self.cache.lock, self.cache.db:
+            if full:
+                self.cache.db.execute("DELETE FROM folder_uids WHERE account = ? AND folder = ?", (account, folder))
+            self.cache.db.executemany(
+                "INSERT OR REPLACE INTO folder_uids (account, folder, uid, flags) VALUES (?, ?, ?, ?)", rows
+            )
+            self.cache.db.executemany("DELETE FROM folder_uids WHERE account = ? AND folder = ? AND uid = ?", gone)
+            self.cache.db.executemany("DELETE FROM messages WHERE account = ? AND folder = ? AND uid = ?", gone)
+            self.cache.db.executemany("DELETE FROM gmail_ids WHERE account = ? AND folder = ? AND uid = ?", gone)
+            if gone:
+                self._discard_from_senders(UIDSet(uid for _, _, uid in gone))
+            self.cache.db.execute(
+                "INSERT OR REPLACE INTO sync_state (account, folder, highestmodseq) VALUES (?, ?, ?)",
+                (account, folder, highest_modseq)
+            )
+
+
+    # GMAIL MESSAGE AND THREAD IDS
+
+    def gmail_ids(self, uids: Sequence[int]) -> dict[int, tuple[int, int]]:
+        """Returns the stored (X-GM-MSGID, X-GM-THRID) of the given UIDs."""
+        if not uids:
+            return {}
+        with self.cache.lock:
+            rows = self.cache.db.execute(
+                "SELECT uid, msgid, thrid FROM gmail_ids "
+                f"WHERE account = ? AND folder = ? AND uid IN ({','.join('?' * len(uids))})",
+                (*self.key[:2], *uids)
+            ).fetchall()
+        return {uid: (msgid, thrid) for uid, msgid, thrid in rows}
+
+    def put_gmail_ids(self, ids: dict[int, tuple[int, int]]) -> None:
+        account, folder = self.key[:2]
+        with self.cache.lock, self.cache.db:
+            self.cache.db.executemany(
+                "INSERT OR REPLACE INTO gmail_ids (account, folder, uid, msgid, thrid) VALUES (?, ?, ?, ?, ?)",
+                [(account, folder, uid, msgid, thrid) for uid, (msgid, thrid) in ids.items()]
+            )
+
+    def get_copies(self, msgids: dict[int, int], complete: bool = True) -> dict[int, dict]:
+        """
+        Returns details cached under another folder of the account for messages
+        with the same X-GM-MSGID, keyed by this folder's UID (`msgids` maps UID -> X-GM-MSGID).
+        """
+        if not msgids:
+            return {}
+
+        by_msgid = {msgid: uid for uid, msgid in msgids.items()}
+        query = (
+            "SELECT g.msgid, m.subject, m.sender, m.date, m.body, m.size FROM gmail_ids g "
+            "JOIN messages m ON m.account = g.account AND m.folder = g.folder AND m.uid = g.uid "
+            f"WHERE g.account = ? AND g.folder != ? AND g.msgid IN ({','.join('?' * len(by_msgid))})"
+        )
+        if complete:
+            query += " AND m.complete = 1"
+
+        with self.cache.lock:
+            rows = self.cache.db.execute(query, (*self.key[:2], *by_msgid)).fetchall()
+
+        return {
+            by_msgid[msgid]: {
+                'subject': subject, 'from': sender, 'date': date, 'body': body, 'uid': by_msgid[msgid], 'size': size
+            }
+            for msgid, subject, sender, date, body, size in rows
+        }
+
+    # SENDER AGGREGATION
+
+    def sender_groups(self) -> dict[str, UIDSet]:
+        """Returns the stored sender -> UIDs grouping of the folder."""
+        with self.cache.lock:
+            rows = self.cache.db.execute(
+                "SELECT sender, uids FROM sender_groups WHERE account = ? AND folder = ?", self.key[:2]
+            ).fetchall()
+        return {sender: UIDSet.parse(uids) for sender, uids in rows}
+
+    def put_sender_groups(self, groups: dict[str, UIDSet]) -> None:
+        """Replaces the stored UIDs of the given senders; other senders are left alone."""
+        account, folder = self.key[:2]
+        with self.cache.lock, self.cache.db:
+            self.cache.db.executemany(
+                "INSERT OR REPLACE INTO sender_groups (account, folder, sender, uids) VALUES (?, ?, ?, ?)",
+                [(account, folder, sender, str(uids)) for sender, uids in groups.items() if uids]
+            )
+            self.cache.db.executemany(
+                "DELETE FROM sender_groups WHERE account = ? AND folder = ? AND sender = ?",
+                [(account, folder, sender) for sender, uids in groups.items() if not uids]
+            )
+
+    def _discard_from_senders(self, vanished: UIDSet) -> None:
+        # caller holds the lock and the transaction
+        rows = self.cache.db.execute(
+            "SELECT sender, uids FROM sender_groups WHERE account = ? AND folder = ?", self.key[:2]
+        ).fetchall()
+        for sender, uids in rows:
+            uids = UIDSet.parse(uids)
+            remaining = uids - vanished
+            if len(remaining) == len(uids):
+                continue
+            if remaining:
+                self.cache.db.execute(
+                    "UPDATE sender_groups SET uids = ? WHERE account = ? AND folder = ? AND sender = ?",
+                    (str(remaining), *self.key[:2], sender)
+                )
+            else:
+                self.cache.db.execute(
+                    "DELETE FROM sender_groups WHERE account = ? AND folder = ? AND sender = ?",
+                    (*self.key[:2], sender)
+                )
+
+
+def open_cache(path: Optional[str | Path] = None) -> MessageCache | None:
+    """
+    Opens the default message cache, returning None when the disk is not writable
+    so that searching keeps working without it.
+    """
+    try:
+        return MessageCache(path or DEFAULT_CACHE_PATH)
+    except (OSError, sqlite3.Error):
+        return None
@@ -0,0 +1,190 @@
+import csv
+import gzip
+import json
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Iterable, Optional, Sequence, TextIO
+
+
+CSV_COLUMNS = ("from", "subject", "date", "body")
+EXPORT_COLUMNS = CSV_COLUMNS + ("uid",)
+EXPORT_BUFFER_ROWS = 500  # rows held in memory before they are written out
+ROW_GROUP_ROWS = 10_000  # rows per Parquet row group / Arrow record batch
+
+
+class ExportError(Exception):
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+def open_export_file(file_path: str, compress: Optional[bool] = None) -> TextIO:
+    """
+    Opens the output for writing text, gzip-compressed when asked to or when the path ends with .gz.
+    """
+    if compress is None:
+        compress = file_path.endswith(".gz")
+    if compress:
+        return gzip.open(file_path, mode="wt", newline="", encoding="utf-8")
+    return open(file_path, mode="w", newline="", encoding="utf-8")
+
+
+def export_emails_to_csv(file_path: str, records: Iterable[dict], columns: Sequence[str] = CSV_COLUMNS,
+                         compress: Optional[bool] = None, buffer_rows: int = EXPORT_BUFFER_ROWS,
+                         progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Writes records to CSV while they are still being fetched.
+
+    At most `buffer_rows` records are held before they are written and
+    flushed, so memory stays constant and the file grows as batches arrive.
+    `progress` is called with the number of rows written after every flush.
+
+    :return: The number of rows written.
+    """
+    with open_export_file(file_path, compress) as file:
+        return write_emails_csv(file, records, columns, buffer_rows, progress)
+
+
+def write_emails_csv(file: TextIO, records: Iterable[dict], columns: Sequence[str] = CSV_COLUMNS,
+                     buffer_rows: int = EXPORT_BUFFER_ROWS, progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    export_emails_to_csv onto an already open text stream, such as stdout.
+
+    :return: The number of rows written.
+    """
+    writer = csv.DictWriter(file, fieldnames=list(columns), extrasaction="ignore")  # noqa
+    writer.writeheader()
+
+    written = 0
+    buffer = []
+    for record in records:
+        if "error" in record:
+            continue  # extractors report an empty server response as an error record
+        buffer.append(record)
+        if len(buffer) >= buffer_rows:
+            written += _flush(file, writer.writerows, buffer, progress, written)
+            buffer = []
+
+    if buffer:
+        written += _flush(file, writer.writerows, buffer, progress, written)
+
+    return written
+
+
+def write_emails_jsonl(file: TextIO, records: Iterable[dict], columns: Sequence[str] = EXPORT_COLUMNS,
+                       buffer_rows: int = EXPORT_BUFFER_ROWS, progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Writes one JSON object per record and line, keeping only `columns`, flushed like the CSV export.
+
+    :return: The number of rows written.
+    """
+    def write_lines(rows: list[dict]) -> None:
+        file.writelines(json.dumps({column: row.get(column) for column in columns}, ensure_ascii=False) + "\n"
+                        for row in rows)
+
+    written = 0
+    buffer = []
+    for record in records:
+        if "error" in record:
+            continue
+        buffer.append(record)
+        if len(buffer) >= buffer_rows:
+            written += _flush(file, write_lines, buffer, progress, written)
+            buffer = []
+
+    if buffer:
+        written += _flush(file, write_lines, buffer, progress, written)
+
+    return written
+
+
+def _flush(file: TextIO, write_rows: Callable[[list[dict]], None], buffer: list[dict],
+           progress: Optional[Callable[[int], None]], written: int) -> int:
+    write_rows(buffer)
+    file.flush()
+    if progress is not None:
+        progress(written + len(buffer))
+    return len(buffer)
+
+
+def parse_email_date(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parses a Date header into a UTC datetime; headers without a zone are taken as UTC.
+    """
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def export_emails_to_arrow(file_path: str, records: Iterable[dict], file_format: Optional[str] = None,
+                           batch_rows: int = ROW_GROUP_ROWS,
+                           progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Writes records as Parquet or Arrow IPC with typed columns: from/subject/body
+    as strings, date as a UTC timestamp, uid and size as integers.
+
+    Each `batch_rows` records become one Parquet row group (or Arrow record
+    batch), so only one batch is ever held in memory. The format follows the
+    file suffix (.parquet or .arrow/.feather) unless given explicitly.
+
+    :return: The number of rows written.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Parquet/Arrow export requires the optional 'pyarrow' package")
+
+    if file_format is None:
+        file_format = "parquet" if file_path.endswith(".parquet") else "arrow"
+
+    schema = pa.schema([
+        ("from", pa.string()),
+        ("subject", pa.string()),
+        ("date", pa.timestamp("s", tz="UTC")),
+        ("body", pa.string()),
+        ("uid", pa.int64()),
+        ("size", pa.int64()),
+    ])
+
+    if file_format == "parquet":
+        writer = pq.ParquetWriter(file_path, schema)
+        write = writer.write_table
+    else:
+        writer = pa.ipc.new_file(file_path, schema)
+        write = writer.write
+
+    written = 0
+    with writer:
+        columns = {name: [] for name in schema.names}
+        for record in records:
+            if "error" in record:
+                continue  # extractors report an empty server response as an error record
+            for name in schema.names:
+                columns[name].append(parse_email_date(record.get(name)) if name == "date" else record.get(name))
+
+            if len(columns["uid"]) >= batch_rows:
+                written += _write_batch(pa, schema, write, columns, file_format, progress, written)
+
+        if columns["uid"]:
+            written += _write_batch(pa, schema, write, columns, file_format, progress, written)
+
+    return written
+
+
+def _write_batch(pa, schema, write: Callable, columns: dict[str, list], file_format: str,
+                 progress: Optional[Callable[[int], None]], written: int) -> int:
+    rows = len(columns["uid"])
+    batch = pa.RecordBatch.from_pydict(columns, schema=schema)
+    write(pa.Table.from_batches([batch]) if file_format == "parquet" else batch)
+    for values in columns.values():
+        values.clear()
+    if progress is not None:
+        progress(written + rows)
+    return rows
@@ -1,9 +1,18 @@
 import logging
 
-from .imap import EmailFilter, EmailParserService, EmailDetailsExtractor, EmailTrashService
+from .imap import EmailFilter, EmailParserService, EmailDetailsExtractor, EmailTrashService, FETCH_BATCH_SIZE
+from .cache import MessageCache
+from .sync import FolderSync
+from .index import open_index
+from .pool import IMAPConnectionPool
+from .parallel import ParallelDetailsExtractor
+from .uidset import UIDSet
+from .senders import SenderAggregator, TopSenders, CountMinSketch, rank_senders
+from .export import export_emails_to_csv
+from .threads import group_threads
+from .query import Query, MATCH_ALL
 import socket
-import csv
-from typing import TextIO, Sequence, Any
+from typing import Sequence, Any, Iterator, Iterable, Optional, Callable
 from imapclient import IMAPClient
 from collections import defaultdict
 
@@ -21,18 +30,17 @@ def is_connected(host="8.8.8.8", port=53, timeout=2):
         return False
 
 
-def save_emails_to_csv(file_path: str, data: list[dict[str, str]]):
-    with open(file_path, mode="w", newline="", encoding="utf-8") as file:  # type: TextIO
-        writer = csv.DictWriter(file, fieldnames=["from", "subject", "date", "body"])  # noqa
-        writer.writeheader()
-        writer.writerows(data)
+def save_emails_to_csv(file_path: str, data: Iterable[dict[str, str]],
+                       progress: Optional[Callable[[int], None]] = None) -> int:
+    return export_emails_to_csv(file_path, data, progress=progress)
 
 
-def move_to_trash(conn: IMAPClient, ids: Sequence[bytes])-> tuple[bool, str]:
+def move_to_trash(conn: IMAPClient, ids: Sequence[int] | UIDSet,
+                  progress: Optional[Callable[[int, int], None]] = None)-> tuple[bool, str]:
     conn = conn
     email_ids = ids
     trash_service = EmailTrashService(conn)
-    return trash_service.move_to_trash(email_ids)
+    return trash_service.move_to_trash(email_ids, progress)
 
 
 def get_folders(conn: IMAPClient) -> list[tuple[str, str]]:
@@ -56,20 +64,32 @@ def get_folders(conn: IMAPClient) -> list[tuple[str, str]]:
     return folder_names
 
 
-def sorted_emails(emails: list[dict] ) -> list[tuple[str, dict[str, Any]]]:
-    # Each sender maps to a list of their email UIDs
-    sender_data = defaultdict(lambda: {"count": 0, "uids": []})
+def sorted_emails(emails: Iterable[dict], top: Optional[int] = None, approximate: bool = False,
+                  progress: Optional[Callable[[list[tuple[str, dict[str, Any]]]], None]] = None,
+                  batch_size: int = FETCH_BATCH_SIZE) -> list[tuple[str, dict[str, Any]]]:
+    """ Groups emails by sender, largest sender first.
+            :param top: Only return the K largest senders, selected with a heap as the emails stream past.
+            :param approximate: With `top`, count senders in a fixed-size sketch so memory does not grow
+                with the number of distinct senders; counts become estimates and late entrants' UID sets partial.
+            :param progress: With `top`, called with the current top K after every `batch_size` emails,
+                so the ranking can be shown while the rest are still arriving.
+            :return: (sender, {"count", "uids"}) pairs."""
+    if top is not None:
+        tracker = TopSenders(top, CountMinSketch() if approximate else None)
+        for count, email in enumerate(emails, 1):
+            tracker.add(email["from"], email["uid"])
+            if progress is not None and count % batch_size == 0:
+                progress(tracker.top())
+        return tracker.top()
+
+    # Each sender maps to the set of their email UIDs
+    sender_data = defaultdict(UIDSet)
 
     for email in emails:
-        sender = email["from"]
-        uid = email["uid"]
-        sender_data[sender]["count"] += 1
-        sender_data[sender]["uids"].append(uid)
+        sender_data[email["from"]].add(email["uid"])
 
     # Sort by count
-    sorted_senders = sorted(sender_data.items(), key=lambda x: x[1]["count"], reverse=True)
-
-    return sorted_senders
+    return rank_senders(sender_data)
 
 class EmailSearchError(Exception):
     def __init__(self, message: str):
@@ -90,17 +110,28 @@ class SearchEmails:
         Returns:
           A list of dictionaries with email details if successful, or an error string otherwise.
         """
-    def __init__(self, filters: dict[str, str], conn: IMAPClient):
+    def __init__(self, filters: dict[str, str] | Query, conn: IMAPClient,
+                 cache: Optional[MessageCache] = None, account: str = ""):
         """
                 Initializes the SearchEmails class.
 
-                :param filters: A dictionary containing filter criteria (e.g., sender, subject).
+                :param filters: A dictionary containing filter criteria (e.g., sender, subject),
+                    or a query built from Term/And/Or/Not for anything richer.
                 :param conn: An active connection object (typically an imaplib.IMAP4_SSL connection).
+                :param cache: Optional local message cache; already parsed messages are not fetched again.
+                :param account: Account name the cached messages are stored under.
                 """
         # Instantiate an EmailFilter using the dictionary's keys as arguments.
-        self.filters = EmailFilter(**filters)
+        self.filters = filters if isinstance(filters, Query) else EmailFilter(**filters)
+        self.query = self.filters.to_query() if isinstance(self.filters, EmailFilter) else self.filters
         self.conn = conn
         self.ids = None
+        self.cache = cache
+        self.account = account
+        self.folder = None
+        self.folder_cache = None
+        self.sync_result = None
+        self.index = open_index(cache)
 
 
     def get_email_ids(self, chosen_folder: str):
@@ -113,17 +144,36 @@ class SearchEmails:
                           3. If email IDs are returned (as a list), returns a list
                           4. If the search returns an error (i.e., not a list), an error string is returned.
 
-                        :return: A list of email ids if successful,
+                        :return: A UIDSet of email ids if successful,
                                  otherwise an error message string.
                         """
         # Instantiate the parser service using the active connection.
         parser = EmailParserService(server=self.conn, folder=chosen_folder)
-        # Search for email IDs using the filter criteria
-        self.ids = parser.search_emails(self.filters)
+        self.folder = chosen_folder
+
+        # Bind the cache to this folder; a changed UIDVALIDITY drops its stale entries
+        if self.cache is not None and parser.uidvalidity is not None:
+            self.folder_cache = self.cache.folder(self.account, chosen_folder, parser.uidvalidity)
+            self.sync_result = FolderSync(
+                self.conn, self.folder_cache, parser.folder_info, qresync=self.conn.has_capability('QRESYNC')
+            ).sync()
+
+        if self.sync_result is not None and self.query == MATCH_ALL:
+            # The synced UID list already answers an unfiltered search
+            self.ids = self.folder_cache.known_uids()
+        elif self.sync_result is not None and self.index is not None and isinstance(self.filters, EmailFilter) \
+                and self._index_ready():
+            # Every message of the folder is cached, so the local full-text index answers the search
+            self.ids = self.index.search(self.folder_cache, self.filters)
+        else:
+            # Search for email IDs using the filter criteria
+            self.ids = parser.search_emails(self.filters)
         # Check if the search returned a list of email IDs (successful search).
         if not isinstance(self.ids, list):
             raise EmailSearchError(f"Search failed: {self.ids}")
 
+        # Keep the result as ranges; it is sent back to the server in that compact form
+        self.ids = UIDSet(self.ids)
         return self.ids
 
     def get_email_data(self, key: str) -> list[dict[str, str]] | str:
@@ -135,10 +185,89 @@ class SearchEmails:
                          otherwise an error message string."""
 
         # Instantiate the extractor service to fetch the complete details for the email IDs.
-        extractor = EmailDetailsExtractor(self.conn, self.ids)
+        extractor = EmailDetailsExtractor(self.conn, self.ids, cache=self.folder_cache)
         email_details: dict = {
             "ALL": extractor.fetch_all_email_details,
-            "CURTAIN" : extractor.fetch_curtain_email_details
+            "CURTAIN" : extractor.fetch_curtain_email_details,
+            "PREVIEW": extractor.fetch_preview_email_details
         }
 
         return email_details[key]()
+
+    def get_sender_groups(self, progress: Optional[Callable[[int, int], None]] = None,
+                          top: Optional[int] = None) -> list[tuple[str, dict[str, Any]]]:
+        """ Groups the found emails by sender from their From headers, reusing the grouping stored for the folder.
+                :param progress: Called with (UIDs grouped, total) after every chunk.
+                :param top: Only rank the K largest senders, through a bounded heap instead of a full sort.
+                :return: (sender, {"count", "uids"}) pairs, most frequent sender first."""
+        return SenderAggregator(self.conn, self.ids or [], cache=self.folder_cache).ranked(progress, top)
+
+    def iter_sender_groups(self, progress: Optional[Callable[[int, int], None]] = None) -> Iterator[dict[str, UIDSet]]:
+        """ Like get_sender_groups, but yields the unranked sender -> UIDs grouping after every chunk,
+                so the biggest senders can be shown before the whole folder is read."""
+        return SenderAggregator(self.conn, self.ids or [], cache=self.folder_cache).iter_groups(progress)
+
+    def get_threads(self) -> list[tuple[int | str, dict[str, Any]]]:
+        """ Groups the found emails into conversations from their headers alone, most recently active first.
+                On Gmail the X-GM-THRID comes back in the same fetch, so this costs no extra round trip.
+                :return: (thread key, {"subject", "count", "uids", "senders", "latest"}) pairs."""
+        extractor = EmailDetailsExtractor(self.conn, self.ids or [], cache=self.folder_cache)
+        return group_threads(extractor.iter_envelopes())
+
+    def index_folder(self, batch_size: int = FETCH_BATCH_SIZE, progress: Optional[Callable[[int, int], None]] = None,
+                     conn: Optional[IMAPClient] = None) -> int:
+        """ Downloads every message of the searched folder that is not yet in the local index,
+                so later searches in this folder are answered offline.
+                :param progress: Called with (messages indexed, total) after every batch.
+                :param conn: Connection with the searched folder selected; defaults to the search's own.
+                :return: The number of messages that were indexed. A folder larger than the cache
+                    is left to the server, since eviction would drop what was just downloaded."""
+        if self.index is None or self.folder_cache is None:
+            return 0
+        if len(self.folder_cache.known_uids()) > self.cache.max_messages:
+            logging.info(f"Not indexing {self.folder}: it holds more messages than the cache keeps")
+            return 0
+
+        missing = self.index.unindexed_uids(self.folder_cache) or []
+        extractor = EmailDetailsExtractor(conn or self.conn, missing, batch_size=batch_size, cache=self.folder_cache)
+        indexed = 0
+        for _ in extractor.iter_email_details():
+            indexed += 1
+            if progress is not None and (indexed % batch_size == 0 or indexed == len(missing)):
+                progress(indexed, len(missing))
+        return indexed
+
+    def _index_ready(self) -> bool:
+        """ Whether the local index covers the whole folder. Mail that the sync just found in an
+                already indexed folder is downloaded first, so the index keeps up incrementally;
+                a folder that was never fully indexed falls back to the server until index_folder() runs."""
+        missing = self.index.unindexed_uids(self.folder_cache)
+        if missing and not self.sync_result.full and set(missing) <= set(self.sync_result.new):
+            self.index_folder()
+            missing = self.index.unindexed_uids(self.folder_cache)
+        return missing == []
+
+    def iter_preview_data(self, batch_size: int = FETCH_BATCH_SIZE) -> Iterator[dict]:
+        """ Streams subject, sender, date and a body snippet batch by batch, as get_email_data("PREVIEW") does at once.
+                :param batch_size: Number of UIDs fetched per IMAP command.
+                :return: A generator of preview dictionaries."""
+        extractor = EmailDetailsExtractor(self.conn, self.ids, batch_size=batch_size, cache=self.folder_cache)
+        return extractor.iter_preview_details()
+
+    def iter_email_data(self, batch_size: int = FETCH_BATCH_SIZE, workers: Optional[int] = None,
+                        pool: Optional[IMAPConnectionPool] = None, connections: int = 4) -> Iterator[dict]:
+        """ Streams full email details batch by batch instead of building the whole list.
+                :param batch_size: Number of UIDs fetched per IMAP command.
+                :param workers: Number of processes parsing MIME/HTML; None parses on the calling thread.
+                :param pool: When given, UID ranges are fetched concurrently over pooled connections.
+                :param connections: How many pooled connections fetch at the same time.
+                :return: A generator of dictionaries with the same keys as get_email_data("ALL")."""
+        if pool is not None:
+            return ParallelDetailsExtractor(
+                pool, self.folder, self.ids, connections=connections, batch_size=batch_size, cache=self.folder_cache
+            ).iter_email_details()
+
+        extractor = EmailDetailsExtractor(
+            self.conn, self.ids, batch_size=batch_size, cache=self.folder_cache, workers=workers
+        )
+        return extractor.iter_email_details()
@@ -0,0 +1,66 @@
+from html.parser import HTMLParser
+from typing import Optional
+
+from .metrics import timed
+
+
+SKIPPED_TAGS = {"script", "style", "template", "noscript"}
+FEED_CHUNK = 4096  # characters handed to the parser between budget checks
+
+
+class HTMLTextExtractor(HTMLParser):
+    """
+    Streaming HTML-to-text converter.
+
+    Text nodes are split into words as they arrive, so whitespace is collapsed
+    in the same pass. Content of script/style blocks is dropped, doctype and
+    comments never reach handle_data, and parsing stops once `limit`
+    characters of text have been collected.
+    """
+    def __init__(self, limit: Optional[int] = None):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.words: list[str] = []
+        self.length = 0
+        self.skip_depth = 0
+
+    @property
+    def done(self) -> bool:
+        return self.limit is not None and self.length >= self.limit
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.skip_depth or self.done:
+            return
+        for word in data.split():
+            self.words.append(word)
+            self.length += len(word) + 1
+            if self.done:
+                break
+
+    def text(self) -> str:
+        text = " ".join(self.words)
+        return text[:self.limit] if self.limit is not None else text
+
+
+@timed("html.to_text")
+def html_to_text(html: str, limit: Optional[int] = None) -> str:
+    """
+    Returns the visible text of an HTML document with whitespace collapsed,
+    reading no further than needed for `limit` characters.
+    """
+    parser = HTMLTextExtractor(limit)
+    for start in range(0, len(html), FEED_CHUNK):
+        parser.feed(html[start:start + FEED_CHUNK])
+        if parser.done:
+            break
+    else:
+        parser.close()
+    return parser.text()
@@ -1,32 +1,49 @@
+import base64
 import logging
-import re
+import quopri
+from collections import defaultdict
 from dataclasses import dataclass
-from typing import Optional, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import cached_property
+from itertools import repeat
+from typing import Callable, ContextManager, Iterator, Optional, Sequence
 from email import message_from_bytes
 from email.header import decode_header
-from bs4 import BeautifulSoup
+from email.utils import parsedate_to_datetime
 from imapclient import IMAPClient, exceptions as imap_exceptions
 import ssl
 
+from .cache import FolderCache
+from .sync import enable_qresync
+from .html_text import html_to_text
+from .uidset import UIDSet, imap_set
+from .metrics import get_metrics, timed, timed_fetch
+from .query import Query, Term, all_of, compile_query, check_locally, used_fields
+
 
 class EmailConnectionService:
-    def __init__(self, email: str, password: str, imap_server: str, port: int = 993):
+    def __init__(self, email: str, password: str, imap_server: str, port: int = 993, use_ssl: bool = True):
         self.imap_server = imap_server
         self.port = port
         self.email = email
         self.password = password
+        self.use_ssl = use_ssl  # False only for local bridges that speak plain IMAP
 
+    @timed("imap.connect")
     def connect(self):
         try:
-            context = ssl.create_default_context()
+            context = ssl.create_default_context() if self.use_ssl else None
             connection = IMAPClient(
                 host=self.imap_server,
                 port=self.port,
-                ssl=True,
+                ssl=self.use_ssl,
                 ssl_context=context,
                 use_uid=True  # recommended: always work with UIDs
             )
             connection.login(self.email, self.password)
+            # QRESYNC can only be enabled before a folder is selected
+            enable_qresync(connection)
             return connection  # Return live IMAPClient connection
         except imap_exceptions.LoginError as e:
             logging.warning(e)
@@ -68,77 +85,346 @@ class EmailFilter:
                 continue
 
             match key:
+                # IMAPClient quotes the values itself
                 case "sender":
-                    query += ['FROM', f'"{value}"']
+                    query += ['FROM', value]
                 case "subject":
-                    query += ['SUBJECT', f'"{value}"']
+                    query += ['SUBJECT', value]
                 case "since":
-                    query += ['SINCE', f'"{value}"']
+                    query += ['SINCE', value]
                 case "before":
-                    query += ['BEFORE', f'"{value}"']
+                    query += ['BEFORE', value]
                 case "text":
-                    query += ['TEXT', f'"{value}"']
+                    query += ['TEXT', value]
 
         return query if query else ["ALL"]
 
+    def to_query(self) -> Query:
+        """The filter in the query model, so it can be compiled for the server at hand."""
+        return all_of(*(
+            Term("from" if key == "sender" else key, value) for key, value in self.__dict__.items() if value is not None
+        ))
+
 
 class EmailParserService:
     def __init__(self, server: IMAPClient, folder: str):
         self.server = server
-        self.server.select_folder(folder)
+        self.folder = folder
+        with get_metrics().timer("imap.select"):
+            self.folder_info = self.server.select_folder(folder)
+        self.uidvalidity = self.folder_info.get(b'UIDVALIDITY')
 
-    def search_emails(self, filters: EmailFilter) -> list[bytes]:
+    def search_emails(self, filters: EmailFilter | Query) -> list[int]:
         """
         Returns list of UIDs matching the criteria.
+
+        The filter is compiled for this server: one X-GM-RAW search on Gmail,
+        standard SEARCH keys elsewhere. Whatever neither can express is checked
+        locally on the server's matches, fetching only the items it needs.
         """
-        # filters.to_imap_query might return like ['FROM', 'alice@example.com']
-        criteria = filters.to_imap_query()
-        uids = self.server.search(criteria)  # returns UIDs by default :contentReference[oaicite:3]{index=3} # noqa
-        return uids
+        query = filters.to_query() if isinstance(filters, EmailFilter) else filters
+        compiled = compile_query(query, gmail=self.server.has_capability('X-GM-EXT-1'))
+        with get_metrics().timer("imap.search"):
+            uids = self.server.search(compiled.criteria)  # returns UIDs by default :contentReference[oaicite:3]{index=3} # noqa
+        if compiled.residual is None or not uids:
+            return uids
+
+        with get_metrics().timer("search.residual"):
+            return self._check_locally(uids, compiled.residual)
+
+    def _check_locally(self, uids: list[int], residual: Query) -> list[int]:
+        fields = used_fields(residual)
+        items = ['RFC822.SIZE', 'FLAGS', RESIDUAL_HEADERS]
+        if 'has_attachment' in fields:
+            items.append('BODYSTRUCTURE')
+        if 'label' in fields and self.server.has_capability('X-GM-EXT-1'):
+            items.append('X-GM-LABELS')
+        if fields & {'text', 'body'}:
+            items.append('BODY.PEEK[]')  # only a residual TEXT/BODY term needs the whole message
+
+        matched = []
+        for batch in chunked(uids, FETCH_BATCH_SIZE):
+            messages = timed_fetch(self.server, imap_set(batch), items, "imap.fetch_residual")
+            for uid in batch:
+                data = messages.get(uid)
+                if data and check_locally(residual, message_facts(uid, data)):
+                    matched.append(uid)
+        get_metrics().count("search.residual.rejected", len(uids) - len(matched))
+        return matched
+
+
+def _text(value: bytes | str) -> str:
+    return value.decode(errors='replace') if isinstance(value, bytes) else value
+
+
+def message_facts(uid: int, data: dict) -> dict:
+    """What check_locally() looks at, from a FETCH response with RESIDUAL_HEADERS and friends."""
+    headers = message_from_bytes(data.get(RESIDUAL_HEADERS_KEY, b''))
+    try:
+        sent = parsedate_to_datetime(headers.get('Date', '')).date()
+    except (TypeError, ValueError, IndexError):
+        sent = None
+
+    body = ''
+    if b'BODY[]' in data:
+        msg = message_from_bytes(data[b'BODY[]'])
+        body = EmailDetailsExtractor._get_body(msg) # noqa
+
+    structure = data.get(b'BODYSTRUCTURE')
+    return {
+        'from': decode_mime_words(headers.get('From', '')).lower(),
+        'to': decode_mime_words(headers.get('To', '')).lower(),
+        'subject': decode_mime_words(headers.get('Subject', '')).lower(),
+        'body': body.lower(),
+        'date': sent,
+        'size': data.get(b'RFC822.SIZE') or 0,
+        'flags': {_text(flag).lstrip('\\').lower() for flag in data.get(b'FLAGS', ())},
+        'labels': {_text(label).lower() for label in data.get(b'X-GM-LABELS', ())},
+        'keywords': {_text(flag).lower() for flag in data.get(b'FLAGS', ()) if not _text(flag).startswith('\\')},
+        'has_attachment': any(_is_attachment(part) for _, part in _walk_structure(structure, '')),
+    }
+
+
+FETCH_BATCH_SIZE = 200  # number of UIDs requested per FETCH command
+PREVIEW_BYTES = 2048  # how much of the first text part is downloaded in preview mode
+PREVIEW_HEADERS = 'BODY.PEEK[HEADER.FIELDS (SUBJECT FROM DATE)]'
+ENVELOPE_HEADERS = 'BODY.PEEK[HEADER.FIELDS (MESSAGE-ID SUBJECT FROM DATE)]'
+RESIDUAL_HEADERS = 'BODY.PEEK[HEADER.FIELDS (FROM TO SUBJECT DATE)]'
+RESIDUAL_HEADERS_KEY = b'BODY[HEADER.FIELDS (FROM TO SUBJECT DATE)]'
+
+
+def chunked(items: Sequence | UIDSet, size: int) -> Iterator[Sequence | UIDSet]:
+    if isinstance(items, UIDSet):
+        yield from items.chunks(size)
+        return
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def find_text_part(structure, section: str = '') -> Optional[tuple[str, tuple]]:
+    """
+    Walks a BODYSTRUCTURE and returns (section number, part) of the first
+    inline text/plain part, falling back to the first inline text/html part.
+    """
+    plain, html = None, None
+    for number, part in _walk_structure(structure, section):
+        if _is_attachment(part):
+            continue
+        content_type = (part[0] or b'').lower(), (part[1] or b'').lower()
+        if content_type == (b'text', b'plain') and plain is None:
+            plain = (number, part)
+        elif content_type == (b'text', b'html') and html is None:
+            html = (number, part)
+    return plain or html
+
+
+def _walk_structure(structure, section: str) -> Iterator[tuple[str, tuple]]:
+    if structure is None:
+        return
+    if structure.is_multipart:
+        for index, child in enumerate(structure[0], start=1):
+            yield from _walk_structure(child, f"{section}.{index}" if section else str(index))
+    else:
+        # A single-part message keeps its text under section 1
+        yield section or '1', structure
+
+
+def _is_attachment(part) -> bool:
+    # The disposition follows the type-specific fields: text parts add a line count,
+    # message/rfc822 adds envelope, body and line count (RFC 3501 body-ext-1part)
+    media = (part[0] or b'').lower(), (part[1] or b'').lower()
+    index = 9 if media[0] == b'text' else 11 if media == (b'message', b'rfc822') else 8
+    disposition = part[index] if len(part) > index else None
+    return bool(disposition) and isinstance(disposition, tuple) and (disposition[0] or b'').lower() == b'attachment'
+
+
+def decode_partial_body(data: bytes, part) -> str:
+    """
+    Decodes a truncated body section using the encoding and charset from its BODYSTRUCTURE.
+    """
+    encoding = (part[5] or b'').lower()
+    if encoding == b'base64':
+        data = b''.join(data.split())
+        data = base64.b64decode(data[:len(data) - len(data) % 4])
+    elif encoding == b'quoted-printable':
+        data = quopri.decodestring(data)
+
+    params = dict(zip(part[2][::2], part[2][1::2])) if part[2] else {}
+    charset = params.get(b'charset') or params.get(b'CHARSET') or b'utf-8'
+    try:
+        return data.decode(charset.decode(), errors='replace')
+    except LookupError:
+        return data.decode('utf-8', errors='replace')
+
+
+def normalize_message_id(value: str) -> str:
+    """Message-ID without angle brackets or folding whitespace; empty when the header is missing."""
+    return ''.join(value.split()).strip('<>')
+
+
+def parse_message(uid: int, raw: bytes, body_limit: Optional[int] = None) -> dict:
+    """
+    Parses one RFC822 payload into the details dict. Kept at module level so
+    it can be shipped to worker processes. HTML bodies stop converting once
+    body_limit characters of text are collected.
+    """
+    msg = message_from_bytes(raw)                # :contentReference[oaicite:4]{index=4} # noqa
+
+    subject = decode_mime_words(msg.get('Subject', ''))
+    sender  = decode_mime_words(msg.get('From', '')).strip('<>')
+    date    = msg.get('Date', '')
+    body    = EmailDetailsExtractor._get_body(msg, body_limit) # noqa
+
+    return {
+        'subject': subject,
+        'from':    sender,
+        'date':    date,
+        'body':    ' '.join(body.split()),
+        'uid': uid,
+        'size': len(raw)
+    }
+
+
+def parse_message_timed(uid: int, raw: bytes, body_limit: Optional[int] = None) -> tuple[dict, list[tuple[str, float]]]:
+    """
+    parse_message for worker processes, which have metrics of their own: also
+    returns the (stage, seconds) timings recorded while parsing, for the parent to replay.
+    """
+    timings = []
+
+    def record(stage: str, seconds: float):
+        timings.append((stage, seconds))
+
+    get_metrics().add_listener(record)
+    try:
+        return parse_message(uid, raw, body_limit), timings
+    finally:
+        get_metrics().remove_listener(record)
 
 
 class EmailDetailsExtractor:
-    def __init__(self, server: IMAPClient, uids: list[int]):
+    def __init__(self, server: IMAPClient, uids: Sequence[int] | UIDSet, batch_size: int = FETCH_BATCH_SIZE,
+                 cache: Optional[FolderCache] = None, workers: Optional[int] = None,
+                 body_limit: Optional[int] = None):
         self.server = server
         self.uids = uids
+        self.batch_size = batch_size
+        self.cache = cache  # when set, only UIDs missing from the local cache are downloaded
+        self.workers = workers  # more than one spreads MIME parsing across processes
+        self.body_limit = body_limit  # character budget for HTML bodies, None keeps the full text
+
+    @cached_property
+    def gmail(self) -> bool:
+        """Whether the server exposes X-GM-MSGID/X-GM-THRID, which identify a message across all its labels."""
+        return self.server.has_capability('X-GM-EXT-1')
 
     def fetch_all_email_details(self) -> list[dict]: # noqa
         if not self.uids:
             return []
 
-        # 1) Batch‑fetch full RFC822 payloads
-        messages = self.server.fetch(self.uids, ['RFC822'])  # :contentReference[oaicite:3]{index=3} # noqa
-        if not messages:
+        details = list(self.iter_email_details())
+        if not details:
             return [{"error": "Server returned no messages"}]
 
-        details = []
-        for uid, data in messages.items():
-            if b'RFC822' not in data:
-                continue  # skip any malformed entries
-
-            raw = data[b'RFC822']
-            msg = message_from_bytes(raw)                # :contentReference[oaicite:4]{index=4} # noqa
-
-            subject = decode_mime_words(msg.get('Subject', ''))
-            sender  = decode_mime_words(msg.get('From', '')).strip('<>')
-            date    = msg.get('Date', '').split('+')[0]
-            body    = self._get_body(msg)
+        return details
 
-            details.append({
-                'subject': subject,
-                'from':    sender,
-                'date':    date,
-                'body':    ' '.join(body.split()),
-                'uid': uid
-            })
+    def iter_email_details(self) -> Iterator[dict]:
+        """
+        Fetches RFC822 payloads batch by batch and yields parsed details.
 
-        return details
+        The next batch is already requested from the server while the current
+        one is being parsed, so peak memory is bounded by two batches
+        instead of the whole result set.
+        """
+        if not self.uids:
+            return
+
+        batches = chunked(self.uids, self.batch_size)
+        # A single worker keeps exactly one FETCH in flight on the socket
+        with ThreadPoolExecutor(max_workers=1) as executor, self._parser_pool() as pool:
+            pending = self._submit_fetch(executor, next(batches, None))
+            while pending is not None:
+                batch, cached, future = pending
+                pending = self._submit_fetch(executor, next(batches, None))
+
+                fetched = {}
+                if future is not None:
+                    copies, messages = future.result()
+                    fetched = self._parse_batch(pool, messages)
+                    if self.cache is not None:
+                        self.cache.put_many([*fetched.values(), *copies.values()], complete=self.body_limit is None)
+                    fetched.update(copies)
+
+                for uid in batch:
+                    details = cached.get(uid) or fetched.get(uid)
+                    if details:
+                        yield details
+
+    def _submit_fetch(self, executor: ThreadPoolExecutor,
+                      batch: Optional[Sequence]) -> Optional[tuple[Sequence, dict, Optional[Future]]]:
+        if batch is None:
+            return None
+
+        cached = self.cache.get_many(batch, complete=self.body_limit is None) if self.cache is not None else {}
+        missing = [uid for uid in batch if uid not in cached]
+        future = executor.submit(self._fetch_missing, missing) if missing else None
+        return batch, cached, future
+
+    def _fetch_missing(self, uids: list[int]) -> tuple[dict[int, dict], dict]:
+        # Runs on the fetch thread, the only one talking to the server while a batch is in flight
+        copies = self._cached_copies(uids, complete=self.body_limit is None)
+        rest = [uid for uid in uids if uid not in copies]
+        return copies, timed_fetch(self.server, imap_set(rest), ['RFC822']) if rest else {}
+
+    def _cached_copies(self, uids: list[int], complete: bool) -> dict[int, dict]:
+        """
+        On Gmail, details of messages already cached under another label, found by X-GM-MSGID;
+        the ids are fetched in one cheap round trip per batch and kept for later searches.
+        """
+        if self.cache is None or not self.gmail:
+            return {}
+
+        ids = self.cache.gmail_ids(uids)
+        unknown = [uid for uid in uids if uid not in ids]
+        if unknown:
+            response = timed_fetch(self.server, imap_set(unknown), ['X-GM-MSGID', 'X-GM-THRID'], "imap.fetch_gmail_ids")
+            fetched = {uid: (data[b'X-GM-MSGID'], data[b'X-GM-THRID']) for uid, data in response.items()
+                       if b'X-GM-MSGID' in data and b'X-GM-THRID' in data}
+            self.cache.put_gmail_ids(fetched)
+            ids.update(fetched)
+
+        copies = self.cache.get_copies({uid: msgid for uid, (msgid, _) in ids.items()}, complete=complete)
+        get_metrics().count("messages.deduplicated", len(copies))
+        return copies
+
+    def _parser_pool(self) -> ContextManager[Optional[ProcessPoolExecutor]]:
+        if self.workers and self.workers > 1:
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return nullcontext()
+
+    def _parse_batch(self, pool: Optional[ProcessPoolExecutor], messages: dict) -> dict[int, dict]:
+        uids = [uid for uid, data in messages.items() if b'RFC822' in data]  # skip any malformed entries
+        raws = [messages[uid][b'RFC822'] for uid in uids]
+        get_metrics().count("mime.parse_batch.messages", len(uids))
+        with get_metrics().timer("mime.parse_batch"):
+            if pool is None:
+                return dict(zip(uids, map(parse_message, uids, raws, repeat(self.body_limit))))
+
+            # map keeps the input order; chunks amortise the pickling round trips
+            chunksize = max(1, len(uids) // (self.workers * 4))
+            results = pool.map(parse_message_timed, uids, raws, repeat(self.body_limit), chunksize=chunksize)
+            parsed = {}
+            for uid, (details, timings) in zip(uids, results):
+                for stage, seconds in timings:
+                    get_metrics().observe(stage, seconds)
+                parsed[uid] = details
+            return parsed
 
     def fetch_curtain_email_details(self) -> list[dict]:
         if not self.uids:
             return []
 
-        messages = self.server.fetch(self.uids, ['BODY.PEEK[HEADER.FIELDS (FROM)]'])
+        messages = timed_fetch(self.server, imap_set(self.uids), ['BODY.PEEK[HEADER.FIELDS (FROM)]'], "imap.fetch_headers")
         if not messages:
             return [{"error": "Server returned no messages"}]
 
@@ -158,8 +444,115 @@ class EmailDetailsExtractor:
 
         return details
 
+    def fetch_preview_email_details(self) -> list[dict]:
+        if not self.uids:
+            return []
+
+        details = list(self.iter_preview_details())
+        if not details:
+            return [{"error": "Server returned no messages"}]
+
+        return details
+
+    def iter_preview_details(self) -> Iterator[dict]:
+        """
+        Yields subject, sender, date and a short body snippet without downloading full messages.
+
+        Each batch costs two round trips: the headers plus BODYSTRUCTURE, then a partial
+        fetch of the first text part, grouped by section number.
+        """
+        for batch in chunked(self.uids, self.batch_size):
+            cached = self.cache.get_many(batch, complete=False) if self.cache is not None else {}
+            missing = [uid for uid in batch if uid not in cached]
+            copies = self._cached_copies(missing, complete=False) if missing else {}
+            missing = [uid for uid in missing if uid not in copies]
+            fetched = {details['uid']: details for details in self._fetch_previews(missing)} if missing else {}
+            if self.cache is not None:
+                self.cache.put_many([*fetched.values(), *copies.values()], complete=False)
+            fetched.update(copies)
+
+            for uid in batch:
+                details = cached.get(uid) or fetched.get(uid)
+                if details:
+                    yield details
+
+    def iter_envelopes(self) -> Iterator[dict]:
+        """
+        Yields Message-ID, subject, sender, date and size with one header fetch per batch and no bodies,
+        enough to recognise the same message in other folders before anything large is downloaded.
+        On Gmail the same fetch returns X-GM-MSGID and X-GM-THRID ("gm_msgid", "gm_thrid"; None elsewhere).
+        """
+        items = [ENVELOPE_HEADERS, 'RFC822.SIZE'] + (['X-GM-MSGID', 'X-GM-THRID'] if self.gmail else [])
+        for batch in chunked(self.uids, self.batch_size):
+            messages = timed_fetch(self.server, imap_set(batch), items, "imap.fetch_envelopes")
+            if self.gmail and self.cache is not None:
+                self.cache.put_gmail_ids({
+                    uid: (data[b'X-GM-MSGID'], data[b'X-GM-THRID']) for uid, data in messages.items()
+                    if b'X-GM-MSGID' in data and b'X-GM-THRID' in data
+                })
+
+            for uid in batch:
+                data = messages.get(uid)
+                header_data = data and data.get(b'BODY[HEADER.FIELDS (MESSAGE-ID SUBJECT FROM DATE)]')
+                if not header_data:
+                    continue
+
+                msg = message_from_bytes(header_data)
+                yield {
+                    'subject': decode_mime_words(msg.get('Subject', '')),
+                    'from':    decode_mime_words(msg.get('From', '')).strip('<>'),
+                    'date':    msg.get('Date', ''),
+                    'message_id': normalize_message_id(msg.get('Message-ID', '')),
+                    'gm_msgid': data.get(b'X-GM-MSGID'),
+                    'gm_thrid': data.get(b'X-GM-THRID'),
+                    'uid': uid,
+                    'size': data.get(b'RFC822.SIZE')
+                }
+
+    def _fetch_previews(self, batch: Sequence[int]) -> Iterator[dict]:
+        messages = timed_fetch(self.server, imap_set(batch), [PREVIEW_HEADERS, 'BODYSTRUCTURE', 'RFC822.SIZE'], "imap.fetch_headers")
+
+        text_parts = {}
+        sections = defaultdict(list)
+        for uid, data in messages.items():
+            found = find_text_part(data.get(b'BODYSTRUCTURE'))
+            if found:
+                text_parts[uid] = found
+                sections[found[0]].append(uid)
+
+        snippets = {}
+        for section, uids in sections.items():
+            prefix = f'BODY[{section}]'.encode()
+            snippet_data = timed_fetch(self.server, imap_set(uids), [f'BODY.PEEK[{section}]<0.{PREVIEW_BYTES}>'], "imap.fetch_snippets")
+            for uid, data in snippet_data.items():
+                raw = next((value for key, value in data.items() if key.startswith(prefix)), None)
+                if raw:
+                    snippets[uid] = raw
+
+        for uid, data in messages.items():
+            header_data = data.get(b'BODY[HEADER.FIELDS (SUBJECT FROM DATE)]')
+            if not header_data:
+                continue  # skip any malformed entries
+
+            msg = message_from_bytes(header_data)
+            body = ''
+            if uid in snippets:
+                part = text_parts[uid][1]
+                body = decode_partial_body(snippets[uid], part)
+                if (part[1] or b'').lower() == b'html':
+                    body = html_to_text(body, PREVIEW_BYTES)
+
+            yield {
+                'subject': decode_mime_words(msg.get('Subject', '')),
+                'from':    decode_mime_words(msg.get('From', '')).strip('<>'),
+                'date':    msg.get('Date', ''),
+                'body':    ' '.join(body.split()),
+                'uid': uid,
+                'size': data.get(b'RFC822.SIZE')
+            }
+
     @staticmethod
-    def _get_body(msg) -> str:
+    def _get_body(msg, limit: Optional[int] = None) -> str:
         if msg.is_multipart():
             for part in msg.walk():
                 content_type = part.get_content_type()
@@ -173,33 +566,72 @@ class EmailDetailsExtractor:
                 if part.get_content_type() == "text/html":
                     html_bytes = part.get_payload(decode=True)
                     if html_bytes:
-                        html = html_bytes.decode(errors="ignore")
-                        soup = BeautifulSoup(html, "html.parser")
-                        text = soup.get_text(separator="\n") # noqa
-                        return re.sub(r'(?i)<!doctype html[^>]*>', '', text).strip()
+                        return html_to_text(html_bytes.decode(errors="ignore"), limit)
         else:
             body_bytes = msg.get_payload(decode=True)
             if body_bytes:
-                text = body_bytes.decode(errors="ignore")
-                soup = BeautifulSoup(text, "html.parser")
-                text = soup.get_text(separator="\n") # noqa
-                return re.sub(r'(?i)<!doctype html[^>]*>', '', text).strip()
+                return html_to_text(body_bytes.decode(errors="ignore"), limit)
 
         return ""
 
 
+TRASH_CHUNK_SIZE = 1000  # UIDs per MOVE/COPY, keeps commands below server line-length limits
+
+
 class EmailTrashService:
-    def __init__(self, server: IMAPClient, trash_folder: str = '[Gmail]/Bin'):
+    def __init__(self, server: IMAPClient, trash_folder: str = '[Gmail]/Bin', chunk_size: int = TRASH_CHUNK_SIZE):
         self.server = server
         self.trash = trash_folder
+        self.chunk_size = chunk_size
+        self.moved = UIDSet()  # UIDs already committed, pass `uids - moved` again to resume after a failure
 
-    def move_to_trash(self, uids: Sequence[bytes]) -> tuple[bool, str]: # noqa
+    def move_to_trash(self, uids: Sequence[int] | UIDSet,
+                      progress: Optional[Callable[[int, int], None]] = None) -> tuple[bool, str]: # noqa
+        """
+        Moves messages to the trash folder chunk by chunk, reporting (moved, total) after each one.
+
+        Uses MOVE when the server advertises it. Otherwise it copies, flags and removes
+        exactly the copied UIDs with UID EXPUNGE (UIDPLUS), and only falls back to a
+        folder-wide EXPUNGE when neither extension is available.
+        """
         if not uids:
             return False, 'No emails to move.'
 
-        self.server.copy(uids, self.trash)
-        self.server.set_flags(uids, ['\\Deleted'], silent=True)
+        move_chunk = self._move_strategy()
+        total = len(uids)
+        done = 0  # moved by this call; self.moved also holds earlier calls' UIDs for resuming
+        for chunk in UIDSet(uids).chunks(self.chunk_size):
+            try:
+                with get_metrics().timer("imap.move_to_trash"):
+                    move_chunk(chunk)
+            except imap_exceptions.IMAPClientError as e:
+                logging.warning(e)
+                return False, f'Moved {done} of {total} message(s) to {self.trash} before an error: {e}'
+
+            self.moved = self.moved | chunk
+            done += len(chunk)
+            get_metrics().count("messages.moved", len(chunk))
+            if progress is not None:
+                progress(done, total)
+
+        return True, f'Moved {total} message(s) to {self.trash}.'
+
+    def _move_strategy(self) -> Callable[[UIDSet], None]:
+        if self.server.has_capability('MOVE'):
+            return self._move
+        if self.server.has_capability('UIDPLUS'):
+            return self._copy_and_uid_expunge
+        return self._copy_and_expunge
+
+    def _move(self, uids: UIDSet) -> None:
+        self.server.move(imap_set(uids), self.trash)
+
+    def _copy_and_uid_expunge(self, uids: UIDSet) -> None:
+        self.server.copy(imap_set(uids), self.trash)
+        self.server.set_flags(imap_set(uids), ['\\Deleted'], silent=True)
+        self.server.uid_expunge(imap_set(uids))
+
+    def _copy_and_expunge(self, uids: UIDSet) -> None:
+        self.server.copy(imap_set(uids), self.trash)
+        self.server.set_flags(imap_set(uids), ['\\Deleted'], silent=True)
         self.server.expunge()
-        return True, f'Moved {len(uids)} message(s) to {self.trash}.'
-
-
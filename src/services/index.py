@@ -0,0 +1,138 @@
+import sqlite3
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from .cache import MessageCache, FolderCache
+from .imap import EmailFilter
+
+
+# The FTS table mirrors the cached messages through triggers, so every batch
+# stored by EmailDetailsExtractor is indexed as soon as it is written.
+# Accessed-time updates do not touch the indexed columns and skip the trigger.
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    subject, sender, body, content='messages', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, subject, sender, body) VALUES (new.rowid, new.subject, new.sender, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, subject, sender, body)
+    VALUES ('delete', old.rowid, old.subject, old.sender, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF subject, sender, body ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, subject, sender, body)
+    VALUES ('delete', old.rowid, old.subject, old.sender, old.body);
+    INSERT INTO messages_fts (rowid, subject, sender, body) VALUES (new.rowid, new.subject, new.sender, new.body);
+END;
+"""
+
+
+def message_day(date: Optional[str]) -> Optional[str]:
+    """
+    Converts a cached Date header into an ISO day so SINCE/BEFORE compare as strings.
+    """
+    if not date:
+        return None
+    try:
+        return parsedate_to_datetime(date).date().isoformat()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def filter_day(value: str) -> str:
+    # EmailFilter dates are entered as DD-Mon-YYYY
+    return datetime.strptime(value, "%d-%b-%Y").date().isoformat()
+
+
+def fts_phrase(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+class LocalSearchIndex:
+    """
+    SQLite FTS5 index over the bodies stored in the message cache.
+
+    A folder can be searched locally once it has been synced and every UID in
+    it has a fully parsed message in the cache; otherwise callers fall back to IMAP.
+    """
+    def __init__(self, cache: MessageCache):
+        self.cache = cache
+        with cache.lock, cache.db:
+            created = cache.db.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+            ).fetchone() is None
+            # REPLACE only fires the delete trigger with recursive triggers on
+            cache.db.execute("PRAGMA recursive_triggers = ON")
+            cache.db.executescript(SCHEMA)
+            if created:
+                cache.db.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+            cache.db.create_function("message_day", 1, message_day, deterministic=True)
+
+    def unindexed_uids(self, folder_cache: FolderCache) -> Optional[list[int]]:
+        """
+        Returns UIDs of the folder without a fully parsed cached message,
+        or None when the folder has never been synced.
+        """
+        if folder_cache.highest_modseq() is None:
+            return None
+
+        account, folder, uidvalidity = folder_cache.key
+        with self.cache.lock:
+            rows = self.cache.db.execute(
+                "SELECT f.uid FROM folder_uids f LEFT JOIN messages m "
+                "ON m.account = f.account AND m.folder = f.folder AND m.uidvalidity = ? "
+                "AND m.uid = f.uid AND m.complete = 1 "
+                "WHERE f.account = ? AND f.folder = ? AND m.uid IS NULL ORDER BY f.uid",
+                (uidvalidity, account, folder)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def is_indexed(self, folder_cache: FolderCache) -> bool:
+        return self.unindexed_uids(folder_cache) == []
+
+    def search(self, folder_cache: FolderCache, filters: EmailFilter) -> list[int]:
+        """
+        Answers an EmailFilter from the local index. FROM and SUBJECT keep the IMAP
+        substring semantics, TEXT is matched as an FTS phrase over subject and body.
+        """
+        account, folder, uidvalidity = folder_cache.key
+        query = (
+            "SELECT m.uid FROM messages m JOIN folder_uids f "
+            "ON f.account = m.account AND f.folder = m.folder AND f.uid = m.uid "
+            "WHERE m.account = ? AND m.folder = ? AND m.uidvalidity = ? AND m.complete = 1"
+        )
+        params: list = [account, folder, uidvalidity]
+
+        if filters.sender:
+            query += " AND m.sender LIKE ?"
+            params.append(f"%{filters.sender}%")
+        if filters.subject:
+            query += " AND m.subject LIKE ?"
+            params.append(f"%{filters.subject}%")
+        if filters.since:
+            query += " AND message_day(m.date) >= ?"
+            params.append(filter_day(filters.since))
+        if filters.before:
+            query += " AND message_day(m.date) < ?"
+            params.append(filter_day(filters.before))
+        if filters.text:
+            query += " AND m.rowid IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)"
+            params.append("{subject body} : " + fts_phrase(filters.text))
+
+        with self.cache.lock:
+            rows = self.cache.db.execute(query + " ORDER BY m.uid", params).fetchall()
+        return [row[0] for row in rows]
+
+
+def open_index(cache: Optional[MessageCache]) -> Optional[LocalSearchIndex]:
+    """
+    Attaches the full-text index to a cache, returning None when SQLite was built without FTS5.
+    """
+    if cache is None:
+        return None
+    try:
+        return LocalSearchIndex(cache)
+    except sqlite3.Error:
+        return None
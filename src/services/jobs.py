@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from .metrics import get_metrics
+
+
+JOB_HISTORY_SIZE = 50  # finished jobs kept for inspection
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    def __init__(self, message: str = "Job was cancelled"):
+        super().__init__(message)
+        self.message = message
+
+
+@dataclass
+class Job:
+    """
+    One unit of work run by a JobScheduler. Long-running work should call
+    `check()` between batches so a superseded job stops at the next boundary.
+    """
+    name: str
+    func: Callable[["Job"], Any]
+    destructive: bool = False
+    state: str = QUEUED
+    result: Any = None
+    error: Optional[BaseException] = None
+    submitted: float = field(default_factory=time.monotonic)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def check(self) -> None:
+        """Raises JobCancelled once the job has been cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    @property
+    def wait_time(self) -> Optional[float]:
+        """Seconds spent queued before the job started."""
+        return None if self.started is None else self.started - self.submitted
+
+    @property
+    def run_time(self) -> Optional[float]:
+        """Seconds spent running; None until the job has finished."""
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+
+class JobScheduler:
+    """
+    Runs a view's IMAP work one job at a time on a single worker thread.
+
+    Jobs run strictly in submission order, so two commands never share the
+    connection at once and a destructive job (moving mail to the Bin) only
+    starts after the reads submitted before it. Non-destructive jobs are
+    single-flight per name: submitting a new "search" cancels the queued or
+    running one it supersedes. Destructive jobs are never cancelled that way.
+    """
+    def __init__(self, history_size: int = JOB_HISTORY_SIZE):
+        self.queue: deque[Job] = deque()
+        self.current: Optional[Job] = None
+        self.history: deque[Job] = deque(maxlen=history_size)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.worker: Optional[threading.Thread] = None
+
+    def submit(self, name: str, func: Callable[[Job], Any], destructive: bool = False) -> Job:
+        """
+        Queues `func(job)` to run after every job already submitted.
+        :param name: Jobs with the same name supersede each other unless destructive.
+        :param destructive: Marks work that must run to completion once queued.
+        :return: The queued job.
+        """
+        job = Job(name, func, destructive=destructive)
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("JobScheduler is shut down")
+            if not destructive:
+                self._cancel_matching(lambda queued: queued.name == name and not queued.destructive)
+            self.queue.append(job)
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._run, name="job-scheduler", daemon=True)
+                self.worker.start()
+            self.condition.notify()
+        return job
+
+    def cancel(self, name: Optional[str] = None) -> None:
+        """Cancels queued and running non-destructive jobs, only those called `name` if given."""
+        with self.condition:
+            self._cancel_matching(lambda job: not job.destructive and (name is None or job.name == name))
+
+    def jobs(self) -> list[Job]:
+        """Snapshot of finished, running and queued jobs, oldest first."""
+        with self.condition:
+            running = [self.current] if self.current is not None else []
+            return list(self.history) + running + list(self.queue)
+
+    def busy(self) -> bool:
+        with self.condition:
+            return self.current is not None or bool(self.queue)
+
+    def shutdown(self) -> None:
+        """Cancels whatever can be cancelled and stops the worker once the running job returns."""
+        with self.condition:
+            self.closed = True
+            self._cancel_matching(lambda job: not job.destructive)
+            self.condition.notify()
+
+    def _cancel_matching(self, predicate: Callable[[Job], bool]) -> None:
+        # caller holds the condition
+        if self.current is not None and predicate(self.current):
+            self.current.cancel()
+        for job in [job for job in self.queue if predicate(job)]:
+            job.cancel()
+            self.queue.remove(job)
+            self._finish(job, CANCELLED)
+
+    def _finish(self, job: Job, state: str) -> None:
+        job.state = state
+        job.finished = time.monotonic()
+        self.history.append(job)
+        if job.run_time is not None:
+            get_metrics().observe(f"job.{job.name}", job.run_time)
+        logging.info(
+            "job %s %s (waited %.3fs, ran %s)", job.name, state, job.wait_time or 0.0,
+            f"{job.run_time:.3f}s" if job.run_time is not None else "-"
+        )
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if not self.queue:
+                    return
+                job = self.current = self.queue.popleft()
+                job.state = RUNNING
+                job.started = time.monotonic()
+
+            state = DONE
+            try:
+                job.check()
+                job.result = job.func(job)
+            except JobCancelled:
+                state = CANCELLED
+            except Exception as error:
+                job.error = error
+                state = FAILED
+                logging.warning(f"Job {job.name} failed: {error}")
+
+            with self.condition:
+                self.current = None
+                self._finish(job, state)
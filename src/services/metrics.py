@@ -0,0 +1,209 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Iterator
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # seconds
+METRIC_PREFIX = "emailparser"
+
+
+class Histogram:
+    """Latency histogram with fixed bucket bounds, as OpenMetrics expects them."""
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation; the maximum for the +Inf bucket."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": round(self.max, 6),
+        }
+
+
+class Metrics:
+    """
+    Process-wide timers and counters for the hot paths.
+
+    Stages are timed with `timer()` (or the `timed` decorator) into latency
+    histograms; throughput is read from counters such as "bytes.received"
+    and "messages.fetched". Listeners receive every (stage, seconds) pair,
+    which is the hook for tracing or forwarding to another backend.
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: dict[str, float] = {}
+        self.listeners: list[Callable[[str, float], None]] = []
+        self.started = time.time()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+        for listener in self.listeners:
+            listener(stage, seconds)
+
+    def count(self, name: str, value: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def add_listener(self, listener: Callable[[str, float], None]) -> None:
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, float], None]) -> None:
+        self.listeners.remove(listener)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> dict:
+        """Counters and per-stage latency summaries, in seconds."""
+        with self.lock:
+            return {
+                "since": self.started,
+                "counters": dict(self.counters),
+                "stages": {stage: histogram.summary() for stage, histogram in sorted(self.histograms.items())},
+            }
+
+    def write_json(self, path: str | Path) -> None:
+        snapshot = self.snapshot()
+        snapshot["throughput"] = throughput(snapshot)
+        Path(path).write_text(json.dumps(snapshot, indent=2), encoding="utf-8")
+
+    def to_openmetrics(self) -> str:
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                metric = metric_name(name)
+                lines += [f"# TYPE {metric} counter", f"{metric}_total {value:g}"]
+            for stage, histogram in sorted(self.histograms.items()):
+                metric = metric_name(stage) + "_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines += [f"{metric}_sum {histogram.sum:.6f}", f"{metric}_count {histogram.count}"]
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_openmetrics(self, path: str | Path) -> None:
+        Path(path).write_text(self.to_openmetrics(), encoding="utf-8")
+
+
+def metric_name(name: str) -> str:
+    return METRIC_PREFIX + "_" + "".join(char if char.isalnum() else "_" for char in name)
+
+
+def payload_bytes(response: dict) -> int:
+    """Bytes of message data in a FETCH response: literals and sizes of every returned item."""
+    total = 0
+    for data in response.values():
+        for value in data.values():
+            if isinstance(value, (bytes, bytearray)):
+                total += len(value)
+    return total
+
+
+# The registry every service reports to; swap it with set_metrics() to collect elsewhere
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def set_metrics(registry: Metrics) -> None:
+    global _metrics
+    _metrics = registry
+
+
+def timed(stage: str) -> Callable:
+    """Decorator recording each call's duration under `stage`."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _metrics.timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_fetch(server, message_set: str, items: list, stage: str = "imap.fetch", **kwargs) -> dict:
+    """
+    server.fetch() recording the round trip under `stage`, plus the messages and payload bytes
+    received, both per stage ("<stage>.messages") and in total ("messages.fetched", "bytes.received").
+    """
+    with _metrics.timer(stage):
+        response = server.fetch(message_set, items, **kwargs)
+    received = payload_bytes(response)
+    _metrics.count(f"{stage}.messages", len(response))
+    _metrics.count(f"{stage}.bytes", received)
+    _metrics.count("messages.fetched", len(response))
+    _metrics.count("bytes.received", received)
+    return response
+
+
+def throughput(snapshot: dict) -> dict[str, dict[str, float]]:
+    """Messages and bytes per second of every fetch stage in a snapshot, over its time on the wire."""
+    rates = {}
+    for stage, summary in snapshot["stages"].items():
+        messages = snapshot["counters"].get(f"{stage}.messages")
+        if messages is None or not summary["sum"]:
+            continue
+        rates[stage] = {
+            "messages_per_second": round(messages / summary["sum"], 1),
+            "bytes_per_second": round(snapshot["counters"].get(f"{stage}.bytes", 0) / summary["sum"], 1),
+        }
+    return rates
@@ -0,0 +1,141 @@
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, Iterator, Optional
+
+from imapclient import exceptions as imap_exceptions
+
+from .cache import MessageCache
+from .functionality import SearchEmails, EmailSearchError
+from .imap import EmailDetailsExtractor, EmailFilter, FETCH_BATCH_SIZE
+from .metrics import get_metrics
+from .pool import IMAPConnectionPool, PoolError
+from .query import Query, QueryError
+
+
+DEFAULT_ACCOUNT_CONCURRENCY = 2  # folders of one account searched at the same time
+
+
+@dataclass(frozen=True)
+class SearchTarget:
+    account: str
+    folder: str
+
+
+@dataclass
+class FolderResult:
+    """
+    Outcome of one (account, folder) search. `messages` only holds the messages
+    not already returned for an earlier folder; `duplicates` counts the others.
+    """
+    target: SearchTarget
+    matched: int = 0
+    messages: list[dict] = field(default_factory=list)
+    duplicates: int = 0
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+def merge_key(message: dict, location: tuple[str, str, int]) -> str:
+    if message.get("gm_msgid") is not None:
+        return f"{location[0]}\0gm:{message['gm_msgid']}"  # X-GM-MSGID is only unique within one account
+    return message["message_id"] or "\0".join(map(str, location))
+
+
+class MultiFolderSearch:
+    """
+    Runs one filter across many (account, folder) pairs at once.
+
+    Every account gets its own worker threads, at most `concurrency` of them
+    (per account, or one limit for all), each searching one folder over a
+    connection from that account's pool. Folder results are yielded as soon as
+    each folder completes. Matches are fetched as envelopes only and merged by
+    X-GM-MSGID on Gmail and by Message-ID elsewhere, so a message that labels
+    put in several folders is returned once; the merged record lists every
+    place it was found in "locations". Messages without either are never merged.
+    """
+    def __init__(self, pools: dict[str, IMAPConnectionPool], targets: Iterable[tuple[str, str] | SearchTarget],
+                 filters: dict[str, str] | EmailFilter | Query, concurrency: int | dict[str, int] = DEFAULT_ACCOUNT_CONCURRENCY,
+                 cache: Optional[MessageCache] = None, batch_size: int = FETCH_BATCH_SIZE):
+        self.pools = pools
+        self.targets = [target if isinstance(target, SearchTarget) else SearchTarget(*target) for target in targets]
+        self.filters = asdict(filters) if isinstance(filters, EmailFilter) else filters
+        self.concurrency = concurrency
+        self.cache = cache
+        self.batch_size = batch_size
+        self.merged: dict[str, dict] = {}  # merge_key() -> first copy found
+
+        unknown = {target.account for target in self.targets} - set(pools)
+        if unknown:
+            raise ValueError(f"No connection pool for account(s): {', '.join(sorted(unknown))}")
+
+    def iter_results(self) -> Iterator[FolderResult]:
+        """Yields each folder's result as it completes, with its messages already deduplicated."""
+        executors = {
+            account: ThreadPoolExecutor(max_workers=self._limit(account), thread_name_prefix=f"search-{account}")
+            for account in dict.fromkeys(target.account for target in self.targets)
+        }
+        try:
+            futures: list[Future] = [
+                executors[target.account].submit(self._search_folder, target) for target in self.targets
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                self._merge(result)
+                yield result
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def search(self) -> list[dict]:
+        """Searches every target and returns the merged messages."""
+        for _ in self.iter_results():
+            pass
+        return list(self.merged.values())
+
+    def _limit(self, account: str) -> int:
+        limit = self.concurrency.get(account, DEFAULT_ACCOUNT_CONCURRENCY) if isinstance(self.concurrency, dict) \
+            else self.concurrency
+        return max(1, min(limit, self.pools[account].size))
+
+    def _search_folder(self, target: SearchTarget) -> FolderResult:
+        result = FolderResult(target)
+        start = time.perf_counter()
+        try:
+            with self.pools[target.account].connection(target.folder) as conn:
+                search = SearchEmails(self.filters, conn, cache=self.cache, account=target.account)
+                uids = search.get_email_ids(target.folder)
+                result.matched = len(uids)
+                extractor = EmailDetailsExtractor(conn, uids, batch_size=self.batch_size, cache=search.folder_cache)
+                result.messages = [
+                    dict(envelope, account=target.account, folder=target.folder)
+                    for envelope in extractor.iter_envelopes()
+                ]
+        except (EmailSearchError, PoolError, QueryError) as e:
+            logging.warning(e)
+            result.error = e.message
+        except imap_exceptions.IMAPClientError as e:
+            logging.warning(e)
+            result.error = f"IMAP error: {e}"
+        result.seconds = time.perf_counter() - start
+        get_metrics().observe("search.folder", result.seconds)
+        return result
+
+    def _merge(self, result: FolderResult) -> None:
+        # Runs on the consuming thread only, so the merged map needs no lock
+        fresh = []
+        for message in result.messages:
+            location = (message["account"], message["folder"], message["uid"])
+            key = merge_key(message, location)
+            first = self.merged.get(key)
+            if first is not None:
+                first["locations"].append(location)
+                result.duplicates += 1
+                continue
+            message["locations"] = [location]
+            self.merged[key] = message
+            fresh.append(message)
+
+        result.messages = fresh
+        get_metrics().count("search.duplicates", result.duplicates)
@@ -0,0 +1,62 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+from .cache import FolderCache
+from .imap import EmailDetailsExtractor, FETCH_BATCH_SIZE, chunked
+from .pool import IMAPConnectionPool
+from .uidset import UIDSet
+
+
+GMAIL_MAX_CONNECTIONS = 15  # Gmail refuses more simultaneous IMAP sessions per account
+
+
+class ParallelDetailsExtractor:
+    """
+    Fetches a large UID set over several pooled connections at once.
+
+    The sorted UIDs are cut into ranges of `batch_size`; up to `connections`
+    ranges are downloaded and parsed concurrently, and results are yielded
+    strictly in UID order. At most two ranges per connection are held in
+    memory, so the stream stays bounded however many UIDs are requested.
+    """
+    def __init__(self, pool: IMAPConnectionPool, folder: str, uids: Iterable[int], connections: int = 4,
+                 batch_size: int = FETCH_BATCH_SIZE, cache: Optional[FolderCache] = None,
+                 body_limit: Optional[int] = None):
+        self.pool = pool
+        self.folder = folder
+        self.uids = UIDSet(uids)
+        self.connections = max(1, min(connections, pool.size, GMAIL_MAX_CONNECTIONS))
+        self.batch_size = batch_size
+        self.cache = cache
+        self.body_limit = body_limit
+
+    def fetch_all_email_details(self) -> list[dict]:
+        if not self.uids:
+            return []
+
+        details = list(self.iter_email_details())
+        if not details:
+            return [{"error": "Server returned no messages"}]
+
+        return details
+
+    def iter_email_details(self) -> Iterator[dict]:
+        ranges = chunked(self.uids, self.batch_size)
+        with ThreadPoolExecutor(max_workers=self.connections) as executor:
+            pending = deque()
+            for uid_range in ranges:
+                pending.append(executor.submit(self._fetch_range, uid_range))
+                if len(pending) < self.connections * 2:
+                    continue
+                yield from pending.popleft().result()
+
+            while pending:
+                yield from pending.popleft().result()
+
+    def _fetch_range(self, uid_range: UIDSet) -> list[dict]:
+        with self.pool.connection(self.folder) as conn:
+            extractor = EmailDetailsExtractor(
+                conn, uid_range, batch_size=len(uid_range), cache=self.cache, body_limit=self.body_limit
+            )
+            return list(extractor.iter_email_details())
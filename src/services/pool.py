@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from imapclient import IMAPClient
+
+from .imap import EmailConnectionService
+from .jobs import JobCancelled
+
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_IDLE_TIMEOUT = 600.0  # seconds; Gmail closes sessions that stay quiet for much longer
+DEFAULT_HEALTH_CHECK_AFTER = 30.0  # seconds idle before a checkout pays for a NOOP round trip
+
+
+class PoolError(Exception):
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class IMAPConnectionPool:
+    """
+    Thread-safe pool of authenticated IMAPClient sessions for one account.
+
+    Connections are opened lazily up to `size`, checked with NOOP before they
+    are handed out once idle for `health_check_after` seconds, closed after
+    `idle_timeout` seconds unused, and remember
+    their selected folder so repeated checkouts for the same folder skip SELECT.
+    """
+    def __init__(self, service: EmailConnectionService, size: int = DEFAULT_POOL_SIZE,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT, health_check_after: float = DEFAULT_HEALTH_CHECK_AFTER):
+        self.service = service
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self._idle: list[tuple[IMAPClient, float]] = []
+        self._folders: dict[int, str] = {}
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def checkout(self, folder: Optional[str] = None, timeout: Optional[float] = None) -> IMAPClient:
+        conn, last_used = self._acquire(timeout)
+        try:
+            if conn is None:
+                conn = self._open()
+            elif time.monotonic() - last_used > self.health_check_after and not self._healthy(conn):
+                self._close(conn)
+                conn = self._open()
+
+            with self._cond:
+                # Without a folder the caller may SELECT any mailbox, so the remembered one can no longer be trusted
+                selected = self._folders.get(id(conn)) if folder is not None else self._folders.pop(id(conn), None)
+            if folder is not None and selected != folder:
+                conn.select_folder(folder)
+                with self._cond:
+                    self._folders[id(conn)] = folder
+            return conn
+        except Exception:
+            if conn is not None:
+                self._close(conn)
+            self._release_slot()
+            raise
+
+    def checkin(self, conn: IMAPClient, discard: bool = False) -> None:
+        with self._cond:
+            if discard or self._closed:
+                self._created -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard or self._closed:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self, folder: Optional[str] = None, timeout: Optional[float] = None) -> Iterator[IMAPClient]:
+        conn = self.checkout(folder, timeout)
+        try:
+            yield conn
+        except JobCancelled:
+            # Jobs stop between commands, so the session is still usable
+            self.checkin(conn)
+            raise
+        except Exception:
+            # The session may be mid-command; never hand it out again
+            self.checkin(conn, discard=True)
+            raise
+        else:
+            self.checkin(conn)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def _acquire(self, timeout: Optional[float]) -> tuple[Optional[IMAPClient], Optional[float]]:
+        """
+        Returns an idle connection and when it was checked in, or (None, None) when the caller may open a new one.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        expired = []
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError("Connection pool is closed")
+
+                    now = time.monotonic()
+                    while self._idle and now - self._idle[0][1] > self.idle_timeout:
+                        expired.append(self._idle.pop(0)[0])
+                        self._created -= 1
+
+                    if self._idle:
+                        return self._idle.pop()  # most recently used is least likely to be dropped
+                    if self._created < self.size:
+                        self._created += 1
+                        return None, None
+
+                    remaining = None if deadline is None else deadline - now
+                    if remaining is not None and remaining <= 0:
+                        raise PoolError("Timed out waiting for a free IMAP connection")
+                    self._cond.wait(remaining)
+        finally:
+            for conn in expired:
+                self._close(conn)
+
+    def _release_slot(self) -> None:
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def _open(self) -> IMAPClient:
+        conn = self.service.connect()
+        if not isinstance(conn, IMAPClient):
+            raise PoolError(conn)  # connect() reports failures as a message string
+        return conn
+
+    @staticmethod
+    def _healthy(conn: IMAPClient) -> bool:
+        try:
+            conn.noop()
+            return True
+        except Exception as e: # noqa
+            logging.warning(e)
+            return False
+
+    def _close(self, conn: IMAPClient) -> None:
+        with self._cond:
+            self._folders.pop(id(conn), None)
+        try:
+            conn.logout()
+        except Exception as e: # noqa
+            logging.warning(e)
@@ -0,0 +1,246 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Optional
+
+
+TEXT_FIELDS = ("from", "to", "subject", "text", "body")
+DATE_FIELDS = ("since", "before")
+SIZE_FIELDS = ("larger", "smaller")
+FIELDS = TEXT_FIELDS + DATE_FIELDS + SIZE_FIELDS + ("has_attachment", "flag", "label")
+FLAGS = ("seen", "answered", "flagged", "draft", "deleted")
+GMAIL_FLAGS = {"seen": "is:read", "flagged": "is:starred", "draft": "in:drafts"}  # the others have no X-GM-RAW form
+
+
+class QueryError(Exception):
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+@dataclass(frozen=True)
+class Term:
+    """
+    One condition. Text fields match case-insensitive substrings like IMAP SEARCH,
+    dates are DD-Mon-YYYY strings or dates, sizes are bytes, `flag` is one of FLAGS
+    and `label` a Gmail label (an IMAP keyword on other servers). has_attachment takes no value.
+    """
+    field: str
+    value: Any = None
+
+    def __post_init__(self):
+        if self.field not in FIELDS:
+            raise QueryError(f"Unknown filter field {self.field!r}")
+        if self.field == "flag" and self.value not in FLAGS:
+            raise QueryError(f"Unknown flag {self.value!r}, expected one of {', '.join(FLAGS)}")
+        if self.field in DATE_FIELDS:
+            object.__setattr__(self, "value", parse_day(self.value))
+        if self.field in SIZE_FIELDS:
+            object.__setattr__(self, "value", int(self.value))
+
+
+@dataclass(frozen=True)
+class And:
+    terms: tuple["Query", ...] = ()
+
+
+@dataclass(frozen=True)
+class Or:
+    terms: tuple["Query", ...]
+
+
+@dataclass(frozen=True)
+class Not:
+    term: "Query"
+
+
+Query = Term | And | Or | Not
+MATCH_ALL = And()
+
+
+def all_of(*terms: Query) -> And:
+    return And(tuple(terms))
+
+
+def any_of(*terms: Query) -> Or:
+    if not terms:
+        raise QueryError("OR needs at least one term")
+    return Or(tuple(terms))
+
+
+def parse_day(value: str | date) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(value, "%d-%b-%Y").date()
+    except ValueError:
+        raise QueryError(f"Invalid date {value!r}, expected DD-Mon-YYYY")
+
+
+def conjuncts(query: Query) -> list[Query]:
+    """The AND-ed parts of a query, with nested ANDs flattened."""
+    if isinstance(query, And):
+        return [part for term in query.terms for part in conjuncts(term)]
+    return [query]
+
+
+@dataclass
+class CompiledQuery:
+    criteria: list  # SEARCH keys for the server
+    residual: Optional[Query]  # what the server cannot express; checked locally against its matches
+
+
+def compile_query(query: Query, gmail: bool = False) -> CompiledQuery:
+    """
+    Splits a query into what the server runs and what is left to check locally.
+
+    On Gmail every part that has a search-operator form goes into one X-GM-RAW
+    string, answered from Gmail's own index. The rest, and everything on other
+    servers, becomes standard SEARCH keys. Parts neither can express (attachments
+    outside Gmail, or an OR/NOT around one) form the residual. The server then
+    returns a superset, which check_locally() narrows down.
+    """
+    raw, keys, residual = [], [], []
+    for part in conjuncts(query):
+        if gmail and (expression := to_gmail_raw(part)) is not None:
+            raw.append(expression)
+        elif (criteria := to_imap_keys(part)) is not None:
+            keys += criteria
+        else:
+            residual.append(part)
+
+    criteria = (["X-GM-RAW", " ".join(raw)] if raw else []) + keys
+    if not residual:
+        return CompiledQuery(criteria or ["ALL"], None)
+    return CompiledQuery(criteria or ["ALL"], residual[0] if len(residual) == 1 else And(tuple(residual)))
+
+
+def to_imap_keys(query: Query) -> Optional[list]:
+    """
+    Standard SEARCH keys for the query, or None when IMAP cannot express it. Values
+    stay unquoted strings and dates; IMAPClient quotes and formats them on the wire.
+    """
+    if isinstance(query, Term):
+        if query.field in TEXT_FIELDS:
+            return [query.field.upper(), str(query.value)]
+        if query.field in DATE_FIELDS:
+            return [query.field.upper(), query.value]
+        if query.field in SIZE_FIELDS:
+            return [query.field.upper(), str(query.value)]
+        if query.field == "flag":
+            return [query.value.upper()]
+        if query.field == "label":
+            return ["KEYWORD", query.value]
+        return None  # has_attachment
+
+    if isinstance(query, And):
+        keys = []
+        for term in query.terms:
+            term_keys = to_imap_keys(term)
+            if term_keys is None:
+                return None
+            keys += term_keys
+        return keys
+
+    if isinstance(query, Not):
+        keys = to_imap_keys(query.term)
+        return None if keys is None else ["NOT", _single_key(keys)]
+
+    operands = [to_imap_keys(term) for term in query.terms]
+    if any(keys is None for keys in operands):
+        return None
+    # SEARCH OR is binary: a OR b OR c becomes OR a (OR b c)
+    keys = operands[-1]
+    for operand in reversed(operands[:-1]):
+        keys = ["OR", _single_key(operand), _single_key(keys)]
+    return keys
+
+
+def _single_key(keys: list) -> Any:
+    # Several keys are AND-ed inside parentheses, which IMAPClient sends for a nested list
+    return keys[0] if len(keys) == 1 else keys
+
+
+def _gmail_value(value: str) -> str:
+    return '"' + str(value).replace('"', " ") + '"'
+
+
+def to_gmail_raw(query: Query) -> Optional[str]:
+    """The query as Gmail search operators for X-GM-RAW, or None when it has no exact Gmail form."""
+    if isinstance(query, Term):
+        match query.field:
+            case "from" | "to" | "subject":
+                return f"{query.field}:{_gmail_value(query.value)}"
+            case "text":
+                return _gmail_value(query.value)
+            case "since":
+                return f"after:{query.value:%Y/%m/%d}"
+            case "before":
+                return f"before:{query.value:%Y/%m/%d}"
+            case "larger" | "smaller":
+                return f"{query.field}:{query.value}"
+            case "has_attachment":
+                return "has:attachment"
+            case "flag":
+                return GMAIL_FLAGS.get(query.value)
+            case "label":
+                return f"label:{_gmail_value(query.value)}"
+        return None  # body: Gmail cannot leave the subject out
+
+    if isinstance(query, Not):
+        if isinstance(query.term, Not):
+            return to_gmail_raw(query.term.term)
+        inner = to_gmail_raw(query.term)
+        return None if inner is None else f"-{inner}"
+
+    parts = [to_gmail_raw(term) for term in query.terms]
+    if any(part is None for part in parts):
+        return None
+    if isinstance(query, Or):
+        return "{" + " ".join(parts) + "}"  # Gmail's OR group
+    return "(" + " ".join(parts) + ")" if len(parts) > 1 else "".join(parts)
+
+
+def used_fields(query: Query) -> set[str]:
+    if isinstance(query, Term):
+        return {query.field}
+    if isinstance(query, Not):
+        return used_fields(query.term)
+    return set().union(*(used_fields(term) for term in query.terms))
+
+
+def check_locally(query: Query, message: dict) -> bool:
+    """
+    Evaluates a query against one message's facts: lower-cased "from", "to", "subject",
+    "text" and "body", plus "date", "size", "flags", "labels", "keywords" and "has_attachment".
+    A label matches a Gmail label or, as to_imap_keys() sends it, an IMAP keyword.
+    """
+    if isinstance(query, And):
+        return all(check_locally(term, message) for term in query.terms)
+    if isinstance(query, Or):
+        return any(check_locally(term, message) for term in query.terms)
+    if isinstance(query, Not):
+        return not check_locally(query.term, message)
+
+    match query.field:
+        case "from" | "to" | "subject" | "body":
+            return str(query.value).lower() in message[query.field]
+        case "text":
+            needle = str(query.value).lower()
+            return any(needle in message[field] for field in ("from", "to", "subject", "body"))
+        case "since":
+            return message["date"] is not None and message["date"] >= query.value
+        case "before":
+            return message["date"] is not None and message["date"] < query.value
+        case "larger":
+            return message["size"] > query.value
+        case "smaller":
+            return message["size"] < query.value
+        case "has_attachment":
+            return message["has_attachment"]
+        case "flag":
+            return query.value in message["flags"]
+        case "label":
+            return query.value.lower() in message["labels"] or query.value.lower() in message["keywords"]
+    return False
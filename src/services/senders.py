@@ -0,0 +1,217 @@
+import hashlib
+import heapq
+from array import array
+from email import message_from_bytes
+from email.utils import parseaddr
+from typing import Callable, Iterable, Iterator, Optional, Any
+from imapclient import IMAPClient
+
+from .cache import FolderCache
+from .imap import decode_mime_words
+from .uidset import UIDSet, imap_set
+from .metrics import timed_fetch
+
+
+SENDER_CHUNK_SIZE = 2000  # UIDs per FROM-header fetch; the headers are small
+FROM_HEADER = 'BODY.PEEK[HEADER.FIELDS (FROM)]'
+UNKNOWN_SENDER = ""  # messages without a usable From header; remembered but never listed
+SKETCH_WIDTH = 1 << 16  # counters per count-min sketch row
+SKETCH_DEPTH = 4  # independent hash rows; the estimate is the minimum over them
+CANDIDATE_FACTOR = 4  # senders tracked per requested top-K slot in approximate mode
+
+
+def normalize_address(header: str) -> str:
+    """
+    Reduces a decoded From header to the bare, lower-cased mailbox, so
+    '"Ann" <Ann@Example.com>' and 'ann@example.com' count as one sender.
+    """
+    name, address = parseaddr(header)
+    address = address or header.strip().strip('<>')
+    return address.strip().lower()
+
+
+def rank_senders(groups: dict[str, UIDSet], top: Optional[int] = None) -> list[tuple[str, dict[str, Any]]]:
+    """
+    Orders senders by message count, in the (sender, {"count", "uids"}) form the results list shows.
+    With `top` only the K largest are selected, through a bounded heap instead of a full sort.
+    """
+    ranked = (
+        (sender, {"count": len(uids), "uids": uids})
+        for sender, uids in groups.items() if sender != UNKNOWN_SENDER and uids
+    )
+    if top is not None:
+        return heapq.nlargest(top, ranked, key=lambda item: item[1]["count"])
+    return sorted(ranked, key=lambda item: item[1]["count"], reverse=True)
+
+
+class CountMinSketch:
+    """
+    Fixed-size frequency estimator: memory is width * depth counters however
+    many distinct keys are added. Estimates never undercount.
+    """
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.rows = [array('L', bytes(array('L').itemsize * width)) for _ in range(depth)]
+
+    def _columns(self, key: str) -> Iterator[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=8 * self.depth).digest()
+        for row in range(self.depth):
+            yield int.from_bytes(digest[8 * row:8 * row + 8], "little") % self.width
+
+    def add(self, key: str, count: int = 1) -> int:
+        """Counts `key` and returns its new estimate."""
+        estimate = None
+        for row, column in zip(self.rows, self._columns(key)):
+            row[column] += count
+            estimate = row[column] if estimate is None else min(estimate, row[column])
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[column] for row, column in zip(self.rows, self._columns(key)))
+
+
+class TopSenders:
+    """
+    Incremental top-K of senders by message count, fed one (sender, uid) at a time.
+
+    By default every sender's UIDs are kept and `top()` selects the K
+    largest with a heap. Given a CountMinSketch, only K * CANDIDATE_FACTOR
+    candidates are tracked, so memory no longer grows with the number of
+    distinct senders: a sender displaces the smallest candidate once its
+    estimated count is larger. In that mode "count" is the sketch estimate
+    and "uids" holds only the messages seen since the sender became a
+    candidate, so a late entrant's set can be incomplete.
+    """
+    def __init__(self, k: int, sketch: Optional[CountMinSketch] = None):
+        if k <= 0:
+            raise ValueError(f"Top-K needs a positive k, got {k}")
+        self.k = k
+        self.sketch = sketch
+        self.groups: dict[str, UIDSet] = {}
+        self.counts: dict[str, int] = {}  # sketch estimates of the candidates
+        self.capacity = k * CANDIDATE_FACTOR
+        self.heap: list[tuple[int, str]] = []  # lazy min-heap over self.counts; stale entries are skipped
+
+    def add(self, sender: str, uid: int) -> None:
+        if self.sketch is None:
+            self.groups.setdefault(sender, UIDSet()).add(uid)
+            return
+
+        estimate = self.sketch.add(sender)
+        if sender not in self.groups:
+            if len(self.groups) >= self.capacity:
+                smallest = self._smallest()
+                if estimate <= self.counts[smallest]:
+                    return
+                del self.groups[smallest], self.counts[smallest]
+            self.groups[sender] = UIDSet()
+
+        self.groups[sender].add(uid)
+        self.counts[sender] = estimate
+        self._push(estimate, sender)
+
+    def update(self, groups: dict[str, UIDSet]) -> None:
+        for sender, uids in groups.items():
+            for uid in uids:
+                self.add(sender, uid)
+
+    def top(self) -> list[tuple[str, dict[str, Any]]]:
+        """The current K largest senders, largest first."""
+        if self.sketch is None:
+            return rank_senders(self.groups, self.k)
+        ranked = (
+            (sender, {"count": self.counts[sender], "uids": uids})
+            for sender, uids in self.groups.items() if sender != UNKNOWN_SENDER
+        )
+        return heapq.nlargest(self.k, ranked, key=lambda item: item[1]["count"])
+
+    def _push(self, estimate: int, sender: str) -> None:
+        heapq.heappush(self.heap, (estimate, sender))
+        if len(self.heap) > 2 * self.capacity:
+            # drop stale entries so the heap stays proportional to the candidates
+            self.heap = [(count, name) for name, count in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def _smallest(self) -> str:
+        while True:
+            count, sender = self.heap[0]
+            if self.counts.get(sender) == count:
+                return sender
+            heapq.heappop(self.heap)
+
+
+class SenderAggregator:
+    """
+    Groups a folder's messages by sender from their From headers alone.
+
+    Headers are fetched in chunks of `chunk_size` UIDs and folded into one
+    UIDSet per sender as they arrive. With a folder cache the grouping is
+    stored per folder, so a later run only fetches UIDs it has not seen;
+    UIDs that vanish are dropped from it when the folder is synced.
+    """
+    def __init__(self, server: IMAPClient, uids: Iterable[int], cache: Optional[FolderCache] = None,
+                 chunk_size: int = SENDER_CHUNK_SIZE):
+        self.server = server
+        self.uids = UIDSet(uids)
+        self.cache = cache
+        self.chunk_size = chunk_size
+
+    def iter_groups(self, progress: Optional[Callable[[int, int], None]] = None) -> Iterator[dict[str, UIDSet]]:
+        """
+        Yields sender -> UIDs for the requested UIDs grouped so far: once for what the
+        cache already knew, then after every fetched chunk. The same dict is updated in place.
+        :param progress: Called with (UIDs grouped, total) after every chunk.
+        """
+        stored = self.cache.sender_groups() if self.cache is not None else {}
+        seen = UIDSet.from_ranges(r for uids in stored.values() for r in uids.ranges)
+        missing = self.uids - seen
+
+        # The stored grouping can cover more of the folder than this search asked for
+        if seen - self.uids:
+            groups = {sender: uids & self.uids for sender, uids in stored.items()}
+        else:
+            groups = stored
+
+        total = len(self.uids)
+        done = total - len(missing)
+        if progress is not None:
+            progress(done, total)
+        yield groups
+
+        for chunk in missing.chunks(self.chunk_size):
+            touched = self._group_chunk(chunk, groups, stored)
+            if self.cache is not None:
+                self.cache.put_sender_groups({sender: stored[sender] for sender in touched})
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
+            yield groups
+
+    def aggregate(self, progress: Optional[Callable[[int, int], None]] = None) -> dict[str, UIDSet]:
+        """Returns sender -> UIDs for the requested UIDs."""
+        groups = {}
+        for groups in self.iter_groups(progress):
+            pass
+        return {sender: uids for sender, uids in groups.items() if uids}
+
+    def ranked(self, progress: Optional[Callable[[int, int], None]] = None,
+               top: Optional[int] = None) -> list[tuple[str, dict[str, Any]]]:
+        return rank_senders(self.aggregate(progress), top)
+
+    def _group_chunk(self, chunk: UIDSet, groups: dict[str, UIDSet], stored: dict[str, UIDSet]) -> set[str]:
+        messages = timed_fetch(self.server, imap_set(chunk), [FROM_HEADER], "imap.fetch_headers")
+        touched = set()
+
+        for uid in chunk:
+            header = messages.get(uid, {}).get(b'BODY[HEADER.FIELDS (FROM)]')
+            sender = UNKNOWN_SENDER
+            if header:
+                sender = normalize_address(decode_mime_words(message_from_bytes(header).get('From', '')))
+            # UIDs the server did not return are remembered too, so they are not asked for again
+            groups.setdefault(sender, UIDSet()).add(uid)
+            if stored is not groups:
+                stored.setdefault(sender, UIDSet()).add(uid)
+            touched.add(sender)
+
+        return touched
@@ -0,0 +1,108 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+from imapclient import IMAPClient, exceptions as imap_exceptions
+
+from .cache import FolderCache
+from .uidset import UIDSet
+
+
+@dataclass
+class SyncResult:
+    full: bool  # True when the whole folder had to be listed
+    new: list[int] = field(default_factory=list)
+    changed: list[int] = field(default_factory=list)
+    vanished: list[int] = field(default_factory=list)
+
+
+def enable_qresync(server: IMAPClient) -> bool:
+    """
+    Enables QRESYNC for the session. Has to run before the folder is selected.
+    """
+    if not server.has_capability('QRESYNC'):
+        return False
+    try:
+        return b'QRESYNC' in server.enable('QRESYNC')
+    except Exception as e: # noqa
+        logging.warning(e)
+        return False
+
+
+class FolderSync:
+    """
+    Keeps the local UID list and flags of a selected folder up to date using
+    CONDSTORE (RFC 7162). After the first full listing only messages whose
+    MODSEQ moved past the stored HIGHESTMODSEQ are fetched; with QRESYNC the
+    server also reports expunged UIDs as VANISHED, otherwise they are found
+    by comparing UID lists.
+    """
+    def __init__(self, server: IMAPClient, folder_cache: FolderCache, folder_info: dict, qresync: bool = False):
+        self.server = server
+        self.folder_cache = folder_cache
+        self.folder_info = folder_info
+        self.qresync = qresync
+
+    @property
+    def supported(self) -> bool:
+        return self.folder_info.get(b'HIGHESTMODSEQ') is not None
+
+    def sync(self) -> Optional[SyncResult]:
+        """
+        Brings the folder's cached state up to date. Returns None when the server
+        does not report HIGHESTMODSEQ for the folder.
+        """
+        if not self.supported:
+            return None
+
+        current = self.folder_info[b'HIGHESTMODSEQ']
+        previous = self.folder_cache.highest_modseq()
+
+        if previous is None:
+            return self._full_sync(current)
+        if previous == current:
+            return SyncResult(full=False)
+
+        return self._delta_sync(previous, current)
+
+    def _full_sync(self, current: int) -> SyncResult:
+        messages = self._fetch_flags() if self.folder_info.get(b'EXISTS') else {}
+        flags = {uid: data.get(b'FLAGS', ()) for uid, data in messages.items()}
+        self.folder_cache.apply_delta(flags, (), current, full=True)
+        return SyncResult(full=True, new=sorted(flags))
+
+    def _delta_sync(self, previous: int, current: int) -> SyncResult:
+        known = set(self.folder_cache.known_uids())
+        if self.qresync:
+            try:
+                messages = self._fetch_flags([f'CHANGEDSINCE {previous}', 'VANISHED'])
+            except imap_exceptions.IMAPClientError as e:
+                # QRESYNC advertised but not enabled on this session
+                logging.warning(e)
+                self.qresync = False
+        if not self.qresync:
+            messages = self._fetch_flags([f'CHANGEDSINCE {previous}'])
+        flags = {uid: data.get(b'FLAGS', ()) for uid, data in messages.items()}
+
+        if self.qresync:
+            vanished = set(self._pop_vanished())
+        else:
+            # Without QRESYNC only a plain UID listing reveals expunged messages
+            vanished = known - set(self.server.search(['ALL']))
+
+        result = SyncResult(
+            full=False,
+            new=sorted(uid for uid in flags if uid not in known),
+            changed=sorted(uid for uid in flags if uid in known),
+            vanished=sorted(vanished & known)
+        )
+        self.folder_cache.apply_delta(flags, result.vanished, current)
+        return result
+
+    def _fetch_flags(self, modifiers: Optional[list[str]] = None) -> dict:
+        return self.server.fetch('1:*', ['FLAGS'], modifiers=modifiers)
+
+    def _pop_vanished(self) -> Iterator[int]:
+        # IMAPClient only consumes FETCH responses, untagged VANISHED ones stay on the imaplib connection
+        for line in self.server._imap.untagged_responses.pop('VANISHED', []):  # noqa
+            text = line.decode() if isinstance(line, bytes) else str(line)
+            yield from UIDSet.parse(text.replace('(EARLIER)', '').strip())
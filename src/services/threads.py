@@ -0,0 +1,49 @@
+import re
+from typing import Any, Iterable
+
+from .senders import normalize_address
+from .uidset import UIDSet
+
+
+REPLY_PREFIX = re.compile(r"^\s*((re|fwd?|aw|wg|sv|vs)(\[\d+\])?\s*:\s*)+", re.IGNORECASE)
+
+
+def normalize_subject(subject: str) -> str:
+    """Subject without reply/forward prefixes, case or spacing, the fallback conversation key."""
+    return " ".join(REPLY_PREFIX.sub("", subject or "").split()).lower()
+
+
+def thread_key(message: dict) -> int | str:
+    """X-GM-THRID when the server reported one, otherwise the normalized subject."""
+    thread_id = message.get("gm_thrid")
+    return thread_id if thread_id is not None else normalize_subject(message.get("subject", ""))
+
+
+def group_threads(messages: Iterable[dict]) -> list[tuple[int | str, dict[str, Any]]]:
+    """
+    Groups envelopes into conversations, most recently active first.
+
+    Gmail's X-GM-THRID is used when present; other servers fall back to the
+    subject with its Re:/Fwd: prefixes removed.
+    :return: (key, {"subject", "count", "uids", "senders", "latest"}) pairs; "latest" is the newest UID.
+    """
+    threads: dict[int | str, dict[str, Any]] = {}
+    for message in messages:
+        key = thread_key(message)
+        thread = threads.get(key)
+        if thread is None:
+            thread = threads[key] = {"subject": message["subject"], "count": 0, "uids": UIDSet(), "senders": set(),
+                                     "latest": message["uid"], "first": message["uid"]}
+        thread["count"] += 1
+        thread["uids"].add(message["uid"])
+        thread["senders"].add(normalize_address(message["from"]))
+        thread["latest"] = max(thread["latest"], message["uid"])
+        if message["uid"] < thread["first"]:
+            # The oldest message carries the subject the conversation started with
+            thread["first"], thread["subject"] = message["uid"], message["subject"]
+
+    ranked = sorted(threads.items(), key=lambda item: item[1]["latest"], reverse=True)
+    for _, thread in ranked:
+        del thread["first"]
+        thread["senders"] = sorted(thread["senders"])
+    return ranked
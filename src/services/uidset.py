@@ -0,0 +1,178 @@
+from bisect import bisect_right
+from heapq import merge
+from typing import Iterable, Iterator, Union
+
+
+class UIDSet:
+    """
+    Set of message UIDs stored as sorted, non-adjacent inclusive ranges.
+
+    str() gives the IMAP sequence-set form ("1:500,502,600:9000"), which is
+    what IMAPClient sends when it is handed a string instead of a list, so a
+    search matching most of a folder costs a handful of ranges instead of
+    one number per message.
+    """
+    __slots__ = ("_ranges", "_len")
+
+    def __init__(self, uids: Iterable[int] = ()):
+        if isinstance(uids, UIDSet):
+            self._ranges = list(uids._ranges)
+            self._len = uids._len
+            return
+
+        ranges = []
+        for uid in sorted(set(uids)):
+            if ranges and uid == ranges[-1][1] + 1:
+                ranges[-1] = (ranges[-1][0], uid)
+            else:
+                ranges.append((uid, uid))
+        self._set_ranges(ranges)
+
+    @classmethod
+    def from_ranges(cls, ranges: Iterable[tuple[int, int]]) -> "UIDSet":
+        """Builds a set from (start, end) pairs in any order, merging overlaps."""
+        uid_set = cls()
+        uid_set._set_ranges(_coalesce(sorted((min(r), max(r)) for r in ranges)))
+        return uid_set
+
+    @classmethod
+    def parse(cls, text: Union[str, bytes]) -> "UIDSet":
+        """Parses an IMAP sequence set such as "300:310,405"."""
+        if isinstance(text, bytes):
+            text = text.decode()
+        ranges = []
+        for item in text.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            start, _, end = item.partition(":")
+            ranges.append((int(start), int(end or start)))
+        return cls.from_ranges(ranges)
+
+    def _set_ranges(self, ranges: list[tuple[int, int]]) -> None:
+        self._ranges = ranges
+        self._len = sum(end - start + 1 for start, end in ranges)
+
+    @property
+    def ranges(self) -> list[tuple[int, int]]:
+        return list(self._ranges)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __bool__(self) -> bool:
+        return bool(self._ranges)
+
+    def __iter__(self) -> Iterator[int]:
+        for start, end in self._ranges:
+            yield from range(start, end + 1)
+
+    def __contains__(self, uid: int) -> bool:
+        index = bisect_right(self._ranges, (uid, float("inf"))) - 1
+        return index >= 0 and self._ranges[index][0] <= uid <= self._ranges[index][1]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, UIDSet):
+            return NotImplemented
+        return self._ranges == other._ranges
+
+    __hash__ = None
+
+    def __or__(self, other: Iterable[int]) -> "UIDSet":
+        other = other if isinstance(other, UIDSet) else UIDSet(other)
+        result = UIDSet()
+        result._set_ranges(_coalesce(merge(self._ranges, other._ranges)))
+        return result
+
+    def __sub__(self, other: Iterable[int]) -> "UIDSet":
+        other = other if isinstance(other, UIDSet) else UIDSet(other)
+        result, removed, index = [], other._ranges, 0
+        for start, end in self._ranges:
+            # skip removed ranges that end before this one starts
+            while index < len(removed) and removed[index][1] < start:
+                index += 1
+            probe = index
+            while probe < len(removed) and removed[probe][0] <= end:
+                cut_start, cut_end = removed[probe]
+                if cut_start > start:
+                    result.append((start, cut_start - 1))
+                start = max(start, cut_end + 1)
+                if start > end:
+                    break
+                probe += 1
+            if start <= end:
+                result.append((start, end))
+        uid_set = UIDSet()
+        uid_set._set_ranges(result)
+        return uid_set
+
+    def __and__(self, other: Iterable[int]) -> "UIDSet":
+        return self - (self - other)
+
+    def add(self, uid: int) -> None:
+        index = bisect_right(self._ranges, (uid, float("inf")))
+        before = self._ranges[index - 1] if index > 0 else None
+        after = self._ranges[index] if index < len(self._ranges) else None
+
+        if before and before[0] <= uid <= before[1]:
+            return
+        joins_before = before is not None and before[1] + 1 == uid
+        joins_after = after is not None and after[0] - 1 == uid
+
+        if joins_before and joins_after:
+            self._ranges[index - 1:index + 1] = [(before[0], after[1])]
+        elif joins_before:
+            self._ranges[index - 1] = (before[0], uid)
+        elif joins_after:
+            self._ranges[index] = (uid, after[1])
+        else:
+            self._ranges.insert(index, (uid, uid))
+        self._len += 1
+
+    def discard(self, uids: Iterable[int]) -> None:
+        remaining = self - uids
+        self._set_ranges(remaining._ranges)
+
+    def chunks(self, size: int) -> Iterator["UIDSet"]:
+        """Splits the set, in UID order, into sets of at most `size` UIDs."""
+        chunk, count = [], 0
+        for start, end in self._ranges:
+            while start <= end:
+                take = min(end - start + 1, size - count)
+                chunk.append((start, start + take - 1))
+                count += take
+                start += take
+                if count == size:
+                    yield UIDSet._from_sorted(chunk)
+                    chunk, count = [], 0
+        if chunk:
+            yield UIDSet._from_sorted(chunk)
+
+    @classmethod
+    def _from_sorted(cls, ranges: list[tuple[int, int]]) -> "UIDSet":
+        uid_set = cls()
+        uid_set._set_ranges(ranges)
+        return uid_set
+
+    def __str__(self) -> str:
+        return ",".join(str(start) if start == end else f"{start}:{end}" for start, end in self._ranges)
+
+    def __repr__(self) -> str:
+        return f"UIDSet({str(self)!r})"
+
+
+def _coalesce(ranges: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    # ranges must arrive sorted by start
+    result = []
+    for start, end in ranges:
+        if result and start <= result[-1][1] + 1:
+            if end > result[-1][1]:
+                result[-1] = (result[-1][0], end)
+        else:
+            result.append((start, end))
+    return result
+
+
+def imap_set(uids: Iterable[int]) -> str:
+    """Returns the compact sequence-set string to hand to IMAPClient commands."""
+    return str(uids if isinstance(uids, UIDSet) else UIDSet(uids))
@@ -0,0 +1,56 @@
+import pytest
+from imapclient import IMAPClient
+
+from fake_imap import DEFAULT_CAPABILITIES, FakeIMAPServer
+from synthetic import Mailbox
+from services import EmailConnectionService, MessageCache
+
+
+MAILBOX_SIZE = 300  # enough for every kind of generated message, small enough to build once per session
+
+
+@pytest.fixture(scope="session")
+def mailbox() -> Mailbox:
+    return Mailbox(MAILBOX_SIZE, seed=3)
+
+
+@pytest.fixture
+def capabilities() -> tuple[str, ...]:
+    """Capabilities the fake server advertises; parametrize to drop or add extensions."""
+    return DEFAULT_CAPABILITIES
+
+
+@pytest.fixture
+def imap_server(mailbox, capabilities):
+    """A fake IMAP server with a fresh copy of the mailbox, served from a thread of this process."""
+    server = FakeIMAPServer(mailbox, capabilities=capabilities)
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def connect(imap_server):
+    """Opens logged-in connections to `imap_server` the way the app does; all are logged out afterwards."""
+    connections = []
+
+    def connect() -> IMAPClient:
+        conn = EmailConnectionService("test@example.com", "secret", "127.0.0.1", imap_server.port, use_ssl=False).connect()
+        assert isinstance(conn, IMAPClient), conn
+        connections.append(conn)
+        return conn
+
+    yield connect
+    for conn in connections:
+        try:
+            conn.logout()
+        except Exception: # noqa
+            pass
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = MessageCache(tmp_path / "cache.sqlite3")
+    yield cache
+    cache.close()
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.aio import AsyncSearchEmails, run_blocking
+
+
+class Connection:
+    """Stands in for an IMAPClient; the lock is keyed on the object only."""
+
+
+def test_cancelled_call_keeps_the_connection_until_its_thread_finishes():
+    events = []
+    finished = threading.Event()
+
+    def command(name: str, seconds: float):
+        events.append(f"{name} start")
+        time.sleep(seconds)
+        events.append(f"{name} end")
+        finished.set()
+
+    async def main():
+        conn = Connection()
+        slow = asyncio.create_task(run_blocking(conn, command, "slow", 0.3))
+        await asyncio.sleep(0.05)
+        slow.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await slow
+        assert not finished.is_set()  # the awaiting task gave up, the command did not
+        await run_blocking(conn, command, "next", 0)
+
+    asyncio.run(main())
+    assert events == ["slow start", "slow end", "next start", "next end"]
+
+
+def test_error_of_an_abandoned_call_is_not_reported_as_unhandled():
+    unhandled = []
+
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError("lost connection")
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        task = asyncio.create_task(run_blocking(Connection(), failing))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        await asyncio.sleep(0.2)
+
+    asyncio.run(main())
+    assert unhandled == []
+
+
+def test_calls_on_different_connections_overlap():
+    running, overlapped = set(), []
+
+    def command(name: str):
+        running.add(name)
+        time.sleep(0.1)
+        overlapped.append(len(running) > 1)
+        running.discard(name)
+
+    async def main():
+        await asyncio.gather(run_blocking(Connection(), command, "a"), run_blocking(Connection(), command, "b"))
+
+    asyncio.run(main())
+    assert any(overlapped)
+
+
+def test_async_search_streams_previews(connect):
+    async def main():
+        search = AsyncSearchEmails({"subject": "invoice"}, connect())
+        uids = await search.get_email_ids("INBOX")
+        previews = [preview async for preview in search.iter_preview_data(batch_size=10)]
+        return uids, previews
+
+    uids, previews = asyncio.run(main())
+    assert uids
+    assert [preview["uid"] for preview in previews] == list(uids)
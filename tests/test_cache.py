@@ -0,0 +1,141 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+import services.cache
+from fake_imap import DEFAULT_CAPABILITIES, TRASH_FOLDER
+from services import SearchEmails
+from services.imap import EmailDetailsExtractor
+from services.uidset import UIDSet
+
+
+def details(uid: int, body: str = "full body") -> dict:
+    return {"uid": uid, "subject": f"subject {uid}", "from": "ann@example.com", "date": "Mon, 1 May 2023 10:00:00 +0000",
+            "body": body, "size": 1000 + uid}
+
+
+def fill(folder_cache) -> None:
+    folder_cache.put_many([details(1), details(2)])
+    folder_cache.apply_delta({1: [b"\\Seen"], 2: []}, (), highest_modseq=7, full=True)
+    folder_cache.put_sender_groups({"ann@example.com": UIDSet([1, 2])})
+    folder_cache.put_gmail_ids({1: (101, 201), 2: (102, 201)})
+
+
+def test_round_trip(cache):
+    folder_cache = cache.folder("me", "INBOX", 1)
+    folder_cache.put_many([details(1), details(2)])
+    assert folder_cache.get_many([1, 2, 3]) == {1: details(1), 2: details(2)}
+    assert folder_cache.get_many([]) == {}
+
+
+def test_preview_never_replaces_a_complete_message(cache):
+    folder_cache = cache.folder("me", "INBOX", 1)
+    folder_cache.put_many([details(1, "snippet"), details(2, "snippet")], complete=False)
+    folder_cache.put_many([details(2)])
+    folder_cache.put_many([details(2, "later snippet")], complete=False)
+
+    assert folder_cache.get_many([1, 2]) == {2: details(2)}  # previews only count when asked for
+    assert folder_cache.get_many([1, 2], complete=False) == {1: details(1, "snippet"), 2: details(2)}
+
+
+def test_same_uidvalidity_keeps_the_folder(cache):
+    fill(cache.folder("me", "INBOX", 1))
+    folder_cache = cache.folder("me", "INBOX", 1)
+    assert set(folder_cache.get_many([1, 2])) == {1, 2}
+    assert folder_cache.highest_modseq() == 7
+    assert folder_cache.known_uids() == [1, 2]
+
+
+def test_changed_uidvalidity_drops_everything_cached_for_the_folder(cache):
+    fill(cache.folder("me", "INBOX", 1))
+    fill(cache.folder("me", "Archive", 1))
+    fill(cache.folder("other", "INBOX", 1))
+
+    folder_cache = cache.folder("me", "INBOX", 2)
+    assert folder_cache.get_many([1, 2], complete=False) == {}
+    assert folder_cache.highest_modseq() is None
+    assert folder_cache.known_uids() == []
+    assert folder_cache.sender_groups() == {}
+    assert folder_cache.gmail_ids([1, 2]) == {}
+
+    # Other folders and accounts are untouched
+    assert set(cache.folder("me", "Archive", 1).get_many([1, 2])) == {1, 2}
+    assert cache.folder("other", "INBOX", 1).known_uids() == [1, 2]
+
+
+def test_vanished_uids_are_forgotten(cache):
+    folder_cache = cache.folder("me", "INBOX", 1)
+    fill(folder_cache)
+    folder_cache.apply_delta({3: []}, [1], highest_modseq=9)
+
+    assert folder_cache.known_uids() == [2, 3]
+    assert set(folder_cache.get_many([1, 2])) == {2}
+    assert folder_cache.sender_groups() == {"ann@example.com": UIDSet([2])}
+    assert folder_cache.gmail_ids([1, 2]) == {2: (102, 201)}
+    assert folder_cache.highest_modseq() == 9
+
+
+def test_evicts_least_recently_accessed(cache, monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(services.cache, "time", SimpleNamespace(time=lambda: next(clock)))
+    cache.max_messages = 3
+    folder_cache = cache.folder("me", "INBOX", 1)
+    for uid in (1, 2, 3):
+        folder_cache.put_many([details(uid)])
+    folder_cache.get_many([1])  # touched, so 2 is now the oldest
+    folder_cache.put_many([details(4)])
+    assert set(folder_cache.get_many([1, 2, 3, 4])) == {1, 3, 4}
+
+
+def test_search_drops_the_cache_when_the_server_resets_uidvalidity(connect, imap_server, cache):
+    conn = connect()
+    search = SearchEmails({"subject": "invoice"}, conn, cache=cache, account="me")
+    uids = search.get_email_ids("INBOX")
+    assert uids
+    fetched = list(search.iter_email_data())
+    assert set(search.folder_cache.get_many(list(uids))) == {message["uid"] for message in fetched}
+
+    imap_server.store.folders["INBOX"].uidvalidity += 1  # the server renumbered the folder
+    search = SearchEmails({"subject": "invoice"}, conn, cache=cache, account="me")
+    search.get_email_ids("INBOX")
+    assert search.folder_cache.key[2] == imap_server.store.folders["INBOX"].uidvalidity
+    assert search.folder_cache.get_many(list(uids), complete=False) == {}
+
+
+def test_copies_are_found_in_other_folders_by_gmail_id(cache):
+    inbox, work = cache.folder("me", "INBOX", 1), cache.folder("me", "Work", 5)
+    inbox.put_many([details(1)])
+    inbox.put_many([details(2, "snippet")], complete=False)
+    inbox.put_gmail_ids({1: (101, 201), 2: (102, 202)})
+
+    assert work.get_copies({7: 101, 8: 102, 9: 103}) == {7: dict(details(1), uid=7)}
+    assert set(work.get_copies({8: 102}, complete=False)) == {8}
+    assert inbox.get_copies({1: 101}) == {}  # the folder's own entry is not a copy
+
+
+@pytest.mark.parametrize("capabilities", [DEFAULT_CAPABILITIES + ("X-GM-EXT-1",)])
+def test_gmail_label_copies_are_not_downloaded_again(connect, cache, monkeypatch):
+    conn = connect()
+    inbox = conn.select_folder("INBOX")
+    uids = conn.search(["SUBJECT", "invoice"])[:10]
+    originals = list(EmailDetailsExtractor(conn, uids, cache=cache.folder("me", "INBOX", inbox[b"UIDVALIDITY"]))
+                     .iter_email_details())
+    conn.copy(uids, TRASH_FOLDER)
+
+    trash = conn.select_folder(TRASH_FOLDER)
+    copied = conn.search(["ALL"])
+    fetched = []
+    fetch = conn.fetch
+
+    def spy(messages, items, *args, **kwargs):
+        fetched.extend(items)
+        return fetch(messages, items, *args, **kwargs)
+
+    monkeypatch.setattr(conn, "fetch", spy)
+    copies = list(EmailDetailsExtractor(conn, copied, cache=cache.folder("me", TRASH_FOLDER, trash[b"UIDVALIDITY"]))
+                  .iter_email_details())
+
+    assert fetched == ["X-GM-MSGID", "X-GM-THRID"]
+    assert [dict(message, uid=None) for message in copies] == [dict(message, uid=None) for message in originals]
+    assert [message["uid"] for message in copies] == copied
@@ -0,0 +1,82 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from services.export import (
+    EXPORT_COLUMNS, export_emails_to_arrow, export_emails_to_csv, parse_email_date, write_emails_jsonl
+)
+from services.imap import parse_message
+
+
+def record(uid: int, date: str = "Mon, 1 Jan 2024 10:00:00 +0100") -> dict:
+    return {"uid": uid, "from": "Zoë <zoe@example.com>", "subject": f"report, part {uid}", "date": date,
+            "body": 'says "hi"\nand bye', "size": 100 + uid}
+
+
+RECORDS = [record(1), {"error": "Server returned no messages"}, record(2), record(3, date="")]
+
+
+def raw_message(date: str) -> bytes:
+    return f"From: ann@example.com\r\nSubject: hi\r\nDate: {date}\r\n\r\nbody\r\n".encode()
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("Mon, 1 Jan 2024 10:00:00 +0100", datetime(2024, 1, 1, 9, tzinfo=timezone.utc)),
+    ("Mon, 1 Jan 2024 10:00:00 -0500", datetime(2024, 1, 1, 15, tzinfo=timezone.utc)),
+    ("Mon, 1 Jan 2024 10:00:00", datetime(2024, 1, 1, 10, tzinfo=timezone.utc)),
+])
+def test_parsed_date_keeps_its_offset(header, expected):
+    assert parse_email_date(parse_message(1, raw_message(header))["date"]) == expected
+
+
+def test_unparseable_date_is_empty():
+    assert parse_email_date("") is None
+    assert parse_email_date("yesterday") is None
+
+
+# EXPORTERS
+
+@pytest.mark.parametrize("name", ["out.csv", "out.csv.gz"])
+def test_csv_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    progress = []
+    assert export_emails_to_csv(path, iter(RECORDS), buffer_rows=2, progress=progress.append) == 3
+    assert progress == [2, 3]
+
+    with (gzip.open(path, "rt", newline="", encoding="utf-8") if name.endswith(".gz")
+          else open(path, newline="", encoding="utf-8")) as file:
+        rows = list(csv.DictReader(file))
+    expected = [row for row in RECORDS if "error" not in row]
+    assert rows == [{column: str(row[column]) for column in ("from", "subject", "date", "body")} for row in expected]
+
+
+def test_jsonl_keeps_only_the_export_columns():
+    file = io.StringIO()
+    assert write_emails_jsonl(file, RECORDS) == 3
+    lines = file.getvalue().splitlines()
+    assert "Zoë" in lines[0]  # not escaped
+    assert [json.loads(line) for line in lines] == \
+           [{column: row[column] for column in EXPORT_COLUMNS} for row in RECORDS if "error" not in row]
+
+
+@pytest.mark.parametrize("name", ["out.parquet", "out.arrow"])
+def test_arrow_columns_are_typed(tmp_path, name):
+    pa = pytest.importorskip("pyarrow")
+    path = str(tmp_path / name)
+    assert export_emails_to_arrow(path, iter(RECORDS), batch_rows=2) == 3
+
+    if name.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        assert pq.ParquetFile(path).num_row_groups == 2
+        table = pq.read_table(path)
+    else:
+        table = pa.ipc.open_file(path).read_all()
+    date_type = table.schema.field("date").type
+    assert pa.types.is_timestamp(date_type) and date_type.tz == "UTC"  # Parquet stores seconds as ms
+    assert table.column("date").to_pylist() == [datetime(2024, 1, 1, 9, tzinfo=timezone.utc)] * 2 + [None]
+    assert table.column("uid").to_pylist() == [1, 2, 3]
+    assert table.column("size").to_pylist() == [101, 102, 103]
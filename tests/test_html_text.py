@@ -0,0 +1,68 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+
+import services.metrics
+from services.html_text import FEED_CHUNK, HTMLTextExtractor, html_to_text
+from services.imap import EmailDetailsExtractor
+from services.metrics import Metrics
+
+
+def test_collapses_whitespace_across_tags():
+    html = "<html><body><h1>Hello</h1>\n\n<p>  big\t world </p><br><div>again</div></body></html>"
+    assert html_to_text(html) == "Hello big world again"
+
+
+def test_drops_scripts_styles_and_comments():
+    html = (
+        "<!DOCTYPE html><head><style>p { color: red }</style><script>var x = '<p>no</p>';</script></head>"
+        "<body><!-- hidden --><noscript>enable js</noscript><p>visible</p><template><b>later</b></template></body>"
+    )
+    assert html_to_text(html) == "visible"
+
+
+def test_nested_skipped_blocks():
+    assert html_to_text("<noscript><style>a {}</style>still hidden</noscript>shown") == "shown"
+
+
+def test_decodes_character_references():
+    assert html_to_text("<p>Fish &amp; chips &lt;3 &#8364;5&nbsp;now</p>") == "Fish & chips <3 €5 now"
+
+
+def test_tolerates_broken_markup():
+    assert html_to_text("<p>unclosed <b>bold <i>both</p> tail") == "unclosed bold both tail"
+    assert html_to_text("") == ""
+    assert html_to_text("plain text, no tags") == "plain text, no tags"
+
+
+def test_limit_truncates_text():
+    html = "<p>" + " ".join(f"word{index}" for index in range(1000)) + "</p>"
+    text = html_to_text(html, limit=20)
+    assert len(text) == 20
+    assert html_to_text(html).startswith(text)
+
+
+def test_limit_stops_reading_early(monkeypatch):
+    fed = []
+    monkeypatch.setattr(HTMLTextExtractor, "feed", lambda self, data: fed.append(data) or HTMLParser.feed(self, data))
+    html = "<p>" + "start " * (10 * FEED_CHUNK) + "</p>"
+    html_to_text(html, limit=50)
+    assert len(fed) == 1  # the other nine chunks are never parsed
+
+
+def test_text_split_across_feed_chunks():
+    html = "x" * (FEED_CHUNK - 3) + " <b>joined</b> words"
+    assert html_to_text(html).endswith("joined words")
+
+
+def test_timings_from_worker_processes_reach_the_parent(monkeypatch):
+    metrics = Metrics()
+    monkeypatch.setattr(services.metrics, "_metrics", metrics)
+    raw = b"Subject: hi\r\nContent-Type: text/html\r\n\r\n<p>hello <b>world</b></p>\r\n"
+    extractor = EmailDetailsExtractor(None, [], workers=2)
+
+    # spawn: the suite runs server threads, which fork() would copy mid-flight
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        parsed = extractor._parse_batch(pool, {uid: {b"RFC822": raw} for uid in range(1, 9)})  # noqa
+    assert [details["body"] for details in parsed.values()] == ["hello world"] * 8
+    assert metrics.histograms["html.to_text"].count == 8
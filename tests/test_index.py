@@ -0,0 +1,101 @@
+import dataclasses
+import sqlite3
+
+import pytest
+
+from fake_imap import DEFAULT_CAPABILITIES
+from services import SearchEmails
+from services.imap import EmailParserService
+
+
+FILTERS = {"subject": "invoice"}
+
+
+def has_fts5() -> bool:
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE probe USING fts5(text)")
+        return True
+    except sqlite3.Error:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not has_fts5(), reason="SQLite was built without FTS5")
+
+
+@pytest.fixture
+def capabilities():
+    return DEFAULT_CAPABILITIES + ("CONDSTORE", "QRESYNC")
+
+
+@pytest.fixture
+def server_searches(monkeypatch):
+    """Counts searches that reached the server instead of the local index."""
+    calls = []
+    search = EmailParserService.search_emails
+    monkeypatch.setattr(EmailParserService, "search_emails", lambda self, filters: calls.append(filters) or search(self, filters))
+    return calls
+
+
+def search(conn, cache, filters=FILTERS) -> SearchEmails:
+    searcher = SearchEmails(filters, conn, cache=cache, account="me")
+    searcher.get_email_ids("INBOX")
+    return searcher
+
+
+def test_index_answers_once_the_folder_is_complete(connect, cache, server_searches):
+    conn = connect()
+    first = search(conn, cache)
+    assert len(server_searches) == 1  # nothing indexed yet
+    assert first.index_folder() == len(first.folder_cache.known_uids())
+
+    second = search(conn, cache)
+    assert len(server_searches) == 1
+    assert second.ids == first.ids
+
+
+def test_index_progress_reports_every_batch(connect, cache):
+    searcher = search(connect(), cache)
+    progress = []
+    total = searcher.index_folder(batch_size=100, progress=lambda done, count: progress.append((done, count)))
+    assert progress == [(100, total), (200, total), (total, total)]
+
+
+def test_new_mail_is_indexed_on_the_next_search(connect, imap_server, cache, server_searches):
+    conn = connect()
+    search(conn, cache).index_folder()
+    server_searches.clear()
+
+    inbox = imap_server.store.folders["INBOX"]
+    with imap_server.store.lock:
+        new = inbox.add(dataclasses.replace(inbox.messages[inbox.uids[0]], subject="invoice just arrived"), set())
+    searcher = search(conn, cache)
+    assert not server_searches
+    assert new in searcher.ids
+    assert searcher.index.is_indexed(searcher.folder_cache)
+
+    with imap_server.store.lock:
+        inbox.remove([new])
+    assert new not in search(conn, cache).ids
+    assert not server_searches
+
+
+def test_folder_that_was_never_indexed_is_not_downloaded_inline(connect, cache, server_searches):
+    conn = connect()
+    search(conn, cache)
+    searcher = search(conn, cache, {"subject": "meeting"})
+    assert len(server_searches) == 2
+    assert searcher.index.unindexed_uids(searcher.folder_cache)  # left to index_folder() in the background
+
+
+def test_messages_fetched_in_full_are_indexed_on_the_way(connect, cache):
+    searcher = search(connect(), cache)
+    before = set(searcher.index.unindexed_uids(searcher.folder_cache))
+    assert len(list(searcher.iter_email_data())) == len(searcher.ids)
+    assert set(searcher.index.unindexed_uids(searcher.folder_cache)) == before - set(searcher.ids)
+
+
+def test_folder_larger_than_the_cache_is_not_indexed(connect, cache):
+    searcher = search(connect(), cache)
+    cache.max_messages = len(searcher.folder_cache.known_uids()) - 1
+    assert searcher.index_folder() == 0
+    assert not searcher.index.is_indexed(searcher.folder_cache)
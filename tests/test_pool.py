@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from services import EmailConnectionService, IMAPConnectionPool, JobCancelled, PoolError
+
+
+@pytest.fixture
+def pool(imap_server):
+    service = EmailConnectionService("test@example.com", "secret", "127.0.0.1", imap_server.port, use_ssl=False)
+    pool = IMAPConnectionPool(service, size=2)
+    yield pool
+    pool.close()
+
+
+def test_reuses_connections_and_skips_repeated_select(pool, monkeypatch):
+    with pool.connection("INBOX") as first:
+        pass
+    selects = []
+    monkeypatch.setattr(first, "select_folder", lambda folder, *args, **kwargs: selects.append(folder))
+    with pool.connection("INBOX") as again:
+        assert again is first
+    assert selects == []
+
+
+def test_checkout_without_folder_forgets_the_selected_one(pool, imap_server):
+    # A caller that SELECTs for itself leaves the pool unsure which mailbox is open
+    with pool.connection("INBOX") as conn:
+        pass
+    with pool.connection() as conn:
+        conn.select_folder("[Gmail]/Bin")
+    with pool.connection("INBOX") as conn:
+        assert conn.search(["ALL"]) == imap_server.store.folders["INBOX"].uids
+
+
+def test_discards_a_connection_after_an_error(pool):
+    with pytest.raises(RuntimeError):
+        with pool.connection("INBOX") as broken:
+            raise RuntimeError("mid-command")
+    with pool.connection("INBOX") as conn:
+        assert conn is not broken
+
+
+def test_waits_for_a_free_connection(pool):
+    first, second = pool.checkout(), pool.checkout()
+    with pytest.raises(PoolError):
+        pool.checkout(timeout=0.05)
+
+    threading.Timer(0.05, pool.checkin, (first,)).start()
+    assert pool.checkout(timeout=2) is first
+    pool.checkin(first)
+    pool.checkin(second)
+
+
+def test_closed_pool_refuses_checkouts(pool):
+    pool.close()
+    with pytest.raises(PoolError):
+        pool.checkout()
+
+
+def test_cancelled_job_returns_its_connection(pool):
+    with pytest.raises(JobCancelled):
+        with pool.connection("INBOX") as first:
+            raise JobCancelled()
+    with pool.connection("INBOX") as again:
+        assert again is first
+
+
+def test_noop_only_after_the_connection_sat_idle(pool, monkeypatch):
+    with pool.connection("INBOX") as conn:
+        pass
+    noops = []
+    monkeypatch.setattr(conn, "noop", lambda: noops.append(conn))
+    with pool.connection("INBOX"):
+        pass
+    assert noops == []
+
+    pool.health_check_after = 0
+    time.sleep(0.01)
+    with pool.connection("INBOX"):
+        pass
+    assert noops == [conn]
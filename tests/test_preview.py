@@ -0,0 +1,93 @@
+import base64
+import quopri
+
+import pytest
+from imapclient.response_parser import parse_fetch_response
+
+from services.imap import EmailDetailsExtractor, _is_attachment, decode_partial_body, find_text_part  # noqa
+
+
+def structure(text: str):
+    return parse_fetch_response([b"1 (UID 1 BODYSTRUCTURE " + text.encode() + b")"])[1][b"BODYSTRUCTURE"]
+
+
+PLAIN = '("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 10 1 NIL NIL NIL NIL)'
+HTML = '("text" "html" ("charset" "utf-8") NIL NIL "7bit" 20 1 NIL NIL NIL NIL)'
+TEXT_ATTACHMENT = '("text" "plain" NIL NIL NIL "base64" 10 1 NIL ("attachment" ("filename" "a.txt")) NIL NIL)'
+PDF_ATTACHMENT = '("application" "pdf" NIL NIL NIL "base64" 300 NIL ("attachment" ("filename" "a.pdf")) NIL NIL)'
+FORWARDED = (
+    '("message" "rfc822" NIL NIL NIL "7bit" 400 '
+    '(NIL "hi" NIL NIL NIL NIL NIL NIL NIL NIL) ' + PLAIN + ' 12 NIL ("attachment" ("filename" "fwd.eml")) NIL NIL)'
+)
+
+
+# BODYSTRUCTURE
+
+@pytest.mark.parametrize("part, attached", [
+    (PLAIN, False),
+    (TEXT_ATTACHMENT, True),  # disposition at index 9, after the line count
+    (PDF_ATTACHMENT, True),  # index 8
+    (FORWARDED, True),  # index 11, after envelope, body and line count
+])
+def test_is_attachment(part, attached):
+    assert _is_attachment(structure(part)) is attached
+
+
+def test_single_part_message_is_section_one():
+    assert find_text_part(structure(PLAIN))[0] == "1"
+
+
+def test_nested_parts_are_numbered_by_depth():
+    nested = f'(({PLAIN}{HTML} "alternative" ("boundary" "b") NIL NIL NIL){PDF_ATTACHMENT} "mixed" ("boundary" "a") NIL NIL NIL)'
+    section, part = find_text_part(structure(nested))
+    assert section == "1.1"
+    assert part[1].lower() == b"plain"
+
+
+def test_text_attachments_are_skipped_for_html():
+    mixed = f'({TEXT_ATTACHMENT}{HTML} "mixed" ("boundary" "a") NIL NIL NIL)'
+    assert find_text_part(structure(mixed))[0] == "2"
+    assert find_text_part(structure(f'({PDF_ATTACHMENT}{FORWARDED} "mixed" ("boundary" "a") NIL NIL NIL)')) is None
+
+
+# TRUNCATED BODIES
+
+def part_with(encoding: str, charset: str = "utf-8"):
+    return structure(f'("text" "plain" ("charset" "{charset}") NIL NIL "{encoding}" 100 1 NIL NIL NIL NIL)')
+
+
+def test_truncated_base64_decodes_the_complete_groups():
+    encoded = base64.encodebytes("Grüße aus Köln, bis bald".encode())
+    for cut in range(8, len(encoded)):
+        text = decode_partial_body(encoded[:cut], part_with("base64"))
+        assert "Grüße aus Köln, bis bald".startswith(text.rstrip("�"))
+
+
+def test_truncated_quoted_printable_keeps_the_text_before_the_cut():
+    encoded = quopri.encodestring("café crème".encode())
+    assert decode_partial_body(encoded, part_with("quoted-printable")) == "café crème"
+    assert decode_partial_body(encoded[:encoded.index(b"=") + 2], part_with("quoted-printable")).startswith("caf")
+
+
+def test_declared_charset_is_used():
+    assert decode_partial_body("naïve".encode("latin-1"), part_with("8bit", "iso-8859-1")) == "naïve"
+    assert decode_partial_body(b"plain", part_with("8bit", "x-unknown")) == "plain"
+
+
+# AGAINST A SERVER
+
+def test_previews_match_the_full_messages(connect):
+    conn = connect()
+    conn.select_folder("INBOX")
+    uids = conn.search(["ALL"])[:60]
+    previews = list(EmailDetailsExtractor(conn, uids, batch_size=25).iter_preview_details())
+    full = {details["uid"]: details for details in EmailDetailsExtractor(conn, uids).iter_email_details()}
+
+    assert [preview["uid"] for preview in previews] == uids
+    for preview in previews:
+        message = full[preview["uid"]]
+        assert (preview["subject"], preview["from"], preview["date"]) == \
+               (message["subject"], message["from"], message["date"])
+        assert preview["body"]
+        # The snippet ends mid-word at the byte cut
+        assert message["body"].startswith(preview["body"].rsplit(" ", 1)[0])
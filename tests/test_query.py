@@ -0,0 +1,200 @@
+from datetime import date
+
+import pytest
+from imapclient.imapclient import _normalise_search_criteria
+
+from fake_imap import DEFAULT_CAPABILITIES
+from services import EmailFilter, QueryError, Term, And, Not, all_of, any_of, compile_query
+from services.imap import EmailParserService, RESIDUAL_HEADERS, chunked, message_facts
+from services.query import MATCH_ALL, check_locally, to_gmail_raw, to_imap_keys, used_fields
+from services.uidset import imap_set
+
+
+GMAIL_CAPABILITIES = DEFAULT_CAPABILITIES + ("X-GM-EXT-1",)
+
+
+def facts(**overrides) -> dict:
+    message = {
+        "from": "ann <ann@example.com>", "to": "me@example.com", "subject": "weekly report", "body": "see attached",
+        "date": date(2023, 5, 1), "size": 10_000, "flags": {"seen"}, "labels": set(), "keywords": set(),
+        "has_attachment": False,
+    }
+    return dict(message, **overrides)
+
+
+# TERMS
+
+def test_term_normalizes_dates_and_sizes():
+    assert Term("since", "01-Feb-2024").value == date(2024, 2, 1)
+    assert Term("before", date(2024, 2, 1)).value == date(2024, 2, 1)
+    assert Term("larger", "5000").value == 5000
+
+
+@pytest.mark.parametrize("field, value", [("sender", "x"), ("since", "2024-02-01"), ("flag", "important")])
+def test_term_rejects_bad_input(field, value):
+    with pytest.raises(QueryError):
+        Term(field, value)
+
+
+def test_any_of_needs_terms():
+    with pytest.raises(QueryError):
+        any_of()
+
+
+def test_email_filter_maps_sender_to_from():
+    query = EmailFilter(sender="ann@", subject="report").to_query()
+    assert query == all_of(Term("from", "ann@"), Term("subject", "report"))
+    assert EmailFilter().to_query() == MATCH_ALL
+
+
+def test_used_fields():
+    query = all_of(Term("from", "a"), Not(any_of(Term("has_attachment"), Term("label", "x"))))
+    assert used_fields(query) == {"from", "has_attachment", "label"}
+
+
+# IMAP SEARCH
+
+def test_imap_keys_for_terms():
+    assert to_imap_keys(Term("from", "ann@")) == ["FROM", "ann@"]
+    assert to_imap_keys(Term("since", "01-Feb-2024")) == ["SINCE", date(2024, 2, 1)]
+    assert to_imap_keys(Term("larger", 5000)) == ["LARGER", "5000"]
+    assert to_imap_keys(Term("flag", "seen")) == ["SEEN"]
+    assert to_imap_keys(Term("label", "Work")) == ["KEYWORD", "Work"]
+    assert to_imap_keys(Term("has_attachment")) is None
+
+
+def test_imap_keys_are_quoted_once_on_the_wire():
+    keys = to_imap_keys(all_of(Term("from", 'Ann "A" <ann@'), Term("since", "01-Feb-2024"), Term("subject", "news")))
+    assert _normalise_search_criteria(keys) == [b"FROM", b'"Ann \\"A\\" <ann@"', b"SINCE", b"01-Feb-2024", b"SUBJECT", b"news"]
+
+
+def test_imap_or_is_nested_in_pairs():
+    query = any_of(Term("from", "a"), Term("from", "b"), all_of(Term("subject", "c"), Term("flag", "seen")))
+    assert to_imap_keys(query) == ["OR", ["FROM", "a"], ["OR", ["FROM", "b"], ["SUBJECT", "c", "SEEN"]]]
+
+
+def test_imap_not_groups_several_keys():
+    assert to_imap_keys(Not(Term("flag", "seen"))) == ["NOT", "SEEN"]
+    assert to_imap_keys(Not(all_of(Term("from", "a"), Term("flag", "seen")))) == ["NOT", ["FROM", "a", "SEEN"]]
+
+
+def test_compile_plain_server():
+    compiled = compile_query(all_of(Term("from", "a"), Term("smaller", 100)))
+    assert compiled.criteria == ["FROM", "a", "SMALLER", "100"]
+    assert compiled.residual is None
+    assert compile_query(MATCH_ALL).criteria == ["ALL"]
+
+
+def test_compile_plain_server_leaves_attachments_to_the_residual():
+    attachment = any_of(Term("has_attachment"), Term("flag", "flagged"))
+    compiled = compile_query(all_of(Term("from", "a"), attachment, Not(Term("has_attachment"))))
+    assert compiled.criteria == ["FROM", "a"]
+    assert compiled.residual == And((attachment, Not(Term("has_attachment"))))
+
+    only = compile_query(Term("has_attachment"))
+    assert only.criteria == ["ALL"]
+    assert only.residual == Term("has_attachment")
+
+
+# GMAIL X-GM-RAW
+
+def test_gmail_raw_forms():
+    assert to_gmail_raw(Term("from", 'a"b')) == 'from:"a b"'
+    assert to_gmail_raw(Term("text", "deadline")) == '"deadline"'
+    assert to_gmail_raw(Term("since", "01-Feb-2024")) == "after:2024/02/01"
+    assert to_gmail_raw(Term("flag", "seen")) == "is:read"
+    assert to_gmail_raw(Term("flag", "answered")) is None
+    assert to_gmail_raw(Term("body", "x")) is None
+    assert to_gmail_raw(Not(Not(Term("has_attachment")))) == "has:attachment"
+    assert to_gmail_raw(any_of(Term("from", "a"), all_of(Term("subject", "b"), Term("larger", 10)))) \
+        == '{from:"a" (subject:"b" larger:10)}'
+
+
+def test_compile_gmail_pushes_everything_into_one_raw_search():
+    query = all_of(Term("from", "a"), Not(Term("flag", "seen")), any_of(Term("has_attachment"), Term("label", "x")))
+    compiled = compile_query(query, gmail=True)
+    assert compiled.criteria == ["X-GM-RAW", 'from:"a" -is:read {has:attachment label:"x"}']
+    assert compiled.residual is None
+
+
+def test_compile_gmail_falls_back_for_parts_without_an_operator():
+    query = all_of(Term("from", "a"), Term("flag", "answered"), any_of(Term("body", "x"), Term("has_attachment")))
+    compiled = compile_query(query, gmail=True)
+    assert compiled.criteria == ["X-GM-RAW", 'from:"a"', "ANSWERED"]
+    assert compiled.residual == any_of(Term("body", "x"), Term("has_attachment"))
+
+
+# LOCAL EVALUATION
+
+@pytest.mark.parametrize("query, expected", [
+    (Term("from", "ANN@"), True),
+    (Term("text", "attached"), True),
+    (Term("body", "report"), False),
+    (Term("since", "01-May-2023"), True),
+    (Term("before", "01-May-2023"), False),
+    (Term("larger", 10_000), False),
+    (Term("smaller", 10_001), True),
+    (Term("flag", "seen"), True),
+    (Term("has_attachment"), False),
+    (any_of(Term("has_attachment"), Term("subject", "weekly")), True),
+    (Not(any_of(Term("has_attachment"), Term("subject", "weekly"))), False),
+    (all_of(Term("from", "ann"), Not(Term("flag", "flagged"))), True),
+    (MATCH_ALL, True),
+])
+def test_check_locally(query, expected):
+    assert check_locally(query, facts()) is expected
+
+
+def test_check_locally_without_a_date():
+    assert not check_locally(Term("since", "01-Jan-2000"), facts(date=None))
+    assert not check_locally(Term("before", "01-Jan-2100"), facts(date=None))
+
+
+def test_label_matches_gmail_labels_and_imap_keywords():
+    query = any_of(Term("label", "Work"), Term("has_attachment"))
+    assert check_locally(query, facts(labels={"work"}))
+    assert check_locally(query, facts(keywords={"work"}))
+    assert not check_locally(query, facts())
+
+
+# AGAINST A SERVER
+
+QUERIES = [
+    all_of(Term("from", "sender1@"), Term("subject", "invoice")),
+    any_of(Term("from", "sender2@"), Term("subject", "meeting")),
+    all_of(Term("has_attachment"), Term("since", "01-Jan-2023")),
+    any_of(Term("has_attachment"), Term("flag", "flagged")),
+    Not(any_of(Term("from", "sender1@"), Term("text", "security"))),
+    all_of(Term("larger", 50_000), Not(Term("flag", "seen"))),
+    all_of(any_of(Term("from", "sender3@"), all_of(Term("subject", "report"), Term("flag", "seen"))),
+           Not(Term("has_attachment"))),
+    any_of(Term("label", "Work"), Term("has_attachment")),
+]
+
+
+@pytest.mark.parametrize("capabilities", [DEFAULT_CAPABILITIES, GMAIL_CAPABILITIES], ids=["imap", "gmail"])
+def test_search_matches_local_evaluation(connect, imap_server, capabilities):
+    conn = connect()
+    conn.select_folder("INBOX")
+    uids = conn.search(["ALL"])
+    conn.add_flags(uids[::3], [b"\\Flagged"])
+    conn.add_flags(uids[::2], [b"\\Seen"])
+    conn.add_flags(uids[::5], [b"Work"])
+    everything = {}
+    for batch in chunked(uids, 100):
+        messages = conn.fetch(imap_set(batch), ["RFC822.SIZE", "FLAGS", RESIDUAL_HEADERS, "BODYSTRUCTURE", "BODY.PEEK[]"])
+        everything.update((uid, message_facts(uid, data)) for uid, data in messages.items())
+
+    parser = EmailParserService(conn, "INBOX")
+    for query in QUERIES:
+        if "label" in used_fields(query) and "X-GM-EXT-1" in capabilities:
+            continue  # the fake server has no X-GM-LABELS
+        expected = [uid for uid in uids if check_locally(query, everything[uid])]
+        assert parser.search_emails(query) == expected, query
+
+
+def test_server_takes_quotes_in_a_value_literally(connect):
+    conn = connect()
+    conn.select_folder("INBOX")
+    assert conn.search(["FROM", "sender1@"])
+    assert conn.search(["FROM", '"sender1@"']) == []
@@ -0,0 +1,75 @@
+import dataclasses
+
+import pytest
+
+from services import SenderAggregator
+from services.uidset import UIDSet
+
+
+@pytest.fixture
+def inbox(connect, cache):
+    """A connection with INBOX selected, its UIDs and the folder's cache."""
+    conn = connect()
+    info = conn.select_folder("INBOX")
+    return conn, conn.search(["ALL"]), cache.folder("me", "INBOX", info[b"UIDVALIDITY"])
+
+
+@pytest.fixture
+def fetched(inbox, monkeypatch):
+    """UIDs whose From headers reached the client."""
+    conn = inbox[0]
+    uids = []
+    fetch = conn.fetch
+
+    def spy(messages, items, *args, **kwargs):
+        response = fetch(messages, items, *args, **kwargs)
+        uids.extend(response)
+        return response
+
+    monkeypatch.setattr(conn, "fetch", spy)
+    return uids
+
+
+def covered(groups: dict[str, UIDSet]) -> list[int]:
+    return sorted(uid for uids in groups.values() for uid in uids)
+
+
+def test_groups_cover_every_uid_once(inbox):
+    conn, uids, _ = inbox
+    groups = SenderAggregator(conn, uids, chunk_size=64).aggregate()
+    assert covered(groups) == uids
+    assert len(groups) > 1
+
+
+def test_cached_grouping_is_extended_with_new_uids_only(inbox, fetched):
+    conn, uids, folder_cache = inbox
+    SenderAggregator(conn, uids[:100], cache=folder_cache).aggregate()
+    fetched.clear()
+
+    groups = SenderAggregator(conn, uids[:150], cache=folder_cache, chunk_size=20).aggregate()
+    assert fetched == uids[100:150]
+    assert groups == SenderAggregator(conn, uids[:150]).aggregate()
+
+
+def test_narrower_search_keeps_the_stored_grouping_whole(inbox, imap_server, fetched):
+    conn, uids, folder_cache = inbox
+    SenderAggregator(conn, uids, cache=folder_cache).aggregate()
+
+    folder = imap_server.store.folders["INBOX"]
+    with imap_server.store.lock:
+        new = folder.add(dataclasses.replace(folder.messages[uids[0]], sender="new@example.com"), set())
+    fetched.clear()
+
+    subset = uids[::7] + [new]
+    groups = SenderAggregator(conn, subset, cache=folder_cache).aggregate()
+    assert fetched == [new]
+    assert covered(groups) == subset
+    assert covered(folder_cache.sender_groups()) == uids + [new]
+
+
+def test_progress_counts_cached_uids_first(inbox):
+    conn, uids, folder_cache = inbox
+    SenderAggregator(conn, uids[:100], cache=folder_cache).aggregate()
+    progress = []
+    SenderAggregator(conn, uids[:250], cache=folder_cache, chunk_size=100).aggregate(lambda done, total: progress.append(done))
+    assert progress == [100, 200, 250]
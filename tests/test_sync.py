@@ -0,0 +1,96 @@
+import dataclasses
+
+import pytest
+
+from fake_imap import DEFAULT_CAPABILITIES
+from services.sync import FolderSync, SyncResult
+
+
+CONDSTORE = DEFAULT_CAPABILITIES + ("CONDSTORE",)
+QRESYNC = DEFAULT_CAPABILITIES + ("CONDSTORE", "QRESYNC")
+
+
+def sync(conn, cache, qresync: bool = False):
+    info = conn.select_folder("INBOX")
+    folder_cache = cache.folder("me", "INBOX", info[b"UIDVALIDITY"])
+    return FolderSync(conn, folder_cache, info, qresync=qresync).sync(), folder_cache
+
+
+def deliver(imap_server, subject: str = "fresh mail") -> int:
+    inbox = imap_server.store.folders["INBOX"]
+    with imap_server.store.lock:
+        return inbox.add(dataclasses.replace(inbox.messages[inbox.uids[0]], subject=subject), set())
+
+
+def test_without_condstore_there_is_nothing_to_sync(connect, cache):
+    result, folder_cache = sync(connect(), cache)
+    assert result is None
+    assert folder_cache.highest_modseq() is None
+
+
+@pytest.mark.parametrize("capabilities", [CONDSTORE])
+def test_first_sync_lists_the_whole_folder(connect, imap_server, cache):
+    result, folder_cache = sync(connect(), cache)
+    uids = imap_server.store.folders["INBOX"].uids
+    assert result == SyncResult(full=True, new=uids)
+    assert folder_cache.known_uids() == uids
+    assert folder_cache.highest_modseq() == imap_server.store.folders["INBOX"].modseq
+
+
+@pytest.mark.parametrize("capabilities", [CONDSTORE])
+def test_unchanged_folder_fetches_nothing(connect, cache, monkeypatch):
+    conn = connect()
+    sync(conn, cache)
+    monkeypatch.setattr(FolderSync, "_fetch_flags", lambda self, modifiers=None: pytest.fail("fetched flags"))
+    result, _ = sync(conn, cache)
+    assert result == SyncResult(full=False)
+
+
+@pytest.mark.parametrize("capabilities, qresync", [(CONDSTORE, False), (QRESYNC, True)], ids=["condstore", "qresync"])
+def test_delta_sync(connect, imap_server, cache, qresync):
+    conn, other = connect(), connect()
+    sync(conn, cache, qresync)
+    folder_cache = cache.folder("me", "INBOX", imap_server.store.folders["INBOX"].uidvalidity)
+    uids = folder_cache.known_uids()
+    folder_cache.put_many([{"uid": uid, "subject": "", "from": "", "date": "", "body": ""} for uid in uids[:3]])
+
+    # Another client flags one message and deletes two, and a new one arrives
+    other.select_folder("INBOX")
+    other.add_flags([uids[5]], [b"\\Flagged"])
+    other.delete_messages(uids[:2])
+    other.expunge()
+    new = deliver(imap_server)
+
+    result, folder_cache = sync(conn, cache, qresync)
+    assert result == SyncResult(full=False, new=[new], changed=[uids[5]], vanished=uids[:2])
+    assert folder_cache.known_uids() == uids[2:] + [new]
+    assert set(folder_cache.get_many(uids[:3])) == {uids[2]}  # the vanished messages left the cache too
+    assert folder_cache.highest_modseq() == imap_server.store.folders["INBOX"].modseq
+
+
+@pytest.mark.parametrize("capabilities", [QRESYNC])
+def test_qresync_reports_vanished_without_listing_uids(connect, imap_server, cache, monkeypatch):
+    conn, other = connect(), connect()
+    sync(conn, cache, qresync=True)
+    other.select_folder("INBOX")
+    gone = other.search(["ALL"])[-3:]
+    other.delete_messages(gone)
+    other.expunge()
+
+    search = conn.search
+    monkeypatch.setattr(conn, "search", lambda criteria: pytest.fail("listed UIDs") if criteria == ["ALL"] else search(criteria))
+    result, _ = sync(conn, cache, qresync=True)
+    assert result.vanished == gone
+
+
+@pytest.mark.parametrize("capabilities", [QRESYNC])
+def test_qresync_not_enabled_on_the_session_falls_back(connect, imap_server, cache, monkeypatch):
+    monkeypatch.setattr("services.imap.enable_qresync", lambda connection: False)
+    conn = connect()
+    sync(conn, cache, qresync=True)
+    new = deliver(imap_server)
+
+    info = conn.select_folder("INBOX")
+    folder_sync = FolderSync(conn, cache.folder("me", "INBOX", info[b"UIDVALIDITY"]), info, qresync=True)
+    assert folder_sync.sync() == SyncResult(full=False, new=[new])
+    assert not folder_sync.qresync
@@ -0,0 +1,85 @@
+import pytest
+from imapclient.exceptions import IMAPClientError
+
+from fake_imap import TRASH_FOLDER
+from services.imap import EmailTrashService
+from services.uidset import UIDSet
+
+
+BASE_CAPABILITIES = ("IMAP4rev1", "LITERAL+", "ENABLE")
+STRATEGIES = [
+    (BASE_CAPABILITIES + ("UIDPLUS", "MOVE"), "_move"),
+    (BASE_CAPABILITIES + ("UIDPLUS",), "_copy_and_uid_expunge"),
+    (BASE_CAPABILITIES, "_copy_and_expunge"),
+]
+
+
+@pytest.fixture
+def inbox(connect):
+    conn = connect()
+    conn.select_folder("INBOX")
+    return conn
+
+
+@pytest.mark.parametrize("capabilities, strategy", STRATEGIES, ids=["move", "uidplus", "expunge"])
+def test_moves_with_the_best_available_command(inbox, imap_server, capabilities, strategy):
+    service = EmailTrashService(inbox, TRASH_FOLDER, chunk_size=40)
+    assert service._move_strategy() == getattr(service, strategy)
+
+    uids = UIDSet(inbox.search(["ALL"])[10:110])
+    progress = []
+    moved, info = service.move_to_trash(uids, progress=lambda done, total: progress.append((done, total)))
+
+    assert moved, info
+    assert info == f"Moved 100 message(s) to {TRASH_FOLDER}."
+    assert progress == [(40, 100), (80, 100), (100, 100)]
+    assert service.moved == uids
+    assert not set(inbox.search(["ALL"])) & set(uids)
+    assert len(imap_server.store.folders[TRASH_FOLDER].uids) == 100
+
+
+@pytest.mark.parametrize("capabilities", [BASE_CAPABILITIES + ("UIDPLUS",)])
+def test_uid_expunge_leaves_other_deleted_messages(inbox):
+    # UIDPLUS removes exactly the copied UIDs; a message flagged \Deleted elsewhere stays
+    other = inbox.search(["ALL"])[0]
+    inbox.add_flags([other], [b"\\Deleted"])
+    EmailTrashService(inbox, TRASH_FOLDER).move_to_trash(inbox.search(["ALL"])[5:10])
+    assert other in inbox.search(["ALL"])
+
+
+@pytest.mark.parametrize("capabilities", [BASE_CAPABILITIES])
+def test_expunge_fallback_copies_before_removing(inbox, imap_server):
+    uids = inbox.search(["ALL"])[:5]
+    specs = [imap_server.store.folders["INBOX"].messages[uid] for uid in uids]
+    moved, info = EmailTrashService(inbox, TRASH_FOLDER).move_to_trash(uids)
+    assert moved, info
+    assert list(imap_server.store.folders[TRASH_FOLDER].messages.values()) == specs
+
+
+def test_nothing_to_move(inbox):
+    assert EmailTrashService(inbox, TRASH_FOLDER).move_to_trash([]) == (False, "No emails to move.")
+
+
+def test_failure_reports_progress_of_the_call_and_can_resume(inbox, monkeypatch):
+    service = EmailTrashService(inbox, TRASH_FOLDER, chunk_size=10)
+    uids = UIDSet(inbox.search(["ALL"])[:30])
+    move, calls = service._move, []
+
+    def failing_move(chunk):
+        calls.append(chunk)
+        if len(calls) == 2:
+            raise IMAPClientError("connection dropped")
+        move(chunk)
+
+    monkeypatch.setattr(service, "_move", failing_move)
+    moved, info = service.move_to_trash(uids)
+    assert not moved
+    assert info.startswith(f"Moved 10 of 30 message(s) to {TRASH_FOLDER} before an error")
+    assert len(service.moved) == 10
+
+    progress = []
+    moved, info = service.move_to_trash(uids - service.moved, progress=lambda done, total: progress.append((done, total)))
+    assert moved, info
+    assert progress == [(10, 20), (20, 20)]  # counted for this call, not the cumulative set
+    assert service.moved == uids
+    assert not set(inbox.search(["ALL"])) & set(uids)
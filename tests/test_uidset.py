@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from services.uidset import UIDSet, imap_set
+
+
+def test_collapses_runs_into_ranges():
+    uids = UIDSet([5, 1, 2, 3, 3, 9, 10])
+    assert uids.ranges == [(1, 3), (5, 5), (9, 10)]
+    assert len(uids) == 6
+    assert str(uids) == "1:3,5,9:10"
+    assert list(uids) == [1, 2, 3, 5, 9, 10]
+
+
+def test_empty():
+    uids = UIDSet()
+    assert not uids
+    assert len(uids) == 0
+    assert str(uids) == ""
+    assert list(uids.chunks(10)) == []
+
+
+def test_contains():
+    uids = UIDSet([1, 2, 3, 10])
+    assert 2 in uids and 10 in uids
+    assert 0 not in uids and 4 not in uids and 11 not in uids
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("300:310,405", [(300, 310), (405, 405)]),
+    (b"1,2,3", [(1, 3)]),
+    ("10:5", [(5, 10)]),  # either end may come first
+    ("1:4,3:8, 20", [(1, 8), (20, 20)]),
+    ("", []),
+])
+def test_parse(text, expected):
+    assert UIDSet.parse(text).ranges == expected
+
+
+def test_parse_round_trips_str():
+    uids = UIDSet([1, 2, 3, 7, 9, 10, 11])
+    assert UIDSet.parse(str(uids)) == uids
+
+
+def test_from_ranges_merges_overlaps():
+    assert UIDSet.from_ranges([(10, 12), (1, 3), (4, 5), (11, 20)]).ranges == [(1, 5), (10, 20)]
+
+
+def test_add_joins_neighbours():
+    uids = UIDSet([1, 3])
+    uids.add(2)
+    assert uids.ranges == [(1, 3)]
+    uids.add(2)
+    assert len(uids) == 3
+    uids.add(5)
+    uids.add(0)
+    assert uids.ranges == [(0, 3), (5, 5)]
+    assert len(uids) == 5
+
+
+def test_discard():
+    uids = UIDSet(range(1, 11))
+    uids.discard([3, 4, 10])
+    assert uids.ranges == [(1, 2), (5, 9)]
+    assert len(uids) == 7
+
+
+def test_set_operations_match_python_sets():
+    rng = random.Random(12)
+    for _ in range(200):
+        left = {rng.randint(1, 60) for _ in range(rng.randint(0, 40))}
+        right = {rng.randint(1, 60) for _ in range(rng.randint(0, 40))}
+        a, b = UIDSet(left), UIDSet(right)
+        assert list(a | b) == sorted(left | right)
+        assert list(a - b) == sorted(left - right)
+        assert list(a & b) == sorted(left & right)
+        assert len(a - b) == len(left - right)
+        assert list(a | right) == sorted(left | right)  # plain iterables work on the right
+
+
+def test_chunks_split_in_uid_order():
+    uids = UIDSet([1, 2, 3, 4, 5, 10, 11, 12, 20])
+    chunks = list(uids.chunks(4))
+    assert [str(chunk) for chunk in chunks] == ["1:4", "5,10:12", "20"]
+    assert [len(chunk) for chunk in chunks] == [4, 4, 1]
+
+
+def test_chunks_cover_every_uid_once():
+    uids = UIDSet(range(1, 10_001)) - UIDSet(range(500, 600))
+    chunks = list(uids.chunks(1000))
+    assert all(len(chunk) == 1000 for chunk in chunks[:-1])
+    assert [uid for chunk in chunks for uid in chunk] == list(uids)
+
+
+def test_imap_set():
+    assert imap_set([3, 1, 2, 8]) == "1:3,8"
+    assert imap_set(UIDSet([4])) == "4"